@@ -11,8 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -130,9 +131,54 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Sync API
+
+# Seconds an upload session may sit idle before it expires.
+SYNC_UPLOAD_SESSION_TTL = config('SYNC_UPLOAD_SESSION_TTL', default=3600, cast=int)
+
+# Largest body, in bytes, a gzip/zstd request may inflate to (413 beyond it).
+SYNC_MAX_DECOMPRESSED_SIZE = config('SYNC_MAX_DECOMPRESSED_SIZE', default=512 * 1024 * 1024, cast=int)
+
+# Rows per page for GETs with ?limit=/?cursor= (default, and the most a
+# client may ask for).
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=1000, cast=int)
+SYNC_MAX_PAGE_SIZE = config('SYNC_MAX_PAGE_SIZE', default=10000, cast=int)
+
+# Rows per DELETE statement when purging a client's rows (syncdata/purge.py).
+SYNC_PURGE_BATCH_SIZE = config('SYNC_PURGE_BATCH_SIZE', default=5000, cast=int)
+
+# How full-table pushes merge rows with a repeated key, per table, overriding
+# the view's conflict_policy: "syncdata_imc1recordledgers=sum,planet_invmast=first".
+# Policies are last, first and sum (see syncdata/bulk.py).
+# Bad entries are ignored and reported by "manage.py check" (syncdata/checks.py).
+SYNC_CONFLICT_POLICIES = config('SYNC_CONFLICT_POLICIES', default='', cast=Csv())
+
+
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Files the worker processes share at run time, kept out of the source tree.
+SYNC_STATE_DIR = config('SYNC_STATE_DIR', default=os.path.join(tempfile.gettempdir(), 'syncdata'))
+
+# Where each worker process writes its ingest metrics for /api/sync/metrics
+# to merge; empty to report only the process that serves the scrape.  Must
+# be local to the host: exited workers are found by pid.
+SYNC_METRICS_DIR = config('SYNC_METRICS_DIR', default=os.path.join(SYNC_STATE_DIR, 'metrics'))
+
+# Data versions of the sync tables, shared by the worker processes, and the
+# per-process memory for cached GET responses (see syncdata/cache.py).  An
+# empty SYNC_CACHE_VERSION_DIR turns the response cache off.
+SYNC_CACHE_VERSION_DIR = config('SYNC_CACHE_VERSION_DIR', default=os.path.join(SYNC_STATE_DIR, 'versions'))
+SYNC_RESPONSE_CACHE_BYTES = config('SYNC_RESPONSE_CACHE_BYTES', default=64 * 1024 * 1024, cast=int)
+
+# Sync logging (see syncdata/log.py): one JSON object per line, written by a
+# background thread, rotated by size, with repeated per-row warnings folded
+# into counts.
+SYNC_LOG_MAX_BYTES = config('SYNC_LOG_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
+SYNC_LOG_BACKUP_COUNT = config('SYNC_LOG_BACKUP_COUNT', default=5, cast=int)
+SYNC_LOG_RATE_INTERVAL = config('SYNC_LOG_RATE_INTERVAL', default=60, cast=int)
+SYNC_LOG_RATE_BURST = config('SYNC_LOG_RATE_BURST', default=10, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -141,13 +187,27 @@ LOGGING = {
             'format': '[{asctime}] {levelname} {name} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'syncdata.log.JSONLineFormatter',
+        },
+    },
+    'filters': {
+        'rate_limit': {
+            '()': 'syncdata.log.RateLimitFilter',
+            'interval': SYNC_LOG_RATE_INTERVAL,
+            'burst': SYNC_LOG_RATE_BURST,
+            'level': 'WARNING',
+        },
     },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'syncdata.log.QueuedFileHandler',
             'filename': os.path.join(LOG_DIR, 'sync.log'),
-            'formatter': 'verbose',
+            'maxBytes': SYNC_LOG_MAX_BYTES,
+            'backupCount': SYNC_LOG_BACKUP_COUNT,
+            'formatter': 'json',
+            'filters': ['rate_limit'],
         },
     },
     'root': {
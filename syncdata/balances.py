@@ -0,0 +1,110 @@
+"""
+Per-client ledger totals: ``acc_ledger_balances``.
+
+Balance lookups used to sum a client's whole ``acc_ledgers`` table.  The
+summary table holds one row per (client_id, code) with the debit total,
+credit total and entry count, so reading an account's balance costs one
+row whatever the ledger volume:
+
+* ``LedgerBalanceLoader`` wraps the loader of a ledger push and adds each
+  loaded batch's per-code totals to the summary (an upsert), in the push's
+  transaction;
+* ``rebuild_balances`` recomputes a client's summary from its ledgers, for
+  pushes that replace the client's rows (session commits) and for
+  backfilling rows written outside the API;
+* ``clear_balances`` goes with a ledger DELETE.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .bulk import BulkLoader
+from .models import AccLedger, AccLedgerBalance
+
+ZERO = Decimal(0)
+SUMMARY_COLUMNS = ('client_id', 'code', 'debit', 'credit', 'entries')
+
+
+def _tables(connection):
+    qn = connection.ops.quote_name
+    return qn(AccLedgerBalance._meta.db_table), qn(AccLedger._meta.db_table)
+
+
+def clear_balances(client_id='', using=DEFAULT_DB_ALIAS):
+    """Delete ``client_id``'s summary rows (every row when it is empty)."""
+    connection = connections[using]
+    balances, _ = _tables(connection)
+    with connection.cursor() as cursor:
+        if client_id:
+            cursor.execute(f"DELETE FROM {balances} WHERE client_id = %s", [client_id])
+        else:
+            cursor.execute(f"DELETE FROM {balances}")
+        return cursor.rowcount
+
+
+def rebuild_balances(client_id='', using=DEFAULT_DB_ALIAS):
+    """Recompute ``client_id``'s summary rows (every client's when empty) from acc_ledgers."""
+    connection = connections[using]
+    balances, ledgers = _tables(connection)
+    clear_balances(client_id, using)
+    where, params = ('WHERE client_id = %s', [client_id]) if client_id else ('', [])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {balances} (client_id, code, debit, credit, entries) "
+            f"SELECT client_id, code, COALESCE(SUM(debit), 0), COALESCE(SUM(credit), 0), COUNT(*) "
+            f"FROM {ledgers} {where} GROUP BY client_id, code",
+            params,
+        )
+        return cursor.rowcount
+
+
+class LedgerBalanceLoader:
+    """
+    A loader for acc_ledgers rows that keeps the summary table in step.
+
+        loader = LedgerBalanceLoader(BulkLoader(AccLedger, fields=coercer.fields))
+        loader.load(rows)
+
+    ``load(rows)`` loads through the wrapped loader, then adds the rows'
+    totals per (client_id, code) to ``acc_ledger_balances`` with one
+    multi-row upsert per batch.  Run it in the same transaction as the
+    ledger insert so a rollback undoes both.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.using = loader.using
+        self.summary = BulkLoader(
+            AccLedgerBalance, using=self.using,
+            fields=[AccLedgerBalance._meta.get_field(name) for name in SUMMARY_COLUMNS],
+            conflict='sum', key=['client_id', 'code'], summed=['debit', 'credit', 'entries'],
+        )
+        columns = loader.columns
+        self._client = columns.index('client_id')
+        self._code = columns.index('code')
+        self._debit = columns.index('debit')
+        self._credit = columns.index('credit')
+
+    def load(self, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+        loaded = self.loader.load(rows)
+        self.add(rows)
+        return loaded
+
+    def add(self, rows):
+        """Add ledger ``rows`` (tuples in the loader's column order) to the summary."""
+        client, code, debit, credit = self._client, self._code, self._debit, self._credit
+        totals = defaultdict(lambda: [ZERO, ZERO, 0])
+        for row in rows:
+            total = totals[row[client] or '', row[code]]
+            if row[debit] is not None:
+                total[0] += row[debit]
+            if row[credit] is not None:
+                total[1] += row[credit]
+            total[2] += 1
+        if totals:
+            # In key order: concurrent pushes lock the summary rows in the
+            # same order, so they wait on each other instead of deadlocking
+            self.summary.upsert(
+                (client_id, code, *total) for (client_id, code), total in sorted(totals.items()))
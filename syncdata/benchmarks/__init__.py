@@ -0,0 +1,9 @@
+"""
+Ingest benchmarks for the api/sync/ endpoints.
+
+``generators`` builds realistic payloads for every push endpoint and
+``harness`` posts them through the real views against a throw-away test
+database, recording rows/sec, peak RSS and query counts.  Run them with
+``python manage.py bench_ingest``; results are written as JSON so two runs
+can be compared (``--compare``).
+"""
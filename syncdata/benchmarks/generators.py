@@ -0,0 +1,161 @@
+"""
+Synthetic payloads shaped like what the DSN sync tools push.
+
+Records are generated lazily and deterministically from a seed, straight
+from each view's coercer fields, so every endpoint in ``syncdata/urls.py``
+gets a payload without per-endpoint fixtures:
+
+* primary keys and other unique columns are sequential codes;
+* decimals are sent as strings with the column's decimal places, the way
+  the invmast exports send them;
+* dates switch between the formats in ``dates.DATE_FORMATS`` every
+  ``DATE_BLOCK`` rows, as when several DSNs feed one endpoint;
+* client_id is left out of the records; the harness sends it as the
+  X-Client-ID header, like the sync tool.
+"""
+import csv
+import datetime
+import io
+import itertools
+import json
+import random
+from decimal import Decimal
+
+from django.db import models
+from django.urls import URLPattern
+
+from ..dates import DATE_FORMATS
+from ..parsers import CSV_NULL
+
+# Rows per date format before switching to the next one.
+DATE_BLOCK = 1000
+
+# Payload sizes the suite is usually run at.
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+WORDS = (
+    'Sales', 'Purchase', 'Cash', 'Bank', 'Rent', 'Salary', 'Freight', 'GST',
+    'Discount', 'Return', 'Opening', 'Stock', 'Transfer', 'Commission',
+    'Electricity', 'Repairs', 'Advance', 'Interest', 'Sundry', 'Debtors',
+)
+ENTRY_MODES = ('CASH', 'BANK', 'JOURNAL', 'CONTRA', 'CREDIT')
+PLACES = ('Kochi', 'Thrissur', 'Kozhikode', 'Kannur', 'Kollam', 'Palakkad')
+
+
+def parse_size(value):
+    """'100k' → 100000; plain integers pass through."""
+    value = str(value).strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    return int(float(number) * multiplier)
+
+
+def sync_endpoints():
+    """``{route: view class}`` for every push endpoint in syncdata/urls.py."""
+    from .. import urls
+
+    endpoints = {}
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or '<' in str(pattern.pattern):
+            continue
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if getattr(view_class, 'coercer', None) is not None:
+            endpoints[str(pattern.pattern)] = view_class
+    return endpoints
+
+
+def _value_maker(field, rnd, key_prefix=''):
+    """Return ``make(i)`` producing the JSON value of ``field`` for row i."""
+    name = field.attname
+    if field.primary_key or field.unique:
+        width = min(field.max_length or 12, 12)
+        prefix = key_prefix + name[:1].upper()
+        return lambda i: f"{prefix}{i:0{width - 1}d}"
+    if isinstance(field, models.DecimalField):
+        places = min(field.decimal_places, 2)
+        whole = 10 ** min(field.max_digits - field.decimal_places, 7) - 1
+        fmt = f"{{:.{places}f}}"
+        scale = Decimal(1).scaleb(-places)
+        return lambda i: fmt.format(Decimal(rnd.randint(0, whole)) + scale * rnd.randint(0, 99))
+    if isinstance(field, models.FloatField):
+        return lambda i: round(rnd.uniform(0, 100000), 2)
+    if isinstance(field, models.IntegerField):
+        return lambda i: rnd.randint(0, 1000)
+    if isinstance(field, models.DateField):
+        start = datetime.date(2024, 4, 1)
+        return lambda i: (start + datetime.timedelta(days=rnd.randint(0, 364))).strftime(
+            DATE_FORMATS[(i // DATE_BLOCK) % len(DATE_FORMATS)])
+    if isinstance(field, (models.CharField, models.TextField)):
+        limit = field.max_length or 250
+        if 'mode' in name:
+            choices = ENTRY_MODES
+        elif name in ('place', 'district', 'state', 'branch'):
+            choices = PLACES
+        else:
+            choices = None
+        if choices is not None:
+            return lambda i: rnd.choice(choices)[:limit]
+        if limit <= 10:
+            return lambda i: ''.join(rnd.choice('ABCDEFGH') for _ in range(min(limit, 3)))
+        return lambda i: f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {rnd.randint(1, 9999)}"[:limit]
+    return lambda i: None
+
+
+def record_generator(view_class, count, seed=42, key_prefix=''):
+    """
+    Yield ``count`` record dicts for ``view_class``'s coercer.
+
+    ``key_prefix`` is put in front of generated key values, so several
+    simulated clients can load the same table without colliding.
+    """
+    rnd = random.Random(seed)
+    skip = {'client_id'}
+    fields = [
+        f for f in view_class.coercer.fields
+        if f.attname not in skip
+        and not (getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False))
+    ]
+    makers = [(f.attname, _value_maker(f, rnd, key_prefix)) for f in fields]
+    for i in range(count):
+        yield {name: make(i) for name, make in makers}
+
+
+def encode_json(records, batch_size=1000):
+    """JSON array body, encoded a batch at a time to bound peak memory."""
+    out = io.BytesIO()
+    out.write(b'[')
+    records = iter(records)
+    first = True
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        if not first:
+            out.write(b',')
+        out.write(json.dumps(batch)[1:-1].encode())
+        first = False
+    out.write(b']')
+    return out.getvalue()
+
+
+def encode_csv(records):
+    """Columnar CSV body (see parsers.ColumnarCSVParser)."""
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return b''
+    out = io.StringIO()
+    writer = csv.writer(out)
+    header = list(first)
+    writer.writerow(header)
+    for record in itertools.chain([first], records):
+        writer.writerow([CSV_NULL if record[name] is None else record[name] for name in header])
+    return out.getvalue().encode()
+
+
+ENCODERS = {
+    'json': ('application/json', encode_json),
+    'csv': ('text/csv', encode_csv),
+}
@@ -0,0 +1,227 @@
+"""
+Run generated payloads through the sync views and measure them.
+
+Every case goes through the full request path (parser, view, coercer,
+loader) with Django's test client against a test database created for the
+run (``test_<NAME>``), so the configured database is never touched.  Tables
+of the ``managed = False`` models are created in it as well.
+
+For each POST and GET the harness records wall time, rows/sec, the number of
+queries executed (COPY streams on PostgreSQL bypass the cursor and are not
+counted), and peak RSS above the level before the request (sampled
+from /proc; on other platforms the process high-water mark is reported).
+"""
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import django
+from django.apps import apps
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from .generators import ENCODERS, record_generator
+
+CLIENT_ID = 'bench'
+
+# Seconds between RSS samples while a request runs.
+RSS_INTERVAL = 0.005
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class RSSSampler:
+    """Track peak RSS above the starting level while the block runs."""
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth(self):
+        return self.peak - self.baseline
+
+
+class QueryCounter:
+    """Count queries on ``connection`` without keeping their SQL."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def counting(self):
+        with connection.execute_wrapper(self):
+            yield self
+
+
+@contextmanager
+def bench_database(keepdb=False, verbosity=0):
+    """Create (and afterwards destroy) the test database with every sync table."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, keepdb=keepdb)
+    try:
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in apps.get_app_config('syncdata').get_models():
+                if model._meta.db_table not in existing:
+                    editor.create_model(model)
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def clear_table(model):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+
+def _measure(request):
+    """Run ``request()`` and return ``(response, body, seconds, queries, rss_growth)``."""
+    counter = QueryCounter()
+    with RSSSampler() as rss, counter.counting():
+        start = time.perf_counter()
+        response = request()
+        # Streaming responses do their work while being consumed
+        if response.streaming:
+            body = b''.join(response.streaming_content)
+        else:
+            body = response.content
+        seconds = time.perf_counter() - start
+    return response, body, seconds, counter.count, rss.growth
+
+
+def _result(route, method, fmt, size, rows, response, seconds, queries, rss, body_bytes):
+    return {
+        'endpoint': route,
+        'method': method,
+        'format': fmt,
+        'size': size,
+        'rows': rows,
+        'status': response.status_code,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'queries': queries,
+        'rss_growth_mb': round(rss / 2 ** 20, 1),
+        'bytes': body_bytes,
+    }
+
+
+def run_case(client, route, view_class, rows, fmt='json', include_get=True, seed=42):
+    """POST ``rows`` generated records to ``route`` (then GET them back)."""
+    content_type, encode = ENCODERS[fmt]
+    url = f'/api/sync/{route}'
+    headers = {'HTTP_X_CLIENT_ID': CLIENT_ID}
+    clear_table(view_class.coercer.model)
+    payload = encode(record_generator(view_class, rows, seed=seed))
+
+    response, _, seconds, queries, rss = _measure(
+        lambda body=payload: client.generic('POST', url, body, content_type=content_type, **headers))
+    results = [_result(route, 'POST', fmt, rows, rows, response, seconds, queries, rss, len(payload))]
+    del payload
+
+    if include_get:
+        response, body, seconds, queries, rss = _measure(lambda: client.get(url, **headers))
+        returned = len(json.loads(body)) if response.status_code == 200 else 0
+        results.append(_result(route, 'GET', 'json', rows, returned, response, seconds, queries, rss, len(body)))
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'vendor': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_suite(endpoints, sizes, fmt='json', include_get=True, seed=42, keepdb=False, log=None):
+    """
+    Run every endpoint at every size; returns ``{'environment', 'results'}``.
+
+    ``endpoints`` maps route → view class (see generators.sync_endpoints).
+    """
+    results = []
+    with bench_database(keepdb=keepdb):
+        meta = environment()
+        meta.update(format=fmt, seed=seed, sizes=list(sizes))
+        client = Client()
+        for rows in sizes:
+            for route, view_class in endpoints.items():
+                for result in run_case(client, route, view_class, rows, fmt, include_get, seed):
+                    results.append(result)
+                    if log is not None:
+                        log(result)
+    return {'environment': meta, 'results': results}
+
+
+def compare(baseline, current):
+    """
+    Pair up results of two runs; returns rows of
+    ``(endpoint, method, size, old rows/sec, new rows/sec, change %)``.
+    """
+    key = lambda r: (r['endpoint'], r['method'], r['format'], r['size'])
+    old = {key(r): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = old.get(key(result))
+        if before is None or not before['rows_per_sec'] or not result['rows_per_sec']:
+            continue
+        change = (result['rows_per_sec'] / before['rows_per_sec'] - 1) * 100
+        rows.append((result['endpoint'], result['method'], result['size'],
+                     before['rows_per_sec'], result['rows_per_sec'], round(change, 1)))
+    return rows
@@ -0,0 +1,300 @@
+"""
+Simulate many DSN sites syncing the client-scoped endpoints at once.
+
+Each simulated client runs the sync tool's protocol against a live
+development server (Django's ``LiveServerThread``) in a throw-away test
+database: for every endpoint it sends ``DELETE`` with its ``X-Client-ID``
+and then POSTs its records in chunks, one request at a time.  All clients
+start together, so the deletes and loads of different clients overlap the
+way they do when dozens of sites sync after closing time.  The server is
+one process, so rows/sec levels off once Python is busy on every request;
+the database side (locks, deadlocks, latency of the deletes) is real.
+
+Per concurrency level the simulator reports request latency percentiles per
+client and overall, total rows/sec, failed requests, and on PostgreSQL:
+
+* lock waits, sampled from ``pg_stat_activity`` every
+  ``LOCK_SAMPLE_INTERVAL`` seconds (backends waiting on a lock, by wait
+  event, and the peak number waiting at once);
+* deadlocks, from the ``pg_stat_database`` counter of the test database.
+
+On SQLite a file database is used so every request thread has its own
+connection; lock contention then shows up as failed requests
+("database is locked") rather than as waits.
+"""
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings
+
+from .generators import encode_json, record_generator, sync_endpoints
+from .harness import bench_database, clear_table, environment
+
+# What a DSN site pushes, in the order the sync tool sends it.
+DSN_ENDPOINTS = ('acc-master/', 'acc-product/', 'acc-departments/', 'acc-ledgers/')
+
+# Records per POST, as sent by the sync tool.
+CHUNK_SIZE = 500
+
+LOCK_SAMPLE_INTERVAL = 0.05
+
+REQUEST_TIMEOUT = 300
+
+_LOCK_WAITS_SQL = """
+    SELECT wait_event, count(*)
+      FROM pg_stat_activity
+     WHERE datname = current_database() AND wait_event_type = 'Lock'
+     GROUP BY wait_event
+"""
+
+_DEADLOCKS_SQL = "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_summary(seconds):
+    return {
+        'p50': _ms(percentile(seconds, 50)),
+        'p95': _ms(percentile(seconds, 95)),
+        'p99': _ms(percentile(seconds, 99)),
+        'max': _ms(max(seconds, default=None)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+@contextmanager
+def simulation_database(keepdb=False):
+    """
+    ``harness.bench_database``, but on a file when the backend is SQLite:
+    the default in-memory test database is one connection shared by every
+    thread, which would hide the contention being measured.
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    override = connection.vendor == 'sqlite' and not test_settings.get('NAME')
+    if override:
+        test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'syncdata_loadsim.sqlite3')
+    try:
+        with bench_database(keepdb=keepdb):
+            yield
+    finally:
+        if override:
+            test_settings['NAME'] = None
+
+
+@contextmanager
+def live_server(host='127.0.0.1'):
+    """Serve the project on a free port in a thread; yields the base URL."""
+    with override_settings(ALLOWED_HOSTS=['*']):
+        server = LiveServerThread(host, lambda handler: handler)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        try:
+            yield f'http://{host}:{server.port}'
+        finally:
+            server.terminate()
+
+
+class LockSampler:
+    """Poll PostgreSQL for backends waiting on locks while the block runs."""
+
+    def __init__(self, interval=LOCK_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.waiting = 0
+        self.peak = 0
+        self.by_event = {}
+        self._stop = threading.Event()
+
+    def _run(self):
+        from django.db import connection as thread_connection
+
+        try:
+            with thread_connection.cursor() as cursor:
+                while not self._stop.wait(self.interval):
+                    cursor.execute(_LOCK_WAITS_SQL)
+                    rows = cursor.fetchall()
+                    waiting = sum(count for _, count in rows)
+                    self.samples += 1
+                    self.waiting += waiting
+                    self.peak = max(self.peak, waiting)
+                    for event, count in rows:
+                        self.by_event[event] = self.by_event.get(event, 0) + count
+        finally:
+            thread_connection.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def result(self):
+        return {
+            'samples': self.samples,
+            'peak_waiting': self.peak,
+            # backend-seconds spent waiting, estimated from the samples
+            'wait_seconds': round(self.waiting * self.interval, 2),
+            'by_event': self.by_event,
+        }
+
+
+def deadlock_count():
+    with connection.cursor() as cursor:
+        # The statistics of other backends reach pg_stat_database with a delay
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(_DEADLOCKS_SQL)
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+class SimulatedClient:
+    """One DSN site: DELETE then chunked POSTs for every endpoint."""
+
+    def __init__(self, base_url, client_id, endpoints, rows, chunk_size=CHUNK_SIZE, seed=42):
+        self.client_id = client_id
+        self.requests = []
+        # Bodies are built up front so the timed run only does I/O
+        self.plan = []
+        for route, view_class in endpoints.items():
+            url = f'{base_url}/api/sync/{route}'
+            self.plan.append((route, 'DELETE', url, None, 0))
+            records = list(record_generator(view_class, rows, seed=seed, key_prefix=f'{client_id}-'))
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                self.plan.append((route, 'POST', url, encode_json(chunk), len(chunk)))
+
+    def send(self, method, url, body):
+        request = urllib.request.Request(url, data=body, method=method, headers={
+            'X-Client-ID': self.client_id, 'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except OSError as e:
+            return 0, str(e).encode()
+
+    def run(self, barrier):
+        barrier.wait()
+        for route, method, url, body, rows in self.plan:
+            start = time.perf_counter()
+            status, content = self.send(method, url, body)
+            seconds = time.perf_counter() - start
+            ok = 200 <= status < 300
+            self.requests.append({
+                'endpoint': route, 'method': method, 'status': status,
+                'seconds': seconds, 'rows': rows if ok else 0,
+                'error': None if ok else content[:200].decode(errors='replace'),
+            })
+
+    def result(self):
+        seconds = [r['seconds'] for r in self.requests]
+        return {
+            'client_id': self.client_id,
+            'requests': len(self.requests),
+            'errors': sum(1 for r in self.requests if r['error'] is not None),
+            'rows': sum(r['rows'] for r in self.requests),
+            'seconds': round(sum(seconds), 3),
+            'latency_ms': latency_summary(seconds),
+        }
+
+
+def run_level(base_url, endpoints, clients, rows, chunk_size=CHUNK_SIZE, seed=42):
+    """Run ``clients`` simulated sites at once; returns the level's result."""
+    for view_class in endpoints.values():
+        clear_table(view_class.coercer.model)
+    sites = [
+        SimulatedClient(base_url, f'DSN{n:03d}', endpoints, rows, chunk_size, seed + n)
+        for n in range(clients)
+    ]
+    barrier = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=site.run, args=(barrier,)) for site in sites]
+    for thread in threads:
+        thread.start()
+
+    postgres = connection.vendor == 'postgresql'
+    deadlocks_before = deadlock_count() if postgres else None
+    sampler = LockSampler() if postgres else None
+    with sampler or _nothing():
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    requests = [r for site in sites for r in site.requests]
+    loaded = sum(r['rows'] for r in requests)
+    errors = [r for r in requests if r['error'] is not None]
+    result = {
+        'clients': clients,
+        'rows_per_client': rows * len(endpoints),
+        'seconds': round(elapsed, 3),
+        'rows': loaded,
+        'rows_per_sec': round(loaded / elapsed, 1) if elapsed else None,
+        'requests': len(requests),
+        'errors': len(errors),
+        'error_sample': sorted({r['error'] for r in errors})[:5],
+        'latency_ms': latency_summary([r['seconds'] for r in requests]),
+        'latency_ms_by_endpoint': {
+            f'{method} {route}': latency_summary(
+                [r['seconds'] for r in requests if (r['endpoint'], r['method']) == (route, method)])
+            for route in endpoints for method in ('DELETE', 'POST')
+        },
+        'per_client': [site.result() for site in sites],
+        'lock_waits': sampler.result() if sampler else None,
+        'deadlocks': None,
+    }
+    if postgres:
+        time.sleep(0.5)
+        result['deadlocks'] = deadlock_count() - deadlocks_before
+    return result
+
+
+@contextmanager
+def _nothing():
+    yield
+
+
+def run_simulation(levels, rows, endpoints=None, chunk_size=CHUNK_SIZE, seed=42,
+                   keepdb=False, log=None):
+    """
+    Run each concurrency level in ``levels`` in turn; returns
+    ``{'environment', 'levels'}``.
+    """
+    if endpoints is None:
+        available = sync_endpoints()
+        endpoints = {route: available[route] for route in DSN_ENDPOINTS}
+    results = []
+    with simulation_database(keepdb=keepdb), live_server() as base_url:
+        meta = environment()
+        meta.update(endpoints=list(endpoints), rows=rows, chunk_size=chunk_size, seed=seed)
+        for clients in levels:
+            result = run_level(base_url, endpoints, clients, rows, chunk_size, seed)
+            results.append(result)
+            if log is not None:
+                log(result)
+    return {'environment': meta, 'levels': results}
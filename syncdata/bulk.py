@@ -0,0 +1,317 @@
+"""
+Shared bulk loader for the sync endpoints.
+
+PostgreSQL rows are streamed through ``COPY <table> (...) FROM STDIN``; every
+other backend gets multi-row ``INSERT ... VALUES (...), (...)`` batches sized
+to the backend's bound-parameter limit.  Rows are plain tuples in the order of
+``BulkLoader.fields``; ``load_dicts`` builds those tuples from validated
+serializer data.
+
+A loader with a ``conflict`` policy writes tables whose key repeats within a
+push (the ledger tables key on ``code``, the invmast tables on
+``customerid``).  Each batch is first collapsed in memory to one row per key,
+then written with ``INSERT ... ON CONFLICT`` (on PostgreSQL, COPYed into a
+temporary table and inserted from there):
+
+* ``last``  – the last row for a key wins;
+* ``first`` – the first row for a key is kept, later ones are dropped;
+* ``sum``   – the ``summed`` columns (default: every numeric one) are added
+  up, the rest is last-wins.
+"""
+import datetime
+import hashlib
+from operator import itemgetter
+
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.utils import timezone
+
+# Bytes handed to the driver per read() call while streaming COPY data.
+COPY_READ_SIZE = 64 * 1024
+
+CONFLICT_POLICIES = ('last', 'first', 'sum')
+
+# Columns the ``sum`` policy adds up
+SUMMABLE_FIELDS = (models.IntegerField, models.DecimalField, models.FloatField)
+
+
+def insert_fields(model):
+    """Concrete fields that take part in an INSERT (auto-created PKs skipped)."""
+    return [
+        f for f in model._meta.concrete_fields
+        if not f.primary_key or not f.auto_created
+    ]
+
+
+def _copy_escape(value):
+    """Render one value in COPY text format."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    text = str(value)
+    if '\\' in text or '\t' in text or '\n' in text or '\r' in text:
+        text = (text.replace('\\', '\\\\').replace('\t', '\\t')
+                    .replace('\n', '\\n').replace('\r', '\\r'))
+    return text
+
+
+class _CopyStream:
+    """File-like object that renders rows to COPY text lazily on read()."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = '\t'.join([_copy_escape(v) for v in row]) + '\n'
+            parts.append(line)
+            length += len(line)
+            self.count += 1
+        data = ''.join(parts)
+        if size < 0 or len(data) <= size:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+class BulkLoader:
+    """
+    Insert rows for ``model`` as fast as the active backend allows.
+
+        loader = BulkLoader(AccLedger)
+        loader.load_dicts(serializer.validated_data)
+
+    ``load`` and ``load_dicts`` return the number of rows written.  They do not
+    open a transaction of their own; callers wrap them in ``transaction.atomic``
+    exactly as they did around ``bulk_create``/``executemany``.
+
+    With ``conflict`` (one of ``CONFLICT_POLICIES``) rows whose ``key``
+    columns (default: the primary key) match another row of the same call or
+    a row already in the table are merged by that policy instead of failing;
+    every row passed in counts as written.  The key needs a unique index.
+    ``summed`` names the columns the ``sum`` policy adds up.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, model, fields=None, using=DEFAULT_DB_ALIAS, batch_size=None,
+                 table=None, conflict=None, key=None, summed=None):
+        self.model = model
+        self.fields = list(fields) if fields is not None else insert_fields(model)
+        self.columns = [f.column for f in self.fields]
+        # ``table`` loads a table shaped like the model's, e.g. a shadow copy
+        self.table = table or model._meta.db_table
+        self.using = using
+        if batch_size:
+            self.batch_size = batch_size
+        if conflict is not None and conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy {conflict!r}; expected one of {CONFLICT_POLICIES}")
+        self.conflict = conflict
+        self.key = list(key) if key else [model._meta.pk.column]
+        if conflict is not None:
+            missing = set(self.key) - set(self.columns)
+            if missing:
+                raise ValueError(f"Conflict key column(s) {sorted(missing)} are not loaded")
+            positions = [self.columns.index(c) for c in self.key]
+            self._key_of = itemgetter(*positions) if len(positions) > 1 else itemgetter(positions[0])
+            self._summed = [
+                i for i, f in enumerate(self.fields)
+                if f.column not in self.key
+                and (f.column in summed if summed is not None else isinstance(f, SUMMABLE_FIELDS))
+            ]
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    # ── Row building ─────────────────────────────────────────────────────────
+
+    def _field_defaults(self):
+        """Per-field fallback for keys missing from a validated dict."""
+        now = timezone.now()
+        defaults = []
+        for f in self.fields:
+            if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False):
+                defaults.append(now)
+            elif f.has_default():
+                defaults.append(f.get_default())
+            else:
+                defaults.append(None)
+        return defaults
+
+    def rows_from_dicts(self, items):
+        """Yield insert tuples from dicts keyed by field attname."""
+        names = [f.attname for f in self.fields]
+        defaults = self._field_defaults()
+        pairs = list(zip(names, defaults))
+        for item in items:
+            yield tuple([item.get(name, default) for name, default in pairs])
+
+    # ── Loading ──────────────────────────────────────────────────────────────
+
+    def load_dicts(self, items):
+        return self.load(self.rows_from_dicts(items))
+
+    def load(self, rows):
+        if self.conflict is not None:
+            return self._load_merged(rows)
+        if self.connection.vendor == 'postgresql':
+            return self._load_copy(rows)
+        return self._load_values(rows)
+
+    def _load_copy(self, rows, table=None):
+        # ``table``: an already quoted name to COPY into instead
+        qn = self.connection.ops.quote_name
+        sql = (
+            f"COPY {table or qn(self.table)} ({', '.join(qn(c) for c in self.columns)}) "
+            f"FROM STDIN"
+        )
+        stream = _CopyStream(rows)
+        with self.connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, stream, size=COPY_READ_SIZE)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    while True:
+                        chunk = stream.read(COPY_READ_SIZE)
+                        if not chunk:
+                            break
+                        copy.write(chunk)
+        return stream.count
+
+    def _values_batch_size(self):
+        max_params = self.connection.features.max_query_params
+        if not max_params:
+            return self.batch_size
+        return max(1, min(self.batch_size, max_params // max(len(self.fields), 1)))
+
+    def _load_values(self, rows, suffix=''):
+        conn = self.connection
+        qn = conn.ops.quote_name
+        prefix = (
+            f"INSERT INTO {qn(self.table)} "
+            f"({', '.join(qn(c) for c in self.columns)}) VALUES "
+        )
+        one_row = '(' + ', '.join(['%s'] * len(self.fields)) + ')'
+        batch_size = self._values_batch_size()
+        fields = self.fields
+
+        count = 0
+        batch = []
+        with conn.cursor() as cursor:
+            def flush():
+                sql = prefix + ', '.join([one_row] * len(batch)) + suffix
+                params = [
+                    f.get_db_prep_save(v, conn)
+                    for row in batch
+                    for f, v in zip(fields, row)
+                ]
+                cursor.execute(sql, params)
+
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    flush()
+                    count += len(batch)
+                    batch = []
+            if batch:
+                flush()
+                count += len(batch)
+        return count
+
+    # ── Conflict policies ────────────────────────────────────────────────────
+
+    def merge(self, rows):
+        """Collapse ``rows`` to one per key by the conflict policy; returns ``(rows, count)``."""
+        key_of, policy = self._key_of, self.conflict
+        merged = {}
+        count = 0
+        for row in rows:
+            count += 1
+            key = key_of(row)
+            if policy == 'last':
+                merged[key] = row
+                continue
+            seen = merged.get(key)
+            if seen is None:
+                merged[key] = row
+            elif policy == 'sum':
+                merged[key] = self._add(seen, row)
+        return list(merged.values()), count
+
+    def _add(self, seen, row):
+        out = list(row)
+        for i in self._summed:
+            a, b = seen[i], row[i]
+            out[i] = b if a is None else a if b is None else a + b
+        return tuple(out)
+
+    def _on_conflict(self):
+        qn = self.connection.ops.quote_name
+        table = qn(self.table)
+        target = ', '.join(qn(c) for c in self.key)
+        summed = {self.columns[i] for i in self._summed}
+        updates = []
+        for column in self.columns:
+            if column in self.key:
+                continue
+            c = qn(column)
+            if self.conflict == 'sum' and column in summed:
+                updates.append(f"{c} = COALESCE({table}.{c} + EXCLUDED.{c}, {table}.{c}, EXCLUDED.{c})")
+            else:
+                updates.append(f"{c} = EXCLUDED.{c}")
+        if self.conflict == 'first' or not updates:
+            return f" ON CONFLICT ({target}) DO NOTHING"
+        return f" ON CONFLICT ({target}) DO UPDATE SET {', '.join(updates)}"
+
+    def upsert(self, rows):
+        """
+        Merge ``rows``, whose keys must already be distinct, into the table by
+        the conflict policy: one multi-row INSERT ... ON CONFLICT per batch,
+        without ``load``'s in-memory merge and staging table.
+        """
+        return self._load_values(rows, suffix=self._on_conflict())
+
+    def _staging_table(self):
+        # Per connection, reused by every load; named per column set
+        digest = hashlib.md5(','.join(self.columns).encode()).hexdigest()[:8]
+        return f"{self.table[:40]}__merge_{digest}"
+
+    def _load_merged(self, rows):
+        rows, count = self.merge(rows)
+        if not rows:
+            return count
+        if self.connection.vendor != 'postgresql':
+            self._load_values(rows, suffix=self._on_conflict())
+            return count
+        qn = self.connection.ops.quote_name
+        staging = 'pg_temp.' + qn(self._staging_table())
+        columns = ', '.join(qn(c) for c in self.columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} AS "
+                f"SELECT {columns} FROM {qn(self.table)} WITH NO DATA"
+            )
+            cursor.execute(f"TRUNCATE {staging}")
+        self._load_copy(rows, table=staging)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(self.table)} ({columns}) "
+                f"SELECT {columns} FROM {staging}{self._on_conflict()}"
+            )
+        return count
@@ -0,0 +1,174 @@
+"""
+Response cache for the polled GET endpoints.
+
+The dashboards poll acc-master, acc-product and rrc-clients every few
+minutes, but those tables only change when a DSN syncs.  Views with
+``cache_responses = True`` therefore answer GETs from memory:
+
+* Every table has data versions, bumped by each POST and DELETE that goes
+  through ``SyncAPIView``: one per client_id, an epoch for writes that
+  replace every client's rows, and one for the whole table.  A GET
+  filtered to a client depends on (epoch, client version), an unfiltered
+  one on the table version.
+* Versions are small files in ``SYNC_CACHE_VERSION_DIR`` (rewritten with a
+  fresh token on every bump), so every worker process sees a bump without
+  a database query.
+* The ETag is a hash of the request (path, query, client_id) and the data
+  version, so ``If-None-Match`` is answered with 304 from the version
+  files alone.
+* Encoded bodies are kept in a per-process LRU bounded by
+  ``SYNC_RESPONSE_CACHE_BYTES``.  Full-table bodies are streamed and
+  copied into the cache as they go out, unless they grow past a quarter
+  of it.
+
+Writes to these tables that bypass the API are not seen; the cached views
+are the ones only the sync tool writes to.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# No single response may take more than this share of the cache.
+MAX_ENTRY_SHARE = 4
+
+ALL_CLIENTS = 'all'
+EPOCH = 'epoch'
+
+
+def _version_dir():
+    return getattr(settings, 'SYNC_CACHE_VERSION_DIR', None)
+
+
+def _client_scope(client_id):
+    # client_id is arbitrary text; keep it out of the file name
+    return 'c-' + hashlib.sha1(client_id.encode()).hexdigest()[:16]
+
+
+def _version_path(directory, table, scope):
+    return os.path.join(directory, f'{table}.{scope}')
+
+
+def _write_token(path):
+    token = uuid.uuid4().hex
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    os.replace(temp, path)
+    return token
+
+
+def _read_token(directory, table, scope):
+    path = _version_path(directory, table, scope)
+    try:
+        with open(path) as f:
+            token = f.read()
+        if token:
+            return token
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+    # First read since the directory was cleared: start a new version so an
+    # old ETag cannot match data written in the meantime.
+    return _write_token(path)
+
+
+def data_version(table, client_id=''):
+    """Version of what a GET of ``table`` (filtered to ``client_id``) returns; None if disabled."""
+    directory = _version_dir()
+    if not directory:
+        return None
+    if client_id:
+        return (_read_token(directory, table, EPOCH) + '.'
+                + _read_token(directory, table, _client_scope(client_id)))
+    return _read_token(directory, table, ALL_CLIENTS)
+
+
+def bump_version(table, client_id=''):
+    """Record that ``client_id``'s rows of ``table`` (every row when empty) changed."""
+    directory = _version_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write_token(_version_path(directory, table, ALL_CLIENTS))
+    scope = _client_scope(client_id) if client_id else EPOCH
+    _write_token(_version_path(directory, table, scope))
+
+
+def request_key(request, client_id=''):
+    """What the response to ``request`` depends on besides the data version."""
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    return f'{request.path}?{query}#{client_id}'
+
+
+def make_etag(key, version):
+    return '"' + hashlib.sha1(f'{key}@{version}'.encode()).hexdigest()[:32] + '"'
+
+
+class ResponseCache:
+    """LRU of encoded response bodies, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    @property
+    def max_entry_bytes(self):
+        return self.max_bytes // MAX_ENTRY_SHARE
+
+    def set(self, key, etag, body):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def tee(self, key, etag, chunks):
+        """
+        Yield ``chunks`` and cache their concatenation once they are exhausted.
+
+        Chunks are only buffered while the total fits one entry; past that
+        the buffer is dropped and the response is not cached.  A response
+        that is not read to the end is not cached either.
+        """
+        buffer = []
+        size = 0
+        for chunk in chunks:
+            if buffer is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    buffer = None
+                else:
+                    buffer.append(chunk)
+            yield chunk
+        if buffer is not None:
+            self.set(key, etag, b''.join(buffer))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+RESPONSE_CACHE = ResponseCache(getattr(settings, 'SYNC_RESPONSE_CACHE_BYTES', DEFAULT_MAX_BYTES))
@@ -0,0 +1,67 @@
+"""
+Validation of the sync settings that name tables.
+
+``SYNC_CONFLICT_POLICIES`` is a list of ``table=policy`` entries (see
+master/settings.py).  ``conflict_policies()`` parses it once per value.  A
+bad entry is left out and logged, so it never turns a push into a 500.
+The ``syncdata.E001`` system check reports bad entries when ``manage.py
+check``, ``migrate`` or ``runserver`` starts.
+"""
+import functools
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+
+from .bulk import CONFLICT_POLICIES, insert_fields
+
+logger = logging.getLogger(__name__)
+
+
+def _entries(value):
+    if isinstance(value, dict):
+        return tuple(value.items())
+    return tuple(tuple(item.split('=', 1)) if '=' in item else (item, None) for item in value)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse(entries):
+    models = {m._meta.db_table: m for m in apps.get_app_config('syncdata').get_models()}
+    policies = {}
+    problems = []
+    for table, policy in entries:
+        table = table.strip()
+        model = models.get(table)
+        if policy is None:
+            problems.append(f"{table!r} is not a table=policy entry")
+        elif model is None:
+            problems.append(f"{table!r} is not a syncdata table")
+        elif policy.strip() not in CONFLICT_POLICIES:
+            problems.append(f"{table}: unknown policy {policy.strip()!r}; expected one of {CONFLICT_POLICIES}")
+        elif model._meta.pk not in insert_fields(model):
+            problems.append(f"{table}: its primary key is generated, so there is no pushed key to merge on")
+        else:
+            policies[table] = policy.strip()
+    for problem in problems:
+        logger.error("SYNC_CONFLICT_POLICIES - ignoring %s", problem)
+    return policies, tuple(problems)
+
+
+def parse_conflict_policies():
+    """``({table: policy}, problems)`` for the current SYNC_CONFLICT_POLICIES."""
+    return _parse(_entries(getattr(settings, 'SYNC_CONFLICT_POLICIES', ())))
+
+
+def conflict_policies():
+    """The valid entries of SYNC_CONFLICT_POLICIES as ``{table: policy}``."""
+    return parse_conflict_policies()[0]
+
+
+@checks.register()
+def check_conflict_policies(app_configs, **kwargs):
+    _, problems = parse_conflict_policies()
+    return [
+        checks.Error(f"SYNC_CONFLICT_POLICIES: {problem}", id='syncdata.E001')
+        for problem in problems
+    ]
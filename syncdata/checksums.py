@@ -0,0 +1,292 @@
+"""
+Bucketed checksums: skip re-pushing a client's rows that have not changed.
+
+The client-scoped master tables are reloaded for every DSN on every run,
+although they rarely change.  With checksums the sync tool first asks for
+the server's hashes and then sends only the rows that differ:
+
+    GET  <endpoint>/checksum/?client_id=C&buckets=N
+         → {"count": ..., "buckets": N, "hashes": [...], "key": ..., "columns": [...]}
+    POST <endpoint>/checksum/?client_id=C&buckets=N&changed=3,17
+         body: every source row that falls in buckets 3 and 17
+         → the client's rows in those buckets are replaced by the body;
+           the response has the new hashes of those buckets
+
+When nothing changed, the sync tool makes only the GET.
+
+Hashes are computed from the table on each request (the GET is cached per
+data version), so writes through the plain endpoints are picked up as well.
+To compare, the tool hashes its own rows the same way:
+
+* a row is its ``columns``, in order, with client_id left out.  Each value
+  is written as text: NULL as ``\\N``, decimals in fixed point with the
+  column's ``decimal_places``, dates as YYYY-MM-DD, and anything else with
+  ``str()``.  The values are joined with ``\\x1f``.  The row's hash is the
+  md5 of that text as UTF-8, read as a 128-bit integer;
+* a row's bucket is the first 8 hex digits of md5(key) mod N;
+* a bucket's hash is the sum of its rows' hashes mod 2**128, as 32 hex
+  digits.  Order does not matter, and an empty bucket is all zeros.
+
+Values are hashed as they are stored: strings are stripped, and on
+planet_clients blank strings are stored as NULL.
+"""
+import hashlib
+import logging
+import traceback
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.response import Response
+
+from .bulk import BulkLoader
+from .cache import data_version, request_key
+from .delta import DELETE_CHUNK
+from .log import summarize_errors
+from .parsers import is_record_list
+from .partitions import ensure_partition
+from .streaming import dumps
+from .views import (
+    SyncAPIView, PlanetClientsRecordView, AccMasterView, AccProductView, AccDepartmentView,
+)
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that negotiate by checksum → the view whose coercer and table
+# the rows are hashed and loaded with.
+CHECKSUM_ENDPOINTS = {
+    'rrc-clients': PlanetClientsRecordView,
+    'acc-master': AccMasterView,
+    'acc-product': AccProductView,
+    'acc-departments': AccDepartmentView,
+}
+
+DEFAULT_BUCKETS = 64
+MAX_BUCKETS = 4096
+
+NULL = '\\N'
+SEPARATOR = '\x1f'
+HASH_MODULUS = 2 ** 128
+
+
+def bucket_of(key, buckets):
+    """Bucket of natural key ``key`` among ``buckets``."""
+    return int(hashlib.md5(str(key).encode('utf-8')).hexdigest()[:8], 16) % buckets
+
+
+class TableChecksum:
+    """
+    Hash ``client_id``'s rows of ``coercer``'s table into buckets.
+
+        checksum = TableChecksum(AccMasterView.coercer, buckets=64)
+        count, hashes = checksum.compute('DSN01')
+        keys = checksum.keys_in('DSN01', {3, 17})
+    """
+
+    def __init__(self, coercer, buckets=DEFAULT_BUCKETS):
+        self.model = coercer.model
+        self.buckets = buckets
+        self.key = self.model._meta.pk
+        # client_id is the same on every row; auto_now columns change on every push
+        self.fields = [
+            f for f in coercer.fields
+            if f.attname != 'client_id'
+            and not (getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False))
+        ]
+        self.key_index = [f.attname for f in self.fields].index(self.key.attname)
+        self._formatters = [self._formatter(f) for f in self.fields]
+
+    @staticmethod
+    def _formatter(field):
+        if isinstance(field, models.DecimalField):
+            exponent = Decimal(1).scaleb(-field.decimal_places)
+            return lambda value: f"{Decimal(value).quantize(exponent):f}"
+        if isinstance(field, models.DateField):
+            return lambda value: value.isoformat()
+        return str
+
+    def columns(self):
+        return [
+            {"name": f.attname, "decimal_places": f.decimal_places}
+            if isinstance(f, models.DecimalField) else {"name": f.attname}
+            for f in self.fields
+        ]
+
+    def row_hash(self, row):
+        text = SEPARATOR.join(
+            NULL if value is None else fmt(value) for fmt, value in zip(self._formatters, row))
+        return int(hashlib.md5(text.encode('utf-8')).hexdigest(), 16)
+
+    def _rows(self, client_id):
+        return (self.model.objects.filter(client_id=client_id)
+                .values_list(*(f.attname for f in self.fields))
+                .iterator(chunk_size=2000))
+
+    def compute(self, client_id, only=None):
+        """``(count, hashes)`` of ``client_id``'s rows; ``only`` limits the buckets summed."""
+        sums = [0] * self.buckets
+        count = 0
+        for row in self._rows(client_id):
+            count += 1
+            bucket = bucket_of(row[self.key_index], self.buckets)
+            if only is None or bucket in only:
+                sums[bucket] = (sums[bucket] + self.row_hash(row)) % HASH_MODULUS
+        return count, [f"{total:032x}" for total in sums]
+
+    def keys_in(self, client_id, buckets):
+        """Natural keys of ``client_id``'s rows that fall in ``buckets``."""
+        keys = (self.model.objects.filter(client_id=client_id)
+                .values_list(self.key.attname, flat=True).iterator(chunk_size=2000))
+        return [key for key in keys if bucket_of(key, self.buckets) in buckets]
+
+    def delete_keys(self, client_id, keys):
+        """Delete ``client_id``'s rows with these natural keys; returns how many."""
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        deleted = 0
+        with connection.cursor() as cursor:
+            for i in range(0, len(keys), DELETE_CHUNK):
+                chunk = keys[i:i + DELETE_CHUNK]
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {qn('client_id')} = %s "
+                    f"AND {qn(self.key.column)} IN ({', '.join(['%s'] * len(chunk))})",
+                    [client_id, *chunk],
+                )
+                deleted += cursor.rowcount
+        return deleted
+
+
+class BucketLoader:
+    """BulkLoader that rejects rows whose key is outside the buckets being replaced."""
+
+    def __init__(self, loader, key_index, buckets, changed):
+        self.loader = loader
+        self.key_index = key_index
+        self.buckets = buckets
+        self.changed = changed
+
+    def load(self, rows):
+        for row in rows:
+            key = row[self.key_index]
+            if bucket_of(key, self.buckets) not in self.changed:
+                raise ValidationError({
+                    "error": "Record is outside the changed buckets",
+                    "key": key,
+                    "bucket": bucket_of(key, self.buckets),
+                })
+        return self.loader.load(rows)
+
+
+class ChecksumView(SyncAPIView):
+    """
+    GET  – row count and bucket hashes of a client's rows.
+    POST – replace the client's rows in ``?changed=`` buckets with the body.
+
+    client_id (X-Client-ID or ?client_id=) is required.  ``?buckets=`` must
+    be the same on both requests (default 64, at most 4096).
+    """
+
+    @property
+    def record_type(self):
+        view_class = CHECKSUM_ENDPOINTS.get(self.kwargs.get('endpoint'))
+        return view_class.record_type if view_class is not None else None
+
+    @property
+    def coercer(self):
+        # The target's table, so a POST bumps its cached GET responses
+        view_class = CHECKSUM_ENDPOINTS.get(self.kwargs.get('endpoint'))
+        return view_class.coercer if view_class is not None else None
+
+    def parse_request(self, request, endpoint):
+        """Return ``(client_id, buckets, error_response)``."""
+        if endpoint not in CHECKSUM_ENDPOINTS:
+            return None, None, Response(
+                {"error": f"Checksums are not available for {endpoint}"}, status=404)
+        client_id = self._get_client_id(request)
+        if not client_id:
+            return None, None, Response({"error": "client_id is required"}, status=400)
+        value = request.query_params.get("buckets", "").strip() or str(DEFAULT_BUCKETS)
+        try:
+            buckets = int(value)
+        except ValueError:
+            buckets = 0
+        if not 1 <= buckets <= MAX_BUCKETS:
+            return None, None, Response(
+                {"error": f"buckets must be a number from 1 to {MAX_BUCKETS}"}, status=400)
+        return client_id, buckets, None
+
+    def get(self, request, endpoint):
+        client_id, buckets, error = self.parse_request(request, endpoint)
+        if error is not None:
+            return error
+        checksum = TableChecksum(self.coercer, buckets)
+
+        def build():
+            count, hashes = checksum.compute(client_id)
+            return dumps({
+                "client_id": client_id,
+                "count": count,
+                "buckets": buckets,
+                "hashes": hashes,
+                "key": checksum.key.attname,
+                "columns": checksum.columns(),
+            }).encode()
+
+        version = data_version(checksum.model._meta.db_table, client_id)
+        if version is None:
+            return HttpResponse(build(), content_type="application/json")
+        return self.cached_response(request, request_key(request, client_id), version, build)
+
+    def post(self, request, endpoint):
+        client_id, buckets, error = self.parse_request(request, endpoint)
+        if error is not None:
+            return error
+        try:
+            changed = {int(b) for b in request.query_params.get("changed", "").split(",") if b.strip()}
+        except ValueError:
+            changed = None
+        if not changed or not all(0 <= b < buckets for b in changed):
+            return Response(
+                {"error": f"changed must list bucket numbers from 0 to {buckets - 1}"}, status=400)
+
+        data = request.data
+        if not is_record_list(data):
+            return Response({"error": "Expected a list of records"}, status=400)
+
+        coercer = self.coercer
+        checksum = TableChecksum(coercer, buckets)
+        loader = BucketLoader(
+            BulkLoader(coercer.model, fields=coercer.fields),
+            coercer.names.index(checksum.key.attname), buckets, changed)
+        try:
+            ensure_partition(coercer.model, client_id)
+            with transaction.atomic():
+                with self.metrics.stage("delete"):
+                    deleted = checksum.delete_keys(client_id, checksum.keys_in(client_id, changed))
+                saved, errors = self.validate_and_load(
+                    data, coercer, loader, fill={"client_id": client_id})
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    count, hashes = checksum.compute(client_id, only=changed)
+        except (ParseError, ValidationError):
+            raise
+        except Exception as e:
+            logger.error(f"{self.record_type} - Checksum push DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error"}, status=500)
+
+        if errors:
+            logger.error(f"{self.record_type} - Validation errors: {summarize_errors(errors)}")
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"{self.record_type} - Replaced {len(changed)} of {buckets} buckets: "
+                    f"deleted {deleted}, saved {saved} (client_id={client_id!r})")
+        return Response(
+            {"message": f"{endpoint} buckets replaced", "client_id": client_id,
+             "deleted": deleted, "count": saved, "total": count,
+             "hashes": {str(b): hashes[b] for b in sorted(changed)}},
+            status=status.HTTP_201_CREATED,
+        )
@@ -0,0 +1,338 @@
+"""
+Compiled per-model row coercion for the sync endpoints.
+
+``RowCoercer`` reads a model's concrete fields once and builds one converter
+per column, so turning a raw JSON record into an insert tuple is a single
+flat pass instead of clean_record → serializer.to_internal_value → DRF field
+validation.  The rules mirror what those three passes did together:
+
+* strings are ``str()``-ed and stripped; None becomes '' (or the field
+  default), and required fields reject missing/blank values;
+* decimals accept numbers or numeric strings, '' becomes None, unparseable
+  values are logged and stored as None, and digits/decimal places are checked
+  against the column exactly as DRF's DecimalField does;
+* dates accept the formats the DSN tools send (see ``dates.DateParser``;
+  the format is detected once per batch), unparseable values are logged and
+  stored as None;
+* auto_now/auto_now_add columns ignore the record and get the batch
+  timestamp.
+
+Errors are reported per field with the same messages DRF uses, so the
+per-record error lists returned by the views do not change shape.
+"""
+import datetime
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import insert_fields
+from .dates import DateParser
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class FieldError(Exception):
+    pass
+
+
+class RowError(Exception):
+    """A record failed coercion; ``errors`` maps field name → [messages]."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class RowCoercer:
+    """
+    Turn raw record dicts into insert tuples for ``model``.
+
+        coercer = RowCoercer(IMC1Record, defaults={'debit': 0.0})
+        row = coercer.coerce(record)          # tuple, or raises RowError
+        rows, errors = coercer.coerce_batch(records)
+
+    ``fields`` defaults to the same insert columns as ``BulkLoader``, so the
+    tuples can be handed straight to ``BulkLoader.load``.
+
+    ``defaults``       value used when a field is missing or None.
+    ``required``       field names that must be present and non-blank;
+                       defaults to every non-blank CharField without a default.
+    ``blank_to_null``  store '' as NULL on nullable columns (planet_clients).
+    ``rounding``       round decimals with this mode instead of rejecting
+                       values with too many decimal places.
+    """
+
+    def __init__(self, model, fields=None, defaults=None, required=None,
+                 blank_to_null=False, rounding=None):
+        self.model = model
+        self.fields = list(fields) if fields is not None else insert_fields(model)
+        self.columns = [f.column for f in self.fields]
+        self.names = [f.attname for f in self.fields]
+        self.defaults = dict(defaults or {})
+        self.blank_to_null = blank_to_null
+        self.rounding = rounding
+        if required is None:
+            required = [
+                f.attname for f in self.fields
+                if isinstance(f, models.CharField) and not f.blank and not f.has_default()
+            ]
+        self.required = frozenset(required)
+        self._date_parsers = []
+        self._auto_now = [
+            i for i, f in enumerate(self.fields)
+            if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+        ]
+        self._converters = [self._compile(f) for f in self.fields]
+
+    # ── Compilation ──────────────────────────────────────────────────────────
+
+    def _compile(self, field):
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            return lambda value: None
+
+        name = field.attname
+        required = name in self.required
+        if name in self.defaults:
+            default = self.defaults[name]
+        elif field.has_default():
+            default = field.get_default()
+        elif isinstance(field, (models.CharField, models.TextField)) and not (
+                self.blank_to_null and field.null):
+            default = ''
+        else:
+            default = None
+
+        if isinstance(field, models.DateTimeField):
+            convert = self._datetime_converter(field)
+        elif isinstance(field, models.DateField):
+            convert = self._date_converter(field)
+        elif isinstance(field, models.DecimalField):
+            convert = self._decimal_converter(field)
+        elif isinstance(field, models.FloatField):
+            convert = self._float_converter(field)
+        elif isinstance(field, models.IntegerField):
+            convert = self._integer_converter(field)
+        elif isinstance(field, (models.CharField, models.TextField)):
+            convert = self._string_converter(field, required)
+        else:
+            convert = None
+
+        nullable = field.null
+
+        def coerce(value):
+            if value is _MISSING:
+                if required:
+                    raise FieldError('This field is required.')
+                return default
+            if value is None and required:
+                raise FieldError('This field may not be null.')
+            if value is not None and convert is not None:
+                value = convert(value)
+            if value is None:
+                if default is None and not nullable:
+                    raise FieldError('This field may not be null.')
+                return default
+            return value
+
+        return coerce
+
+    def _string_converter(self, field, required):
+        max_length = field.max_length
+        blank_value = None if (self.blank_to_null and field.null and not required) else ''
+
+        def convert(value):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise FieldError('Not a valid string.')
+            value = str(value).strip()
+            if not value:
+                if required:
+                    raise FieldError('This field may not be blank.')
+                return blank_value
+            if max_length is not None and len(value) > max_length:
+                raise FieldError(
+                    f'Ensure this field has no more than {max_length} characters.'
+                )
+            return value
+
+        return convert
+
+    def _decimal_converter(self, field):
+        name = field.attname
+        max_digits = field.max_digits
+        max_places = field.decimal_places
+        max_whole = max_digits - max_places
+        quantum = Decimal(1).scaleb(-max_places)
+        rounding = self.rounding
+
+        def convert(value):
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    return None
+            try:
+                number = Decimal(str(value))
+                if not number.is_finite():
+                    raise InvalidOperation
+            except (ValueError, InvalidOperation, TypeError):
+                logger.warning("Could not convert %s to decimal: %r", name, value)
+                return None
+            if rounding is not None:
+                number = number.quantize(quantum, rounding=rounding)
+
+            # Same digit counting as rest_framework.fields.DecimalField
+            _, digits, exponent = number.as_tuple()
+            if exponent >= 0:
+                total = whole = len(digits) + exponent
+                places = 0
+            elif len(digits) > -exponent:
+                total = len(digits)
+                whole = total + exponent
+                places = -exponent
+            else:
+                total = places = -exponent
+                whole = 0
+            if total > max_digits:
+                raise FieldError(
+                    f'Ensure that there are no more than {max_digits} digits in total.'
+                )
+            if places > max_places:
+                raise FieldError(
+                    f'Ensure that there are no more than {max_places} decimal places.'
+                )
+            if whole > max_whole:
+                raise FieldError(
+                    f'Ensure that there are no more than {max_whole} digits '
+                    f'before the decimal point.'
+                )
+            return number
+
+        return convert
+
+    def _float_converter(self, field):
+        def convert(value):
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    return None
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise FieldError('A valid number is required.')
+
+        return convert
+
+    def _integer_converter(self, field):
+        def convert(value):
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    return None
+            try:
+                number = Decimal(str(value))
+                if number != number.to_integral_value():
+                    raise ValueError
+                return int(number)
+            except (TypeError, ValueError, InvalidOperation):
+                raise FieldError('A valid integer is required.')
+
+        return convert
+
+    def _date_converter(self, field):
+        name = field.attname
+        parser = DateParser()
+        self._date_parsers.append((name, parser))
+        parse = parser.parse
+
+        def convert(value):
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            if not isinstance(value, str):
+                raise FieldError('Date has wrong format.')
+            value = value.strip()
+            if not value:
+                return None
+            parsed = parse(value)
+            if parsed is None:
+                logger.warning("Could not parse %s: %r", name, value)
+            return parsed
+
+        return convert
+
+    def _datetime_converter(self, field):
+        def convert(value):
+            if isinstance(value, datetime.datetime):
+                return value
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if parsed is None:
+                raise FieldError('Datetime has wrong format.')
+            return parsed
+
+        return convert
+
+    # ── Coercion ─────────────────────────────────────────────────────────────
+
+    def _fill(self, record, fill):
+        if not fill:
+            return record
+        record = dict(record)
+        for name, value in fill.items():
+            if record.get(name) in (None, ''):
+                record[name] = value
+        return record
+
+    def coerce(self, record, fill=None, now=None):
+        """
+        Return the insert tuple for ``record`` or raise RowError.
+
+        ``fill`` supplies values for fields that are missing or blank in the
+        record (the request's client_id, for example).
+        """
+        if not isinstance(record, dict):
+            raise RowError({'non_field_errors': [
+                f'Invalid data. Expected a dictionary, but got {type(record).__name__}.'
+            ]})
+        record = self._fill(record, fill)
+        get = record.get
+        try:
+            row = [convert(get(name, _MISSING))
+                   for name, convert in zip(self.names, self._converters)]
+        except FieldError:
+            raise RowError(self._collect_errors(record))
+        if self._auto_now:
+            now = now or timezone.now()
+            for i in self._auto_now:
+                row[i] = now
+        return tuple(row)
+
+    def _collect_errors(self, record):
+        errors = {}
+        for name, convert in zip(self.names, self._converters):
+            try:
+                convert(record.get(name, _MISSING))
+            except FieldError as exc:
+                errors[name] = [str(exc)]
+        return errors
+
+    def coerce_batch(self, records, fill=None):
+        """
+        Coerce a batch; returns ``(rows, errors)`` where ``errors`` is a list
+        of ``(position, record, field_errors)`` for the records that failed.
+        """
+        now = timezone.now() if self._auto_now else None
+        for name, parser in self._date_parsers:
+            parser.detect(r.get(name) for r in records if isinstance(r, dict))
+        rows = []
+        errors = []
+        for i, record in enumerate(records):
+            try:
+                rows.append(self.coerce(record, fill, now))
+            except RowError as exc:
+                errors.append((i, record, exc.errors))
+        return rows, errors
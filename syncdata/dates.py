@@ -0,0 +1,151 @@
+"""
+Date parsing for synced records.
+
+The DSN tools send dates in one of ``DATE_FORMATS``, and a given DSN sticks
+to one of them.  Trying the formats in order with ``strptime`` costs a
+``ValueError`` per miss on every row, so ``DateParser`` instead:
+
+* pins the format detected from the first values of each batch and tries it
+  first;
+* parses ``YYYY-MM-DD`` (optionally followed by a time) with
+  ``date.fromisoformat`` and day-first formats with a split, falling back to
+  ``strptime`` only for irregular values such as unpadded ISO dates;
+* memoizes string → date results in a bounded LRU cache, since ledger dates
+  repeat heavily within a financial year.
+
+The formats never match the same string, so pinning only changes the order
+they are tried in, never the result; a parser can be shared between threads.
+"""
+import datetime
+from functools import lru_cache
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y')
+
+# Distinct date strings kept per process; a few years of daily ledgers.
+CACHE_SIZE = 4096
+
+# Values looked at per batch to pick the pinned format.
+DETECT_SAMPLE = 8
+
+
+def _is_iso_date(value):
+    return len(value) == 10 and value[4] == '-' and value[7] == '-'
+
+
+def _parse_iso(value):
+    if _is_iso_date(value):
+        return datetime.date.fromisoformat(value)
+    raise ValueError(value)
+
+
+def _parse_iso_datetime(value):
+    if len(value) == 19 and _is_iso_date(value[:10]) and value[10] == ' ':
+        return datetime.datetime.fromisoformat(value).date()
+    raise ValueError(value)
+
+
+def _day_first(sep):
+    def parse(value):
+        day, month, year = value.split(sep)
+        if len(year) != 4:
+            raise ValueError(value)
+        return datetime.date(int(year), int(month), int(day))
+    return parse
+
+
+# Fast parsers for the known formats; each raises ValueError on a mismatch.
+_FAST_PARSERS = {
+    '%Y-%m-%d': _parse_iso,
+    '%Y-%m-%d %H:%M:%S': _parse_iso_datetime,
+    '%d/%m/%Y': _day_first('/'),
+    '%d-%m-%Y': _day_first('-'),
+}
+
+
+def _strptime_parser(fmt):
+    def parse(value):
+        return datetime.datetime.strptime(value, fmt).date()
+    return parse
+
+
+class DateParser:
+    """
+    Parse date strings in one of ``formats``.
+
+        parser = DateParser()
+        parser.detect(['31/03/2024', '01/04/2024'])   # pins '%d/%m/%Y'
+        parser.parse('01/04/2024')                     # date(2024, 4, 1)
+        parser.parse('garbage')                        # None
+    """
+
+    def __init__(self, formats=DATE_FORMATS, cache_size=CACHE_SIZE):
+        self.formats = tuple(formats)
+        self.pinned = None
+        self._parsers = {
+            fmt: _FAST_PARSERS.get(fmt) or _strptime_parser(fmt) for fmt in self.formats
+        }
+        self._order = list(self.formats)
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _match(self, value):
+        """Return ``(format, date)`` for the first format that parses value."""
+        for fmt in self._order:
+            try:
+                return fmt, self._parsers[fmt](value)
+            except ValueError:
+                continue
+        # Fast parsers only take the canonical shapes; strptime also accepts
+        # unpadded fields such as '2024-4-1'.
+        for fmt in self.formats:
+            try:
+                return fmt, datetime.datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        # ISO timestamps such as '2024-01-31T00:00:00'
+        if len(value) > 10 and value[10] == 'T' and _is_iso_date(value[:10]):
+            try:
+                return None, datetime.date.fromisoformat(value[:10])
+            except ValueError:
+                pass
+        return None, None
+
+    def _parse(self, value):
+        return self._match(value.strip())[1]
+
+    def pin(self, fmt):
+        """Try ``fmt`` first from now on."""
+        if fmt is None or fmt == self.pinned:
+            return
+        self.pinned = fmt
+        self._order = [fmt] + [f for f in self.formats if f != fmt]
+
+    def detect(self, values):
+        """
+        Pin the format of the first parseable string among ``values``.
+
+        Only the first DETECT_SAMPLE strings are looked at; returns the pinned
+        format.
+        """
+        seen = 0
+        for value in values:
+            if not isinstance(value, str) or not value.strip():
+                continue
+            fmt, parsed = self._match(value.strip())
+            if parsed is not None and fmt is not None:
+                self.pin(fmt)
+                break
+            seen += 1
+            if seen >= DETECT_SAMPLE:
+                break
+        return self.pinned
+
+    def cache_info(self):
+        return self.parse.cache_info()
+
+
+_default_parser = DateParser()
+
+
+def parse_date(value):
+    """Parse ``value`` with the shared parser; None if no format matches."""
+    return _default_parser.parse(value)
@@ -0,0 +1,230 @@
+"""
+Delta sync for the full-table push endpoints.
+
+A normal push deletes the whole table and reinserts every row.  In delta mode
+the server keeps an md5 of each row's coerced values per natural key
+(``SyncRowDigest``) and compares incoming rows against it:
+
+* new keys are inserted;
+* keys whose hash changed are deleted and reinserted;
+* keys whose hash matches are left alone;
+* stored keys that the push did not contain are deleted.
+
+``DeltaSync`` has the same ``load(rows)`` interface as ``BulkLoader`` so the
+views feed it exactly as they feed the loader.  When a table has no stored
+hashes yet (first delta push, or a normal push since) it falls back to a full
+replace and records the hashes as it goes.
+
+A key that appears more than once in a push (IMC masters key on ``code``,
+which the schema does not enforce as unique) is hashed as a group, and its
+stored hash is marked as one (``GROUP_MARK``).  A key stored as a group can
+only be compared once the push is over, so its rows are held back and
+settled in ``finish``; any other key is decided by its first row, and a
+repeat is appended to the rows already written for it.  Each key counts
+once in the summary, whatever its number of rows.  With a ``conflict``
+policy (see bulk.py) a batch's repeated keys are merged into one row before
+hashing, and repeats in later batches are merged into the stored row by the
+loader's ON CONFLICT clause.
+"""
+import hashlib
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .bulk import BulkLoader
+from .models import SyncRowDigest
+
+# Keys per DELETE ... IN (...) statement; stays under SQLite's 999 parameters.
+DELETE_CHUNK = 500
+
+
+# First character of a group's hash; never a hex digit, so never a row's.
+GROUP_MARK = 'g'
+
+
+def row_digest(values):
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+
+def group_digest(previous, digest):
+    """Hash of a key's group so far (``previous``) extended by one row."""
+    return GROUP_MARK + row_digest([previous, digest])[1:]
+
+
+def invalidate_digests(model):
+    """Forget stored hashes for ``model`` after a non-delta rewrite."""
+    SyncRowDigest.objects.filter(table_name=model._meta.db_table).delete()
+
+
+class DeltaSync:
+    """
+    Apply a push to ``model`` as a delta against the stored row hashes.
+
+        delta = DeltaSync(IMC1Record, coercer, key='code').begin()
+        for rows in batches:
+            delta.load(rows)
+        delta.finish()
+        delta.summary()   # {'mode': 'delta', 'inserted': 3, 'updated': 1, ...}
+
+    Must run inside a transaction; ``begin`` to ``finish`` is one push.
+    """
+
+    def __init__(self, model, coercer, key=None, using=DEFAULT_DB_ALIAS, conflict=None, summed=None):
+        self.model = model
+        self.table = model._meta.db_table
+        self.using = using
+        self.loader = BulkLoader(model, fields=coercer.fields, using=using,
+                                 conflict=conflict, summed=summed)
+        key = key or model._meta.pk.attname
+        self.key_column = model._meta.get_field(key).column
+        self.key_index = coercer.names.index(key)
+        # auto_now columns change on every push; keep them out of the hash
+        self.hashed = [
+            i for i, f in enumerate(coercer.fields)
+            if not (getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False))
+        ]
+        self.mode = None
+        self.stored = {}
+        self.seen = {}
+        # key -> 'inserted' / 'updated' / 'unchanged', or 'pending' for a
+        # stored group whose rows wait in ``pending`` until ``finish``
+        self.status = {}
+        self.pending = {}
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def begin(self):
+        self.stored = dict(
+            SyncRowDigest.objects.using(self.using)
+            .filter(table_name=self.table)
+            .values_list('row_key', 'digest')
+        )
+        if self.stored:
+            self.mode = 'delta'
+        else:
+            # Nothing to compare against: rebuild the table and its hashes.
+            self.mode = 'full'
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.connection.ops.quote_name(self.table)}")
+        return self
+
+    def _delete_keys(self, table, column, keys, extra_where='', extra_params=()):
+        qn = self.connection.ops.quote_name
+        keys = list(keys)
+        deleted = 0
+        with self.connection.cursor() as cursor:
+            for i in range(0, len(keys), DELETE_CHUNK):
+                chunk = keys[i:i + DELETE_CHUNK]
+                cursor.execute(
+                    f"DELETE FROM {qn(table)} WHERE {extra_where}"
+                    f"{qn(column)} IN ({', '.join(['%s'] * len(chunk))})",
+                    [*extra_params, *chunk],
+                )
+                deleted += cursor.rowcount
+        return deleted
+
+    def load(self, rows):
+        """Apply one batch of insert tuples; returns the number of rows seen."""
+        merged_total = None
+        if self.loader.conflict is not None:
+            # Hash a batch's repeated keys as the one row the policy keeps,
+            # so an unchanged push still matches its stored hashes
+            rows, merged_total = self.loader.merge(rows)
+        seen = {}
+        status = {}
+        pending = {}
+        replace = []
+        write = []
+        total = 0
+        for row in rows:
+            total += 1
+            key = str(row[self.key_index])
+            digest = row_digest([row[i] for i in self.hashed])
+            previous = seen.get(key) or self.seen.get(key)
+            if previous is None:
+                seen[key] = digest
+                old = self.stored.get(key)
+                if old is None:
+                    status[key] = 'inserted'
+                    write.append(row)
+                elif old == digest:
+                    status[key] = 'unchanged'
+                elif old.startswith(GROUP_MARK):
+                    # Only the whole group can match it
+                    status[key] = 'pending'
+                    pending[key] = [row]
+                else:
+                    status[key] = 'updated'
+                    replace.append(key)
+                    write.append(row)
+                continue
+            # Repeated key: extend the group hash
+            seen[key] = group_digest(previous, digest)
+            state = status.get(key) or self.status[key]
+            if state == 'pending':
+                pending.setdefault(key, list(self.pending.get(key, ()))).append(row)
+                continue
+            if state == 'unchanged':
+                # The stored row is the group's first; the rest is new
+                status[key] = 'updated'
+            write.append(row)
+
+        if replace:
+            self._delete_keys(self.table, self.key_column, replace)
+        if write:
+            self.loader.load(write)
+
+        # Only record the batch once the SQL above has gone through, so a
+        # batch retried row by row after a failure is not counted twice.
+        self.seen.update(seen)
+        self.status.update(status)
+        self.pending.update(pending)
+        return total if merged_total is None else merged_total
+
+    def finish(self):
+        """Settle held-back groups, delete rows missing from the push and store the new hashes."""
+        replace = [key for key in self.pending if self.seen[key] != self.stored[key]]
+        for key in self.pending:
+            self.status[key] = 'unchanged'
+        if replace:
+            self._delete_keys(self.table, self.key_column, replace)
+            self.loader.load([row for key in replace for row in self.pending[key]])
+            self.status.update(dict.fromkeys(replace, 'updated'))
+        self.pending = {}
+        counts = Counter(self.status.values())
+        self.inserted = counts['inserted']
+        self.updated = counts['updated']
+        self.unchanged = counts['unchanged']
+
+        missing = [key for key in self.stored if key not in self.seen]
+        if missing:
+            self.deleted = self._delete_keys(self.table, self.key_column, missing)
+
+        changed = [
+            (self.table, key, digest) for key, digest in self.seen.items()
+            if self.stored.get(key) != digest
+        ]
+        digest_table = SyncRowDigest._meta.db_table
+        stale = missing + [key for _, key, _ in changed if key in self.stored]
+        qn = self.connection.ops.quote_name
+        self._delete_keys(
+            digest_table, 'row_key', stale,
+            extra_where=f"{qn('table_name')} = %s AND ", extra_params=[self.table],
+        )
+        BulkLoader(SyncRowDigest, using=self.using).load(changed)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'mode': self.mode,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'deleted': self.deleted,
+            'unchanged': self.unchanged,
+        }
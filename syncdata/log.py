@@ -0,0 +1,237 @@
+"""
+Logging for the sync endpoints.
+
+A push of 200k rows can produce a warning per row, and the stock
+``FileHandler`` writes each one on the request thread.  ``settings.LOGGING``
+wires these pieces together instead:
+
+* ``QueuedFileHandler`` only puts records on a bounded queue; a
+  ``QueueListener`` thread writes them to a size-rotated file.  When the
+  queue is full, records are dropped and counted, never waited on.
+* ``JSONLineFormatter`` writes each record as one JSON object per line.
+* ``RateLimitFilter`` lets a few WARNING-and-above records per message
+  template through each interval and folds the rest into a ``suppressed``
+  count on the next one that passes, or on a summary record the handler
+  writes once the interval is over and no such record came.  Per-row
+  messages therefore have to be logged %-style
+  (``logger.warning("Could not parse %s: %r", name, value)``) so that they
+  share a template.  INFO records pass untouched: the views
+  log them once per request or chunk, as f-strings that never repeat.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Records held in memory while the writer thread catches up.
+QUEUE_SIZE = 10000
+
+# Failing records described by summarize_errors.
+ERROR_SAMPLE = 5
+
+
+class JSONLineFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        suppressed = getattr(record, 'suppressed', None)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Pass at most ``burst`` records per ``interval`` seconds for each
+    (logger, message template) at ``level`` or above.
+
+    The first record through in a new interval carries ``suppressed``, the
+    number dropped in the previous one.  A burst that does not recur has no
+    such record: ``expired()`` hands its count over once the interval is
+    over, and ``flush()`` returns what is still pending when logging shuts
+    down.
+
+    At most ``max_keys`` templates are tracked.  When a new one arrives at
+    the limit, expired windows are swept (at most once per interval) and
+    then the oldest windows are dropped, their pending counts with them.
+    """
+
+    max_keys = 1000
+
+    def __init__(self, name='', interval=60, burst=10, level=logging.WARNING):
+        super().__init__(name)
+        self.interval = interval
+        self.burst = burst
+        self.level = level if isinstance(level, int) else logging.getLevelName(level)
+        self._windows = {}
+        self._swept = float('-inf')
+        self._reported = float('-inf')
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is None and len(self._windows) >= self.max_keys:
+                    self._make_room(now)
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                self._windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+    def _make_room(self, now):
+        if now - self._swept >= self.interval:
+            self._swept = now
+            for key, (start, _, suppressed) in list(self._windows.items()):
+                if now - start >= self.interval and not suppressed:
+                    del self._windows[key]
+        # Oldest first: dicts keep insertion order
+        while len(self._windows) >= self.max_keys:
+            del self._windows[next(iter(self._windows))]
+
+    def expired(self):
+        """
+        Return ``[(logger, levelno, template, count)]`` for windows that ended
+        with records suppressed, and forget them.  Checks at most once per
+        interval, so it is cheap to call after every record.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._reported < self.interval:
+                return []
+            self._reported = now
+            pending = []
+            for key, (start, _, suppressed) in list(self._windows.items()):
+                if suppressed and now - start >= self.interval:
+                    pending.append((*key, suppressed))
+                    del self._windows[key]
+        return pending
+
+    def flush(self):
+        """Return ``[(logger, levelno, template, count)]`` still suppressed."""
+        with self._lock:
+            pending = [(*key, window[2]) for key, window in self._windows.items() if window[2]]
+            self._windows.clear()
+        return pending
+
+
+class QueuedFileHandler(QueueHandler):
+    """
+    Log to a rotating file from a background thread.
+
+    Takes ``RotatingFileHandler``'s file arguments.  The formatter set on
+    this handler is used by the file handler, so formatting happens on the
+    writer thread too.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding='utf-8',
+                 queue_size=QUEUE_SIZE):
+        super().__init__(queue.Queue(queue_size))
+        self.target = RotatingFileHandler(
+            filename, maxBytes=maxBytes, backupCount=backupCount,
+            encoding=encoding, delay=True,
+        )
+        self.dropped = 0
+        self._pid = None
+        self.listener = None
+        self._start_lock = threading.Lock()
+        # A lock held by another thread at fork time would stay held in the child
+        os.register_at_fork(after_in_child=self._reset_start_lock)
+
+    def _reset_start_lock(self):
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def _start(self):
+        # Threads do not survive a fork, so each worker process starts its own.
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Merge args and exception text now; the record must not hold
+        # references to request objects while it waits in the queue.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            self.enqueue(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f'Log queue full; dropped {dropped} records',
+            }))
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+        # Counts of bursts that ended with no later record to carry them
+        for f in self.filters:
+            for summary in suppressed_records(getattr(f, 'expired', list)()):
+                self.enqueue(summary)
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+        for f in self.filters:
+            for summary in suppressed_records(getattr(f, 'flush', list)()):
+                self.target.handle(summary)
+        self.target.close()
+        super().close()
+
+
+def suppressed_records(pending):
+    """Log records reporting RateLimitFilter's ``(logger, levelno, template, count)``."""
+    for name, levelno, template, count in pending:
+        yield logging.makeLogRecord({
+            'name': name, 'levelno': levelno,
+            'levelname': logging.getLevelName(levelno),
+            'msg': f'Suppressed {count} records like: {template}',
+        })
+
+
+def summarize_errors(errors, limit=ERROR_SAMPLE):
+    """One-line description of a per-record error list for the log."""
+    failing = [(i, e) for i, e in enumerate(errors) if e]
+    sample = json.dumps(dict(failing[:limit]), default=str)
+    return f"{len(failing)} of {len(errors)} records invalid; first {min(len(failing), limit)}: {sample}"
@@ -0,0 +1,107 @@
+"""
+Compare insert strategies for the sync tables.
+
+    python manage.py bench_bulkload --rows 100000
+    python manage.py bench_bulkload --model syncdata.IMC1Record --rows 50000
+
+Every strategy runs inside a transaction that is rolled back, so the target
+table is left untouched.  The table must already exist.
+"""
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+
+from syncdata.bulk import BulkLoader, insert_fields
+
+
+def synthetic_rows(fields, count, seed=42):
+    """Deterministic rows shaped like the model's insert columns."""
+    rnd = random.Random(seed)
+    base_date = datetime.date(2024, 4, 1)
+    makers = []
+    for f in fields:
+        if isinstance(f, models.DecimalField):
+            scale = Decimal(1).scaleb(-min(f.decimal_places, 3))
+            whole = 10 ** min(f.max_digits - f.decimal_places, 6) - 1
+            makers.append(lambda i, w=whole, s=scale: Decimal(rnd.randint(0, w)) + s * rnd.randint(0, 999))
+        elif isinstance(f, models.FloatField):
+            makers.append(lambda i: round(rnd.uniform(0, 100000), 2))
+        elif isinstance(f, models.IntegerField):
+            makers.append(lambda i: rnd.randint(0, 1000))
+        elif isinstance(f, models.DateTimeField):
+            now = datetime.datetime.now(datetime.timezone.utc)
+            makers.append(lambda i, n=now: n)
+        elif isinstance(f, models.DateField):
+            makers.append(lambda i: base_date + datetime.timedelta(days=rnd.randint(0, 365)))
+        elif f.primary_key:
+            makers.append(lambda i: f"K{i:08d}")
+        else:
+            length = min(f.max_length or 40, 24)
+            makers.append(lambda i, n=length: f"val {rnd.randint(0, 10 ** 6)} text"[:n])
+    return [tuple(make(i) for make in makers) for i in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Benchmark executemany vs bulk_create vs BulkLoader on a sync table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default='syncdata.AccLedger',
+                            help='app_label.ModelName of the target table')
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--skip-executemany', action='store_true',
+                            help='executemany is very slow on large row counts')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+
+        fields = insert_fields(model)
+        rows = synthetic_rows(fields, options['rows'])
+        self.stdout.write(
+            f"{model._meta.db_table}: {len(rows)} rows x {len(fields)} columns "
+            f"on {connection.vendor}"
+        )
+
+        strategies = []
+        if not options['skip_executemany']:
+            strategies.append(('executemany', self._executemany))
+        strategies.append(('bulk_create', self._bulk_create))
+        strategies.append(('BulkLoader', self._bulk_loader))
+
+        for name, run in strategies:
+            best = None
+            for _ in range(options['repeat']):
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    run(model, fields, rows)
+                    elapsed = time.perf_counter() - start
+                    transaction.set_rollback(True)
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(
+                f"  {name:<12} {best:8.3f}s  {len(rows) / best:12,.0f} rows/sec"
+            )
+
+    def _executemany(self, model, fields, rows):
+        cols = ', '.join(f.column for f in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        with connection.cursor() as cur:
+            cur.executemany(
+                f"INSERT INTO {model._meta.db_table} ({cols}) VALUES ({placeholders})",
+                rows,
+            )
+
+    def _bulk_create(self, model, fields, rows):
+        names = [f.attname for f in fields]
+        objs = [model(**dict(zip(names, row))) for row in rows]
+        model.objects.bulk_create(objs, batch_size=1000)
+
+    def _bulk_loader(self, model, fields, rows):
+        BulkLoader(model, fields=fields).load(rows)
@@ -0,0 +1,94 @@
+"""
+Microbenchmark for ledger date parsing.
+
+    python manage.py bench_dates --rows 200000 --format %d/%m/%Y
+
+Dates are drawn from one financial year with a few entries per day, the way
+ledger exports look, and parsed three ways: the old try-every-format
+``strptime`` loop, ``DateParser`` with the cache disabled, and ``DateParser``
+as the coercer uses it (format detected per batch, memoized).
+"""
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from syncdata.dates import CACHE_SIZE, DATE_FORMATS, DateParser
+
+BATCH_SIZE = 500
+
+
+def ledger_dates(count, fmt, seed=42):
+    """``count`` date strings from one financial year, in ``fmt``."""
+    rnd = random.Random(seed)
+    start = datetime.date(2024, 4, 1)
+    return [
+        (start + datetime.timedelta(days=rnd.randint(0, 364))).strftime(fmt)
+        for _ in range(count)
+    ]
+
+
+def strptime_loop(values):
+    out = []
+    for value in values:
+        for fmt in DATE_FORMATS:
+            try:
+                out.append(datetime.datetime.strptime(value, fmt).date())
+                break
+            except ValueError:
+                continue
+        else:
+            out.append(None)
+    return out
+
+
+def date_parser(values, cache_size):
+    parser = DateParser(cache_size=cache_size)
+    out = []
+    for i in range(0, len(values), BATCH_SIZE):
+        batch = values[i:i + BATCH_SIZE]
+        parser.detect(batch)
+        out.extend(parser.parse(v) for v in batch)
+    return out
+
+
+class Command(BaseCommand):
+    help = "Benchmark the strptime loop against DateParser on ledger-like dates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--format', dest='formats', action='append',
+                            help='date format to generate (repeatable); '
+                                 'defaults to every supported format')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        formats = options['formats'] or list(DATE_FORMATS)
+        unknown = set(formats) - set(DATE_FORMATS)
+        if unknown:
+            raise CommandError(f"Unsupported format(s): {', '.join(sorted(unknown))}")
+
+        strategies = [
+            ('strptime loop', strptime_loop),
+            ('DateParser (no cache)', lambda v: date_parser(v, cache_size=0)),
+            ('DateParser', lambda v: date_parser(v, cache_size=CACHE_SIZE)),
+        ]
+        for fmt in formats:
+            values = ledger_dates(options['rows'], fmt)
+            self.stdout.write(f"{fmt!r}: {len(values)} values, {len(set(values))} distinct")
+            expected = None
+            for name, run in strategies:
+                best = None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    result = run(values)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                if expected is None:
+                    expected = result
+                elif result != expected:
+                    raise CommandError(f"{name} disagrees with the strptime loop on {fmt!r}")
+                self.stdout.write(
+                    f"  {name:<22} {best:8.3f}s  {len(values) / best:12,.0f} rows/sec"
+                )
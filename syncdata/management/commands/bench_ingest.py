@@ -0,0 +1,82 @@
+"""
+End-to-end ingest benchmark for the sync endpoints.
+
+    python manage.py bench_ingest --size 1k --size 100k
+    python manage.py bench_ingest --endpoint acc-ledgers/ --size 1m --skip-get
+    python manage.py bench_ingest --format csv --output after.json --compare before.json
+
+Each endpoint is POSTed a generated payload and then read back with GET,
+through the real views, in a test database created for the run (see
+``syncdata.benchmarks``).  Results are printed and, with ``--output``,
+saved as JSON.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from syncdata.benchmarks.generators import ENCODERS, parse_size, sync_endpoints
+from syncdata.benchmarks.harness import compare, run_suite
+
+
+class Command(BaseCommand):
+    help = "Benchmark POST and GET on every sync endpoint with generated payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', dest='sizes', action='append',
+                            help='records per payload: 1k, 100k, 1m or a number '
+                                 '(repeatable; default 1k)')
+        parser.add_argument('--endpoint', dest='endpoints', action='append',
+                            help='route under /api/sync/, e.g. acc-ledgers/ (repeatable; '
+                                 'default every push endpoint)')
+        parser.add_argument('--format', choices=sorted(ENCODERS), default='json')
+        parser.add_argument('--skip-get', action='store_true')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in options['sizes'] or ['1k']]
+        except ValueError as e:
+            raise CommandError(f"Invalid --size: {e}")
+
+        endpoints = sync_endpoints()
+        if options['endpoints']:
+            wanted = [e if e.endswith('/') else e + '/' for e in options['endpoints']]
+            unknown = set(wanted) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+            endpoints = {route: endpoints[route] for route in wanted}
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        self.stdout.write(f"{'endpoint':<22} {'method':<6} {'rows':>8} {'status':>6} "
+                          f"{'seconds':>9} {'rows/sec':>12} {'queries':>8} {'+rss MB':>8}")
+        report = run_suite(
+            endpoints, sizes, fmt=options['format'], include_get=not options['skip_get'],
+            seed=options['seed'], keepdb=options['keepdb'], log=self._print_result,
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            self.stdout.write(f"\nCompared with {options['compare']} "
+                              f"({baseline['environment'].get('revision') or 'unknown revision'}):")
+            for endpoint, method, size, before, after, change in compare(baseline, report):
+                self.stdout.write(f"  {endpoint:<22} {method:<6} {size:>8} "
+                                  f"{before:>12,.0f} → {after:>12,.0f}  {change:+6.1f}%")
+
+    def _print_result(self, r):
+        rate = f"{r['rows_per_sec']:>12,.0f}" if r['rows_per_sec'] else f"{'-':>12}"
+        self.stdout.write(
+            f"{r['endpoint']:<22} {r['method']:<6} {r['rows']:>8} {r['status']:>6} "
+            f"{r['seconds']:>9.3f} {rate} {r['queries']:>8} {r['rss_growth_mb']:>8.1f}"
+        )
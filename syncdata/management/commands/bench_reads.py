@@ -0,0 +1,101 @@
+"""
+Compare the GET read paths: DRF serializers against readers.ValuesReader.
+
+    python manage.py bench_reads --rows 100k
+    python manage.py bench_reads --rows 100k --endpoint rrc-clients/ --endpoint imc1/
+
+Each endpoint's table is filled with generated rows in a throw-away test
+database, then read back into the streamed JSON body both ways.  The two
+bodies must be identical; the command fails if they are not.
+"""
+import gc
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.serializers import ModelSerializer
+
+from syncdata import serializers as sync_serializers
+from syncdata.benchmarks.generators import parse_size, record_generator, sync_endpoints
+from syncdata.benchmarks.harness import CLIENT_ID, bench_database
+from syncdata.bulk import BulkLoader
+from syncdata.readers import ValuesReader
+from syncdata.streaming import CHUNK_SIZE, json_array_chunks, row_batches
+
+
+def serializer_for(model):
+    """The ModelSerializer in syncdata.serializers whose Meta.model is ``model``."""
+    for value in vars(sync_serializers).values():
+        if (isinstance(value, type) and issubclass(value, ModelSerializer)
+                and getattr(getattr(value, 'Meta', None), 'model', None) is model):
+            return value
+    return None
+
+
+def fill_table(view_class, rows, seed=42):
+    coercer = view_class.coercer
+    loader = BulkLoader(coercer.model, fields=coercer.fields)
+    records = record_generator(view_class, rows, seed=seed)
+    fill = {'client_id': CLIENT_ID} if 'client_id' in coercer.names else None
+    while True:
+        batch = [record for _, record in zip(range(5000), records)]
+        if not batch:
+            return
+        coerced, failed = coercer.coerce_batch(batch, fill)
+        if failed:
+            raise CommandError(f"Generated rows for {coercer.model.__name__} failed to coerce: {failed[0]}")
+        loader.load(coerced)
+
+
+def timed_body(queryset, serializer_class, chunk_size, fast):
+    gc.collect()
+    start = time.perf_counter()
+    body = b''.join(json_array_chunks(row_batches(queryset, serializer_class, chunk_size, fast)))
+    return body, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = "Benchmark serializer GETs against the values_list() read path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='100k', help='rows per table (default 100k)')
+        parser.add_argument('--endpoint', dest='endpoints', action='append',
+                            help='route under /api/sync/ (repeatable; default every endpoint)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--keepdb', action='store_true',
+                            help='reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        try:
+            rows = parse_size(options['rows'])
+        except ValueError as e:
+            raise CommandError(f"Invalid --rows: {e}")
+        endpoints = sync_endpoints()
+        if options['endpoints']:
+            wanted = [e if e.endswith('/') else e + '/' for e in options['endpoints']]
+            unknown = set(wanted) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+            endpoints = {route: endpoints[route] for route in wanted}
+        chunk_size = options['chunk_size']
+
+        self.stdout.write(f"{'endpoint':<22} {'rows':>8} {'serializer/s':>13} "
+                          f"{'values/s':>13} {'speedup':>8}")
+        with bench_database(keepdb=options['keepdb']):
+            for route, view_class in endpoints.items():
+                model = view_class.coercer.model
+                serializer_class = serializer_for(model)
+                if serializer_class is None or ValuesReader.for_serializer(serializer_class) is None:
+                    self.stdout.write(f"{route:<22} no values reader; skipped")
+                    continue
+                model._default_manager.all().delete()
+                fill_table(view_class, rows)
+                queryset = model._default_manager.order_by(*view_class.ordering)
+
+                slow, slow_seconds = timed_body(queryset, serializer_class, chunk_size, fast=False)
+                fast, fast_seconds = timed_body(queryset, serializer_class, chunk_size, fast=True)
+                if fast != slow:
+                    raise CommandError(f"{route}: the two read paths produced different JSON")
+                self.stdout.write(
+                    f"{route:<22} {rows:>8} {rows / slow_seconds:>13,.0f} "
+                    f"{rows / fast_seconds:>13,.0f} {slow_seconds / fast_seconds:>7.1f}x"
+                )
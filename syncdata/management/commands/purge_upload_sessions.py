@@ -0,0 +1,21 @@
+"""
+Delete expired upload sessions and their staged chunks.
+
+    python manage.py purge_upload_sessions
+
+Uncommitted sessions are removed once they pass ``expires_at``; committed
+ones are kept for ``SYNC_UPLOAD_SESSION_TTL`` seconds so a repeated commit
+gets a 409 rather than a 404.  Run it from cron; starting a session also
+purges opportunistically.
+"""
+from django.core.management.base import BaseCommand
+
+from syncdata.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired upload sessions and their staged chunks."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions()
+        self.stdout.write(f"Deleted {deleted} upload sessions")
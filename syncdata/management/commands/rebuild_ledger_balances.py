@@ -0,0 +1,27 @@
+"""
+Recompute acc_ledger_balances from acc_ledgers.
+
+    python manage.py rebuild_ledger_balances
+    python manage.py rebuild_ledger_balances --client-id DSN01
+
+Ledger pushes, deletes and session commits keep the summary current; run
+this once after creating the table, or after writing acc_ledgers outside
+the API.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from syncdata.balances import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-client ledger balance summary from acc_ledgers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--client-id', default='',
+                            help='only this client (default every client)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_balances(options['client_id'])
+        self.stdout.write(f"Wrote {rows} ledger balance rows")
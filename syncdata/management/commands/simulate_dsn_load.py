@@ -0,0 +1,91 @@
+"""
+Simulate many DSN sites syncing acc-master, acc-product, acc-departments
+and acc-ledgers at the same time.
+
+    python manage.py simulate_dsn_load --clients 1 4 16 32 --rows 5000
+    python manage.py simulate_dsn_load --clients 8 --endpoint acc-ledgers/ -v 2
+    python manage.py simulate_dsn_load --clients 1 8 24 --output load.json
+
+Every client DELETEs its rows and POSTs them back in chunks through a live
+server on a throw-away test database (see ``syncdata.benchmarks.loadsim``).
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from syncdata.benchmarks.generators import parse_size, sync_endpoints
+from syncdata.benchmarks.loadsim import CHUNK_SIZE, DSN_ENDPOINTS, run_simulation
+
+
+class Command(BaseCommand):
+    help = "Run concurrent simulated DSN syncs and report latency, lock waits and deadlocks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                            help='concurrency levels to run, in order (default 1 4 16)')
+        parser.add_argument('--rows', default='2000',
+                            help='records per endpoint per client, e.g. 2000 or 10k')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--endpoint', dest='endpoints', action='append',
+                            help=f"route to sync (repeatable; default {' '.join(DSN_ENDPOINTS)})")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='write the results to this JSON file')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        try:
+            rows = parse_size(options['rows'])
+        except ValueError as e:
+            raise CommandError(f"Invalid --rows: {e}")
+        if any(n < 1 for n in options['clients']):
+            raise CommandError("--clients must be positive")
+
+        available = sync_endpoints()
+        wanted = [e if e.endswith('/') else e + '/' for e in options['endpoints'] or DSN_ENDPOINTS]
+        unknown = set(wanted) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+        endpoints = {route: available[route] for route in wanted}
+
+        self.verbosity = options['verbosity']
+        self.stdout.write(f"{'clients':>7} {'seconds':>8} {'rows/sec':>10} {'requests':>8} "
+                          f"{'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'lock wait s':>11} {'peak':>5} {'deadlocks':>9}")
+        report = run_simulation(
+            options['clients'], rows, endpoints, chunk_size=options['chunk_size'],
+            seed=options['seed'], keepdb=options['keepdb'], log=self._print_level,
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _print_level(self, level):
+        latency = level['latency_ms']
+        locks = level['lock_waits']
+        wait = f"{locks['wait_seconds']:>11.2f} {locks['peak_waiting']:>5}" if locks else f"{'-':>11} {'-':>5}"
+        deadlocks = '-' if level['deadlocks'] is None else level['deadlocks']
+        self.stdout.write(
+            f"{level['clients']:>7} {level['seconds']:>8.2f} {level['rows_per_sec']:>10,.0f} "
+            f"{level['requests']:>8} {level['errors']:>6} {latency['p50']:>8} {latency['p95']:>8} "
+            f"{latency['p99']:>8} {wait} {deadlocks:>9}"
+        )
+        for error in level['error_sample']:
+            self.stdout.write(f"        error: {error}")
+        if self.verbosity < 2:
+            return
+        if locks and locks['by_event']:
+            events = ', '.join(f'{event}={count}' for event, count in sorted(locks['by_event'].items()))
+            self.stdout.write(f"        lock wait samples: {events}")
+        for name, summary in level['latency_ms_by_endpoint'].items():
+            self.stdout.write(f"        {name:<24} p50 {summary['p50']} p95 {summary['p95']} "
+                              f"max {summary['max']} ms")
+        for client in level['per_client']:
+            latency = client['latency_ms']
+            self.stdout.write(
+                f"        {client['client_id']:<8} {client['requests']:>5} req "
+                f"{client['errors']:>3} err  p50 {latency['p50']} p95 {latency['p95']} "
+                f"p99 {latency['p99']} max {latency['max']} ms"
+            )
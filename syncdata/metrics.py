@@ -0,0 +1,352 @@
+"""
+Ingest metrics for the sync endpoints, exposed in Prometheus text format.
+
+Each push/delete request gets a ``RequestMetrics`` (``view.metrics``) that
+times the stages of the request:
+
+    parse    pulling records off the request body
+    coerce   turning records into insert rows (the old clean + validate)
+    insert   COPY / multi-row INSERT
+    delete   clearing the rows being replaced
+    finish   delta/swap bookkeeping after the load
+
+and counts rows loaded and failed.  When the response goes out the totals
+are added to the process-wide ``REGISTRY``, labelled by endpoint (the view's
+``record_type``) and client_id.
+
+Gunicorn runs several worker processes, so each one writes its registry to
+``SYNC_METRICS_DIR/<pid>.json`` (at most once a second, a write that comes
+too soon being made by a timer once the second is over, and at exit), and
+``/api/sync/metrics`` adds up the files of every worker.  A scrape folds
+the files of workers that have exited into ``retired.json`` so counters
+never go backwards and the directory does not grow with every recycled
+worker; a folded file is deleted on the next scrape.  Liveness is checked
+by pid, so the directory must not be shared between hosts.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# name → (type, help); summaries are exported as <name>_sum and <name>_count
+METRICS = {
+    'sync_requests_total': ('counter', 'Sync push/delete requests by response status.'),
+    'sync_request_bytes_total': ('counter', 'Request body bytes received, as sent on the wire.'),
+    'sync_rows_total': ('counter', 'Records processed, by outcome (loaded or failed).'),
+    'sync_request_seconds': ('summary', 'Wall time of sync push/delete requests.'),
+    'sync_stage_seconds': ('summary', 'Time spent per ingest stage.'),
+    'sync_rows_per_second': ('gauge', 'Rows loaded per second by the latest push.'),
+}
+
+FLUSH_INTERVAL = 1.0
+
+# Counters of exited workers, and the lock of the scrape that folds them in
+RETIRED = 'retired.json'
+RETIRE_LOCK = 'retire.lock'
+# A lock older than this was left by a scrape that died
+RETIRE_LOCK_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Counters and gauges of this process, keyed by (sample name, labels)."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._flushed = 0.0
+        self._timer = None
+        self._pid = None
+        self._worker = None
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self.counters[_key(name, labels)] += value
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            self.counters[_key(f'{name}_sum', labels)] += seconds
+            self.counters[_key(f'{name}_count', labels)] += 1
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self.gauges[_key(name, labels)] = (value, time.time())
+
+    def worker(self):
+        # New in every process, so a recycled pid is not mistaken for a retired worker
+        if self._pid != os.getpid():
+            self._pid, self._worker = os.getpid(), uuid.uuid4().hex
+        return self._worker
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'worker': self.worker(),
+                'counters': [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                'gauges': [[n, dict(l), v, t] for (n, l), (v, t) in self.gauges.items()],
+            }
+
+    # ── Sharing between worker processes ────────────────────────────────────
+
+    def directory(self):
+        return getattr(settings, 'SYNC_METRICS_DIR', None)
+
+    def flush(self, force=False):
+        """
+        Write this process's snapshot for the other workers to read.
+
+        A write skipped for coming too soon after the last one is made by a
+        timer instead, so a worker's last request before it goes idle still
+        reaches its file.
+        """
+        directory = self.directory()
+        if not directory:
+            return
+        wait = FLUSH_INTERVAL - (time.monotonic() - self._flushed)
+        if force or wait <= 0:
+            self._write(directory)
+            return
+        with self._lock:
+            # Threads do not survive a fork: a child never sees its parent's timer alive
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Timer(wait, self._write_later, [directory])
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _write_later(self, directory):
+        try:
+            self._write(directory)
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+    def _write(self, directory):
+        self._flushed = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def worker_files(self, directory):
+        """``(pid, path, snapshot)`` of every other worker's file in ``directory``."""
+        for name in os.listdir(directory):
+            pid = name[:-len('.json')]
+            if not name.endswith('.json') or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            path = os.path.join(directory, name)
+            snapshot = _read(path)
+            if snapshot is not None:
+                yield int(pid), path, snapshot
+
+    def collect(self):
+        """Merge this process's values with every other worker's snapshot."""
+        snapshots = [self.snapshot()]
+        directory = self.directory()
+        if directory and os.path.isdir(directory):
+            try:
+                retire_workers(directory, self)
+            except OSError as e:
+                logger.warning("Could not retire metrics of exited workers: %s", e)
+            retired = _read(os.path.join(directory, RETIRED)) or _empty()
+            snapshots.append(retired)
+            folded = set(retired['workers'])
+            snapshots.extend(snapshot for _, _, snapshot in self.worker_files(directory)
+                             if _worker_of(snapshot) not in folded)
+        counters, gauges = _merge(snapshots)
+        return counters, {key: value for key, (value, _) in gauges.items()}
+
+    def render(self):
+        """Prometheus text exposition (version 0.0.4) of ``collect()``."""
+        counters, gauges = self.collect()
+        samples = defaultdict(list)
+        for (name, labels), value in {**counters, **gauges}.items():
+            base = name
+            for suffix in ('_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    base = name[:-len(suffix)]
+            samples[base].append((name, labels, value))
+
+        lines = []
+        for base, (kind, help_text) in METRICS.items():
+            if base not in samples:
+                continue
+            lines.append(f'# HELP {base} {help_text}')
+            lines.append(f'# TYPE {base} {kind}')
+            for name, labels, value in sorted(samples[base]):
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value:g}' if label_text
+                             else f'{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _empty():
+    return {'counters': [], 'gauges': [], 'workers': []}
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _worker_of(snapshot):
+    # Files written before snapshots carried a worker id count as one worker
+    return snapshot.get('worker', '')
+
+
+def _merge(snapshots):
+    """Summed counters and the latest ``(value, stamp)`` of each gauge of ``snapshots``."""
+    counters = defaultdict(float)
+    gauges = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[_key(name, labels)] += value
+        for name, labels, value, stamp in snapshot['gauges']:
+            key = _key(name, labels)
+            if key not in gauges or gauges[key][1] < stamp:
+                gauges[key] = (value, stamp)
+    return counters, gauges
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def retire_workers(directory, registry):
+    """
+    Fold the files of exited workers in ``directory`` into ``retired.json``.
+
+    A folded file is listed in ``retired.json`` (so scrapes skip it) and
+    deleted by the next call, after any scrape that read the previous
+    ``retired.json`` has had time to finish.  One scrape at a time does
+    this; the others skip it.
+    """
+    if os.name != 'posix':
+        # os.kill(pid, 0) terminates the process on Windows
+        return
+    lock = os.path.join(directory, RETIRE_LOCK)
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock) > RETIRE_LOCK_TIMEOUT:
+            os.remove(lock)
+        return
+    try:
+        path = os.path.join(directory, RETIRED)
+        retired = _read(path) or _empty()
+        folded = set(retired['workers'])
+        workers = set()
+        exited = []
+        for pid, worker_path, snapshot in registry.worker_files(directory):
+            worker = _worker_of(snapshot)
+            if worker in folded:
+                os.remove(worker_path)
+            elif not _alive(pid):
+                exited.append(snapshot)
+                workers.add(worker)
+        # Deleted files drop out of the list only now, once they are gone
+        if workers == folded:
+            return
+        counters, gauges = _merge([retired, *exited])
+        retired = {
+            'counters': [[n, dict(l), v] for (n, l), v in counters.items()],
+            'gauges': [[n, dict(l), v, t] for (n, l), (v, t) in gauges.items()],
+            'workers': sorted(workers),
+        }
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(retired, f)
+        os.replace(tmp, path)
+    finally:
+        os.remove(lock)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+atexit.register(lambda: REGISTRY.flush(force=True))
+
+
+class RequestMetrics:
+    """Stage timings and row counts of one request."""
+
+    def __init__(self, endpoint, client_id='', registry=REGISTRY):
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.registry = registry
+        self.stages = defaultdict(float)
+        self.loaded = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def rows(self, loaded=0, failed=0):
+        self.loaded += loaded
+        self.failed += failed
+
+    def finish(self, method, status_code, body_bytes=0, parse_seconds=0.0):
+        elapsed = time.perf_counter() - self.started
+        labels = {'endpoint': self.endpoint, 'client_id': self.client_id}
+        registry = self.registry
+        registry.inc('sync_requests_total', {**labels, 'method': method, 'status': str(status_code)})
+        registry.observe('sync_request_seconds', labels, elapsed)
+        if body_bytes:
+            registry.inc('sync_request_bytes_total', labels, body_bytes)
+        if parse_seconds:
+            self.stages['parse'] += parse_seconds
+        for stage, seconds in self.stages.items():
+            registry.observe('sync_stage_seconds', {**labels, 'stage': stage}, seconds)
+        if self.loaded:
+            registry.inc('sync_rows_total', {**labels, 'outcome': 'loaded'}, self.loaded)
+            registry.set('sync_rows_per_second', labels, self.loaded / elapsed)
+        if self.failed:
+            registry.inc('sync_rows_total', {**labels, 'outcome': 'failed'}, self.failed)
+        try:
+            registry.flush()
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+
+class NullMetrics:
+    """Stands in for RequestMetrics outside a request."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def rows(self, loaded=0, failed=0):
+        pass
+
+
+NULL_METRICS = NullMetrics()
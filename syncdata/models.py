@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 
@@ -148,6 +150,10 @@ class PlanetClient(models.Model):
     class Meta:
         managed = False  
         db_table = 'planet_clients'
+        # Not created by Django: see sql/client_scoped_indexes.sql
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'code'], name='planet_clients_client_code_uniq'),
+        ]
 
 
 class PlanetMaster(models.Model):
@@ -207,6 +213,10 @@ class AccMaster(models.Model):
     class Meta:
         managed = False          # Table already exists; Django won't migrate it
         db_table = 'acc_master'
+        # Not created by Django: see sql/client_scoped_indexes.sql
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'code'], name='acc_master_client_code_uniq'),
+        ]
 
     def __str__(self):
         return self.name
@@ -229,6 +239,10 @@ class AccProduct(models.Model):
     class Meta:
         managed = False          # Table already exists; Django won't migrate it
         db_table = 'acc_product'
+        # Not created by Django: see sql/client_scoped_indexes.sql
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'code'], name='acc_product_client_code_uniq'),
+        ]
 
     def __str__(self):
         return self.name or self.code
@@ -244,6 +258,11 @@ class AccDepartment(models.Model):
     class Meta:
         managed = False          # Table already exists; Django won't migrate it
         db_table = 'acc_departments'
+        # The real key is (department_id, client_id): every DSN has the same
+        # department codes.  Not created by Django: see sql/client_scoped_indexes.sql
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'department_id'], name='acc_departments_client_dept_uniq'),
+        ]
 
     def __str__(self):
         return self.department or self.department_id
@@ -280,7 +299,27 @@ class AccLedger(models.Model):
     class Meta:
         db_table = 'acc_ledgers'
         managed = True
+        # GET/DELETE filter by client_id (and code), reports by date.
+        # Existing databases: see sql/client_scoped_indexes.sql
+        indexes = [
+            models.Index(fields=['client_id', 'code'], name='acc_ledgers_client_code_idx'),
+            models.Index(fields=['client_id', 'date'], name='acc_ledgers_client_date_idx'),
+        ]
+
+
+class AccLedgerBalance(models.Model):
+    # Per-client totals of acc_ledgers by code, kept current by every ledger
+    # push, delete and session commit (see balances.py).
+    client_id = models.CharField(max_length=50, blank=True, default='')
+    code = models.CharField(max_length=30)
+    debit = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    credit = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    entries = models.IntegerField(default=0)
 
+    class Meta:
+        db_table = 'acc_ledger_balances'
+        managed = True
+        unique_together = ('client_id', 'code')
 
 
 
@@ -315,4 +354,44 @@ class SysmacInvMast(ManagedInvMastModel):
 class DQInvMast(ManagedInvMastModel):  
     class Meta:
         db_table = 'syncdata_dqrecord_mast'
-        managed = True
\ No newline at end of file
+        managed = True
+
+class SyncRowDigest(models.Model):
+    # Content hash of every row pushed in delta mode, keyed by table and
+    # natural key, so the next push only touches rows whose hash changed.
+    table_name = models.CharField(max_length=64)
+    row_key = models.CharField(max_length=255)
+    digest = models.CharField(max_length=32)
+
+    class Meta:
+        db_table = 'sync_row_digests'
+        managed = True
+        unique_together = ('table_name', 'row_key')
+
+
+class UploadSession(models.Model):
+    # A chunked push: chunks are staged here until commit replaces the
+    # client's rows in one transaction.  Uncommitted sessions expire.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    endpoint = models.CharField(max_length=50)
+    client_id = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    committed_at = models.DateTimeField(null=True, blank=True)
+    record_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'sync_upload_sessions'
+        managed = True
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    seq = models.PositiveIntegerField()
+    record_count = models.IntegerField()
+    records = models.TextField()   # JSON array, validated on upload
+
+    class Meta:
+        db_table = 'sync_upload_chunks'
+        managed = True
+        unique_together = ('session', 'seq')
@@ -0,0 +1,480 @@
+"""
+Request body parsers for the sync endpoints.
+
+``StreamingJSONParser`` replaces DRF's ``JSONParser``: a top-level JSON array
+is not decoded up front but handed to the view as a ``RecordStream`` that pulls
+records off the socket as the view consumes them, so a 200k-row push never
+holds more than one batch of dicts in memory.  Any other JSON body (an object
+for example) is parsed eagerly exactly as ``JSONParser`` would.
+
+Bodies sent with ``Content-Encoding: gzip`` (or ``zstd`` when the optional
+``zstandard`` package is installed) are inflated chunk by chunk as the parser
+reads them.  The inflated size is capped at ``SYNC_MAX_DECOMPRESSED_SIZE``
+bytes; a body that grows past it fails with 413, and an encoding we cannot
+decode with 415.
+
+Bulk pushes can also be sent in a columnar form that names each column once
+instead of repeating every key in every record:
+
+* ``text/csv`` (``ColumnarCSVParser``): a header line of field names, then
+  one row per line; a field of ``\\N`` is NULL, as in PostgreSQL's COPY.
+* ``application/x-msgpack`` (``ColumnarMsgPackParser``, when the optional
+  ``msgpack`` package is installed): a stream of arrays, the first being the
+  field names.
+
+Rows are mapped onto the header as they are read and reach the views as the
+same RecordStream of dicts a JSON array produces, so coercion, error
+reporting and the upload sessions treat every format alike.  JSON stays the
+default.
+"""
+import codecs
+import csv
+import gzip
+import json
+import re
+import time
+import zlib
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import BaseParser
+from rest_framework.settings import api_settings
+
+try:
+    import zstandard
+except ImportError:  # zstd bodies are refused with 415 without it
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # application/x-msgpack bodies are refused with 415 without it
+    msgpack = None
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Number of records kept from the start of a stream for sample logging.
+SAMPLE_SIZE = 2
+
+# NULL marker in columnar CSV bodies
+CSV_NULL = '\\N'
+
+
+# Default cap on the inflated size of a compressed request body.
+MAX_DECOMPRESSED_SIZE = 512 * 1024 * 1024
+
+
+class RequestBodyTooLarge(ParseError):
+    """
+    A compressed body inflated past the limit.  Subclasses ParseError so the
+    views' ``except ParseError: raise`` passes it through mid-stream too.
+    """
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Decompressed request body is too large.'
+    default_code = 'request_too_large'
+
+
+def _gzip_reader(stream):
+    return gzip.GzipFile(fileobj=stream, mode='rb')
+
+
+def _zstd_reader(stream):
+    return zstandard.ZstdDecompressor().stream_reader(stream)
+
+
+DECODERS = {
+    'gzip': _gzip_reader,
+    'x-gzip': _gzip_reader,
+}
+if zstandard is not None:
+    DECODERS['zstd'] = _zstd_reader
+
+_DECODE_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+
+class _DecompressedStream:
+    """``read()`` over an inflating reader, enforcing the size limit."""
+
+    def __init__(self, reader, encoding, limit):
+        self._reader = reader
+        self._encoding = encoding
+        self._limit = limit
+        self.size = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._limit - self.size + 1
+        try:
+            data = self._reader.read(size)
+        except _DECODE_ERRORS as exc:
+            raise ParseError(f'Invalid {self._encoding} request body - {exc}')
+        self.size += len(data)
+        if self.size > self._limit:
+            raise RequestBodyTooLarge(
+                f'Decompressed request body exceeds {self._limit} bytes.'
+            )
+        return data
+
+
+def decompressed(stream, parser_context):
+    """
+    Wrap ``stream`` according to the request's Content-Encoding.
+
+    Raises UnsupportedMediaType for an encoding not in DECODERS.
+    """
+    request = (parser_context or {}).get('request')
+    if request is None:
+        return stream
+    encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+    if encoding in ('', 'identity'):
+        return stream
+    if encoding not in DECODERS:
+        raise UnsupportedMediaType(
+            encoding, detail=f'Unsupported Content-Encoding "{encoding}".'
+        )
+    limit = getattr(settings, 'SYNC_MAX_DECOMPRESSED_SIZE', MAX_DECOMPRESSED_SIZE)
+    return _DecompressedStream(DECODERS[encoding](stream), encoding, limit)
+
+
+class RecordStream:
+    """
+    Iterable of records decoded lazily from a JSON array body.
+
+    A stream can be consumed once.  ``count`` is the number of records
+    yielded so far, ``parse_seconds`` the time spent decoding them, and
+    ``sample()`` returns the first few records even after the stream has been
+    consumed.
+    """
+
+    def __init__(self, items):
+        self._items = iter(items)
+        self._pending = []
+        self._sample = []
+        self.count = 0
+        self.parse_seconds = 0.0
+
+    def _pull(self):
+        start = time.perf_counter()
+        try:
+            item = next(self._items)
+        finally:
+            self.parse_seconds += time.perf_counter() - start
+        if len(self._sample) < SAMPLE_SIZE:
+            self._sample.append(item)
+        return item
+
+    def peek(self, n=1):
+        """Return up to ``n`` upcoming records without consuming them."""
+        while len(self._pending) < n:
+            try:
+                self._pending.append(self._pull())
+            except StopIteration:
+                break
+        return self._pending[:n]
+
+    def sample(self, n=SAMPLE_SIZE):
+        if not self._sample:
+            self.peek(n)
+        return self._sample[:n]
+
+    def __bool__(self):
+        return bool(self.peek(1))
+
+    def __iter__(self):
+        while True:
+            if self._pending:
+                item = self._pending.pop(0)
+            else:
+                try:
+                    item = self._pull()
+                except StopIteration:
+                    return
+            self.count += 1
+            yield item
+
+    def batches(self, size):
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def is_record_list(data):
+    return isinstance(data, (list, RecordStream))
+
+
+def iter_batches(data, size):
+    """Yield ``data`` (a list or a RecordStream) as lists of at most ``size``."""
+    if isinstance(data, RecordStream):
+        yield from data.batches(size)
+    else:
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+
+def sample_records(data, n=SAMPLE_SIZE):
+    if isinstance(data, RecordStream):
+        return data.sample(n)
+    if isinstance(data, list):
+        return data[:n]
+    return []
+
+
+# Longest JSON token (``-Infinity``): a decode failure this close to the end
+# of the buffer may be a token cut off by the read size.
+_TRUNCATION_WINDOW = len('-Infinity')
+
+
+def _may_be_truncated(exc, length):
+    """Whether ``exc`` from decoding a buffer of ``length`` could be a short read."""
+    pos = getattr(exc, 'pos', None)
+    if pos is None:
+        return True
+    # The decoder reports an unclosed string at its opening quote
+    return exc.msg.startswith('Unterminated string') or length - pos <= _TRUNCATION_WINDOW
+
+
+class _JSONArrayReader:
+    """Incrementally decode the elements of a top-level JSON array."""
+
+    def __init__(self, stream, encoding, read_size):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._read_size = read_size
+        self._json = json.JSONDecoder(
+            parse_constant=self._reject_constant if api_settings.STRICT_JSON else None
+        )
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    @staticmethod
+    def _reject_constant(value):
+        raise ParseError(f'Out of range float values are not JSON compliant: {value!r}')
+
+    def _fill(self):
+        """Append the next chunk from the stream; False once it is exhausted."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._read_size)
+        if chunk:
+            text = self._decoder.decode(chunk)
+        else:
+            text = self._decoder.decode(b'', final=True)
+            self._eof = True
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _next_char(self):
+        """Skip whitespace and return the next character ('' at end of body)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _decode_value(self):
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except ValueError as exc:
+                # Only a failure at the end of the buffer can be cured by
+                # reading more; anything earlier is malformed for good.
+                if _may_be_truncated(exc, len(self._buf)) and self._fill():
+                    continue
+                raise ParseError(f'JSON parse error - {exc}')
+            # A value that runs to the end of the buffer may be a truncated
+            # number or literal; read on until something follows it.
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def first_char(self):
+        return self._next_char()
+
+    def rest(self):
+        while self._fill():
+            pass
+        return self._buf[self._pos:]
+
+    def items(self):
+        try:
+            yield from self._items()
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+    def _items(self):
+        self._pos += 1  # opening '['
+        if self._next_char() == ']':
+            self._pos += 1
+        else:
+            while True:
+                self._next_char()
+                yield self._decode_value()
+                sep = self._next_char()
+                self._pos += 1
+                if sep == ']':
+                    break
+                if sep != ',':
+                    raise ParseError(
+                        "JSON parse error - expected ',' or ']' after array element"
+                    )
+        if self._next_char():
+            raise ParseError('JSON parse error - extra data after top-level array')
+
+
+class StreamingJSONParser(BaseParser):
+    """
+    Parses JSON request bodies, streaming the elements of a top-level array.
+    """
+    media_type = 'application/json'
+    read_size = 64 * 1024
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        stream = decompressed(stream, parser_context)
+        reader = _JSONArrayReader(stream, encoding, self.read_size)
+
+        try:
+            first = reader.first_char()
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+        if first == '[':
+            return RecordStream(reader.items())
+
+        try:
+            return json.loads(reader.rest(), parse_constant=(
+                reader._reject_constant if api_settings.STRICT_JSON else None
+            ))
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def _read_chunks(stream, read_size):
+    while True:
+        chunk = stream.read(read_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _check_header(header, fmt):
+    if not isinstance(header, list) or not all(isinstance(name, str) for name in header):
+        raise ParseError(f'{fmt} parse error - the first row must list the field names')
+    header = [name.strip() for name in header]
+    if header:
+        header[0] = header[0].lstrip('\ufeff')
+    if len(set(header)) != len(header):
+        raise ParseError(f'{fmt} parse error - repeated field name in header')
+    return header
+
+
+def _columnar_records(header, rows, fmt):
+    """Map each row of ``rows`` onto ``header``; line numbers count the header."""
+    width = len(header)
+    for line, row in enumerate(rows, start=2):
+        if len(row) != width:
+            raise ParseError(
+                f'{fmt} parse error - row {line} has {len(row)} fields, expected {width}'
+            )
+        yield dict(zip(header, row))
+
+
+class ColumnarCSVParser(BaseParser):
+    """
+    Parses ``text/csv`` bodies: a header line of field names, then rows.
+    """
+    media_type = 'text/csv'
+    read_size = 64 * 1024
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        stream = decompressed(stream, parser_context)
+        reader = csv.reader(self._lines(stream, encoding), strict=True)
+        try:
+            header = next(reader, None)
+        except csv.Error as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+        if header is None:
+            return RecordStream([])
+        header = _check_header(header, 'CSV')
+        return RecordStream(self._records(header, reader))
+
+    def _lines(self, stream, encoding):
+        """Decoded lines of the body; csv.reader rejoins quoted newlines."""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        tail = ''
+        try:
+            for chunk in _read_chunks(stream, self.read_size):
+                *lines, tail = (tail + decoder.decode(chunk)).split('\n')
+                for line in lines:
+                    yield line + '\n'
+            tail += decoder.decode(b'', final=True)
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+        if tail:
+            yield tail
+
+    def _records(self, header, reader):
+        null = CSV_NULL
+        rows = ([None if value == null else value for value in row] for row in reader)
+        try:
+            yield from _columnar_records(header, rows, 'CSV')
+        except csv.Error as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+
+
+class ColumnarMsgPackParser(BaseParser):
+    """
+    Parses ``application/x-msgpack`` bodies: a stream of arrays, the first
+    holding the field names.
+    """
+    media_type = 'application/x-msgpack'
+    read_size = 64 * 1024
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise UnsupportedMediaType(media_type)
+        stream = decompressed(stream, parser_context)
+        objects = self._objects(stream)
+        header = next(objects, None)
+        if header is None:
+            return RecordStream([])
+        header = _check_header(header, 'MessagePack')
+        return RecordStream(_columnar_records(header, self._rows(objects), 'MessagePack'))
+
+    def _objects(self, stream):
+        unpacker = msgpack.Unpacker(raw=False)
+        fed = 0
+        try:
+            for chunk in _read_chunks(stream, self.read_size):
+                unpacker.feed(chunk)
+                fed += len(chunk)
+                yield from unpacker
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+        if unpacker.tell() != fed:
+            raise ParseError('MessagePack parse error - body ends inside a row')
+
+    def _rows(self, objects):
+        for row in objects:
+            if not isinstance(row, list):
+                raise ParseError('MessagePack parse error - every row must be an array')
+            yield row
+
+
+# Parsers for the api/sync/ views; JSON first so it stays the default.
+SYNC_PARSER_CLASSES = [StreamingJSONParser, ColumnarCSVParser]
+if msgpack is not None:
+    SYNC_PARSER_CLASSES.append(ColumnarMsgPackParser)
@@ -0,0 +1,129 @@
+"""
+Per-client LIST partitions of the client-scoped tables (PostgreSQL).
+
+Reloading a client used to ``DELETE ... WHERE client_id = %s`` from a table
+holding every tenant's rows: slow on tens of millions of rows, and every
+deleted row is left for VACUUM and written to the WAL.  A table declared
+``PARTITION BY LIST (client_id)`` (see sql/partition_acc_ledgers.sql) holds
+each client in its own partition, so:
+
+* ``ensure_partition`` creates a client's partition the first time its
+  client_id is written;
+* ``truncate_partition`` empties a client's partition with TRUNCATE, which
+  leaves no dead rows behind;
+* reads filtered by client_id are pruned to the one partition.
+
+Whether a table is partitioned is read from the catalog once per process,
+so converting a table takes a restart of the workers.  Tables that are not
+partitioned (and other databases) are left to the callers' plain DELETE.
+"""
+import hashlib
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+PARTITION_KEY = 'LIST (client_id)'
+
+# (using, table) → whether it is LIST-partitioned on client_id
+_partitioned = {}
+# (using, table, client_id) → name of the client's partition
+_partitions = {}
+
+
+def partition_name(table, client_id):
+    """Name for ``client_id``'s partition of ``table``; client_id is arbitrary text."""
+    return f"{table}_p_{hashlib.md5(client_id.encode()).hexdigest()[:16]}"
+
+
+def is_partitioned(model, using=DEFAULT_DB_ALIAS):
+    """True when ``model``'s table is LIST-partitioned on client_id."""
+    table = model._meta.db_table
+    key = (using, table)
+    if key not in _partitioned:
+        connection = connections[using]
+        partitioned = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_get_partkeydef(to_regclass(%s))", [table])
+                row = cursor.fetchone()
+            partitioned = row is not None and row[0] == PARTITION_KEY
+        _partitioned[key] = partitioned
+    return _partitioned[key]
+
+
+def _find_partition(cursor, table, client_id):
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) "
+        "AND pg_get_expr(c.relpartbound, c.oid) = format('FOR VALUES IN (%%L)', %s::text)",
+        [table, client_id],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _remember(using, table, client_id, name):
+    # Only once committed: a rolled-back CREATE leaves no partition
+    def remember():
+        _partitions[using, table, client_id] = name
+    transaction.on_commit(remember, using=using)
+
+
+def find_partition(model, client_id, using=DEFAULT_DB_ALIAS):
+    """Name of ``client_id``'s partition of ``model``'s table, or None."""
+    if not is_partitioned(model, using):
+        return None
+    table = model._meta.db_table
+    name = _partitions.get((using, table, client_id))
+    if name is None:
+        with connections[using].cursor() as cursor:
+            name = _find_partition(cursor, table, client_id)
+        if name is not None:
+            _remember(using, table, client_id, name)
+    return name
+
+
+def ensure_partition(model, client_id, using=DEFAULT_DB_ALIAS):
+    """
+    Create ``client_id``'s partition of ``model``'s table unless it exists;
+    returns its name, or None when the table is not partitioned.
+
+    Creating a partition locks the parent table until the transaction ends,
+    so call this before opening a long one where possible.
+    """
+    name = find_partition(model, client_id, using)
+    if name is not None or not is_partitioned(model, using):
+        return name
+    table = model._meta.db_table
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # Workers seeing the same new client create its partition one at a time
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f'{table}:{client_id}'])
+        name = _find_partition(cursor, table, client_id)
+        if name is None:
+            name = partition_name(table, client_id)
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES IN (%s)", [client_id])
+    _remember(using, table, client_id, name)
+    return name
+
+
+def truncate_partition(model, client_id, using=DEFAULT_DB_ALIAS):
+    """
+    Empty ``client_id``'s partition of ``model``'s table; returns the number
+    of rows it held, or None when the table is not partitioned.
+
+    TRUNCATE holds an ACCESS EXCLUSIVE lock on the partition until the
+    transaction ends, so this is for autocommit callers (see purge.py).
+    """
+    if not is_partitioned(model, using):
+        return None
+    name = find_partition(model, client_id, using)
+    if name is None:
+        return 0
+    qn = connections[using].ops.quote_name
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {qn(name)}")
+        count = cursor.fetchone()[0]
+        cursor.execute(f"TRUNCATE {qn(name)}")
+    return count
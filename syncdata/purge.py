@@ -0,0 +1,113 @@
+"""
+Purging a client's rows from the client-scoped tables.
+
+``QuerySet.delete()`` runs Django's collector, which fetches rows for
+cascades and signals before deleting them, and a client's whole reload was
+one DELETE statement holding row locks on every row until it finished.
+``purge`` deletes with plain SQL instead:
+
+* outside a transaction, a client's LIST partition is truncated (see
+  partitions.py);
+* other client-scoped deletes go in batches of ``SYNC_PURGE_BATCH_SIZE``
+  rows, addressed by ``ctid`` on PostgreSQL and ``rowid`` on SQLite, so no
+  statement runs long enough to hit ``statement_timeout``;
+* an unscoped purge outside a transaction is a TRUNCATE.
+
+Outside a transaction (the DELETE handlers) every batch commits on its own
+and releases its locks.  Inside one (a POST that replaces a client's rows,
+an upload session's commit) the batches share that transaction, so the
+row locks and WAL are held until it commits as with a single DELETE; only
+the statements are shorter.  TRUNCATE is never used there: it would lock
+readers out of the table until the commit, where a DELETE lets them keep
+seeing the old rows.
+
+Each purge returns a ``PurgeResult`` with the row count and rate.
+"""
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .partitions import truncate_partition
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Column that addresses a physical row, per vendor
+ROW_LOCATORS = {'postgresql': 'ctid', 'sqlite': 'rowid'}
+
+
+def batch_size():
+    return getattr(settings, 'SYNC_PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+class PurgeResult:
+    """What one purge removed and how."""
+
+    def __init__(self, rows, seconds, method, batches=1):
+        self.rows = rows
+        self.seconds = seconds
+        self.method = method
+        self.batches = batches
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.rows} rows by {self.method} in {self.batches} statement(s), "
+                f"{self.seconds:.3f}s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def _count(cursor, table):
+    cursor.execute(f"SELECT count(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _delete_in_batches(connection, table, client_id, size):
+    locator = ROW_LOCATORS.get(connection.vendor)
+    with connection.cursor() as cursor:
+        if locator is None:
+            cursor.execute(f"DELETE FROM {table} WHERE client_id = %s", [client_id])
+            return cursor.rowcount, 1
+        # client_id again outside the subquery: ctids repeat across the
+        # partitions of a partitioned table
+        if connection.vendor == 'postgresql':
+            sql = (f"DELETE FROM {table} WHERE client_id = %s AND ctid = ANY(ARRAY("
+                   f"SELECT ctid FROM {table} WHERE client_id = %s LIMIT %s))")
+        else:
+            sql = (f"DELETE FROM {table} WHERE client_id = %s AND {locator} IN ("
+                   f"SELECT {locator} FROM {table} WHERE client_id = %s LIMIT %s)")
+        rows = batches = 0
+        while True:
+            cursor.execute(sql, [client_id, client_id, size])
+            rows += cursor.rowcount
+            batches += 1
+            if cursor.rowcount < size:
+                return rows, batches
+
+
+def purge(model, client_id='', using=DEFAULT_DB_ALIAS, size=None):
+    """Delete ``client_id``'s rows of ``model`` (every row when it is empty)."""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    start = time.perf_counter()
+    if client_id:
+        # TRUNCATE takes an ACCESS EXCLUSIVE lock, held until the commit
+        rows = None if connection.in_atomic_block else truncate_partition(model, client_id, using)
+        if rows is not None:
+            method, batches = 'partition truncate', 1
+        else:
+            method = 'batched delete'
+            rows, batches = _delete_in_batches(connection, table, client_id, size or batch_size())
+    else:
+        batches = 1
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql' and not connection.in_atomic_block:
+                method = 'truncate'
+                rows = _count(cursor, table)
+                cursor.execute(f"TRUNCATE {table}")
+            else:
+                method = 'delete'
+                cursor.execute(f"DELETE FROM {table}")
+                rows = cursor.rowcount
+    return PurgeResult(rows, time.perf_counter() - start, method, batches)
@@ -0,0 +1,204 @@
+"""
+Serializer-free read path for the sync GET endpoints.
+
+``serializer_class(rows, many=True).data`` builds a model instance per row,
+then walks every DRF field of it (``get_attribute`` → ``to_representation``)
+and calls each SerializerMethodField.  ``ValuesReader`` produces the same
+dicts from ``values_list()`` tuples instead:
+
+* plain fields read their column and convert it with a function picked once
+  per field (``str`` columns pass through, decimals are quantized the way
+  DRF's DecimalField does);
+* ``sql_fields`` declared on the serializer (the master tables' ``balance``)
+  are computed by the database as annotations, and converted NULL or not;
+* ``label_fields`` (PlanetClient's ``*_label``) are looked up in their
+  mapping from the source column.
+
+The output is the same JSON DRF renders.  Serializers with anything the
+reader does not know how to reproduce (nested serializers, dotted sources,
+other method fields) get no reader and stay on the DRF path.
+"""
+import decimal
+import functools
+from itertools import islice
+from operator import itemgetter
+
+from rest_framework import fields as drf_fields
+from rest_framework.relations import RelatedField, ManyRelatedField
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+from .serializers import UNKNOWN_LABEL
+
+
+# Fields whose value is not a plain column of the row
+_NEEDS_SERIALIZER = (
+    drf_fields.SerializerMethodField, drf_fields.HiddenField,
+    BaseSerializer, RelatedField, ManyRelatedField,
+)
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    if (not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            or field.normalize_output or field.localize):
+        return field.to_representation
+    if field.decimal_places is None:
+        return '{:f}'.format
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != drf_fields.ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+class _PerQuery:
+    """A converter that depends on request state; ``make()`` builds it per query."""
+
+    def __init__(self, make):
+        self.make = make
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != drf_fields.ISO_8601:
+        return field.to_representation
+
+    def make():
+        # The active time zone, looked up once instead of per value
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if zone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            text = value.astimezone(zone).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert
+    return _PerQuery(make)
+
+
+def _converter(field):
+    """Function turning a non-null column value into ``field``'s JSON value."""
+    # Exact types: subclasses (EmailField, ...) may validate or format differently
+    kind = type(field)
+    if kind is drf_fields.CharField:
+        return _identity
+    if kind is drf_fields.IntegerField:
+        return int
+    if kind is drf_fields.FloatField:
+        return float
+    if kind is drf_fields.DecimalField:
+        return _decimal_converter(field)
+    if kind is drf_fields.DateField:
+        return _date_converter(field)
+    if kind is drf_fields.DateTimeField:
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+def _label(mapping):
+    return lambda value: mapping.get(value, UNKNOWN_LABEL)
+
+
+class ValuesReader:
+    """
+    Read a queryset as the dicts ``serializer_class(..., many=True).data``
+    would produce, without model instances or DRF fields.
+
+        reader = ValuesReader.for_serializer(AccLedgerSerializer)
+        if reader is not None:
+            for batch in reader.batches(AccLedger.objects.filter(...)):
+                ...
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        sql_fields = getattr(serializer_class, 'sql_fields', {})
+        label_fields = getattr(serializer_class, 'label_fields', {})
+
+        self.names = []
+        self.columns = []
+        self.annotations = {}
+        picks = []
+        # (output position, function) for non-null values, and for every value
+        self._converters = []
+        self._always = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in sql_fields:
+                expression, sql_convert = sql_fields[name]
+                self.annotations[name] = expression(serializer_class.Meta.model)
+                column, convert = name, None
+                self._always.append((len(self.names), sql_convert))
+            elif name in label_fields:
+                column, mapping = label_fields[name]
+                convert = None
+                self._always.append((len(self.names), _label(mapping)))
+            elif isinstance(field, _NEEDS_SERIALIZER) or field.source == '*' or '.' in field.source:
+                raise ValueError(f"{serializer_class.__name__}.{name} needs the serializer")
+            else:
+                column, convert = field.source, _converter(field)
+            if convert is not None and convert is not _identity:
+                self._converters.append((len(self.names), convert))
+            if column not in self.columns:
+                self.columns.append(column)
+            picks.append(self.columns.index(column))
+            self.names.append(name)
+        # Values in output order, straight from the row tuple
+        self._pick = itemgetter(*picks) if len(picks) > 1 else lambda values: (values[picks[0]],)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def for_serializer(cls, serializer_class):
+        """The reader for ``serializer_class``, or None if it cannot have one."""
+        try:
+            return cls(serializer_class)
+        except (ValueError, TypeError):
+            return None
+
+    def rows(self, queryset, chunk_size=2000):
+        """Yield one output dict per row of ``queryset``."""
+        names, pick, always = self.names, self._pick, self._always
+        converters = [
+            (position, convert.make() if isinstance(convert, _PerQuery) else convert)
+            for position, convert in self._converters
+        ]
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        for values in queryset.values_list(*self.columns).iterator(chunk_size=chunk_size):
+            out = list(pick(values))
+            for position, convert in converters:
+                value = out[position]
+                if value is not None:
+                    out[position] = convert(value)
+            for position, convert in always:
+                out[position] = convert(out[position])
+            yield dict(zip(names, out))
+
+    def batches(self, queryset, chunk_size=2000):
+        """Lists of at most ``chunk_size`` output dicts."""
+        rows = self.rows(queryset, chunk_size)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                return
+            yield batch
@@ -0,0 +1,117 @@
+"""
+Reports computed in SQL over the synced accounting tables.
+
+Reporting clients used to GET a client's whole ``acc_ledgers`` table to sum
+debit and credit per account.  ``trial_balance`` does the summing in the
+database and returns one row per account code:
+
+* ``acc_master`` supplies the name, ``super_code`` and opening balance; the
+  master's accounts without ledger entries are listed too, and ledger codes
+  missing from the master are listed with no name;
+* with a ``date_from``, entries dated before it are carried into the
+  opening balance, so ``closing = opening + debit - credit`` holds for the
+  period; entries without a date only count when no range is given;
+* balances are debit-positive, like the master tables' ``balance``.
+"""
+import decimal
+from collections import OrderedDict
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import AccLedger, AccMaster
+
+# acc_ledgers.debit/credit precision
+AMOUNT_PLACES = 5
+AMOUNT_EXPONENT = decimal.Decimal(1).scaleb(-AMOUNT_PLACES)
+
+AMOUNT_COLUMNS = ('opening', 'debit', 'credit', 'closing')
+
+
+def _amount(value):
+    # SQLite sums decimals as floats; go through str() to keep their digits
+    if value is None:
+        value = decimal.Decimal(0)
+    elif not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(str(value))
+    return value.quantize(AMOUNT_EXPONENT, rounding=decimal.ROUND_HALF_UP)
+
+
+def _trial_balance_sql(qn, date_from, date_to):
+    ledgers = qn(AccLedger._meta.db_table)
+    master = qn(AccMaster._meta.db_table)
+    date = qn('date')
+    in_period = []
+    if date_from is not None:
+        in_period.append(f'{date} >= %(date_from)s')
+    if date_to is not None:
+        in_period.append(f'{date} <= %(date_to)s')
+    period = ' AND '.join(in_period) or '1 = 1'
+    brought_forward = f'{date} < %(date_from)s' if date_from is not None else '1 = 0'
+    up_to = f'AND {date} <= %(date_to)s' if date_to is not None else ''
+    return f"""
+        WITH l AS (
+            SELECT code,
+                   SUM(CASE WHEN {brought_forward}
+                            THEN COALESCE(debit, 0) - COALESCE(credit, 0) ELSE 0 END) AS brought_forward,
+                   SUM(CASE WHEN {period} THEN COALESCE(debit, 0) ELSE 0 END) AS debit,
+                   SUM(CASE WHEN {period} THEN COALESCE(credit, 0) ELSE 0 END) AS credit
+              FROM {ledgers}
+             WHERE client_id = %(client_id)s {up_to}
+             GROUP BY code
+        ), m AS (
+            SELECT code, name, super_code, opening_balance
+              FROM {master}
+             WHERE client_id = %(client_id)s
+        )
+        SELECT m.code, m.name, m.super_code, m.opening_balance,
+               l.brought_forward, l.debit, l.credit
+          FROM m LEFT JOIN l ON l.code = m.code
+        UNION ALL
+        SELECT l.code, NULL, NULL, NULL, l.brought_forward, l.debit, l.credit
+          FROM l
+         WHERE NOT EXISTS (SELECT 1 FROM m WHERE m.code = l.code)
+    """
+
+
+def trial_balance(client_id, date_from=None, date_to=None, using=DEFAULT_DB_ALIAS):
+    """
+    Per-account totals of ``client_id``'s ledgers between the optional dates
+    (inclusive), ordered by super_code then code: a list of dicts with code,
+    name, super_code, opening, debit, credit and closing (Decimals).
+    """
+    connection = connections[using]
+    sql = _trial_balance_sql(connection.ops.quote_name, date_from, date_to)
+    params = {'client_id': client_id, 'date_from': date_from, 'date_to': date_to}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    accounts = []
+    for code, name, super_code, opening_balance, brought_forward, debit, credit in rows:
+        opening = _amount(opening_balance) + _amount(brought_forward)
+        debit, credit = _amount(debit), _amount(credit)
+        accounts.append({
+            'code': code,
+            'name': name,
+            'super_code': super_code,
+            'opening': opening,
+            'debit': debit,
+            'credit': credit,
+            'closing': opening + debit - credit,
+        })
+    accounts.sort(key=lambda a: (a['super_code'] is None, a['super_code'] or '', a['code']))
+    return accounts
+
+
+def group_totals(accounts):
+    """Sum the amounts of ``accounts`` per super_code, in first-seen order."""
+    groups = OrderedDict()
+    for account in accounts:
+        group = groups.get(account['super_code'])
+        if group is None:
+            group = groups[account['super_code']] = dict.fromkeys(AMOUNT_COLUMNS, decimal.Decimal(0))
+            group['accounts'] = 0
+        for column in AMOUNT_COLUMNS:
+            group[column] += account[column]
+        group['accounts'] += 1
+    return [{'super_code': super_code, **totals} for super_code, totals in groups.items()]
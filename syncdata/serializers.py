@@ -1,3 +1,5 @@
+from django.db.models import Case, DecimalField, F, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce, Round
 from rest_framework import serializers
 from .models import (
     IMC1Record, IMC2Record, SysmacRecord, DQRecord,
@@ -5,16 +7,56 @@ from .models import (
     IMC1RecordLedgers, IMC2RecordLedgers, PlanetLedgers,
     SysmacRecordLedgers, DQRecordsLedgers,
     PlanetInvMast, IMC1InvMast, IMC2InvMast, SysmacInvMast, DQInvMast,
-    AccMaster, AccProduct, AccDepartment, AccLedger,
+    AccMaster, AccProduct, AccDepartment, AccLedger, AccLedgerBalance,
 )
 import logging
 from decimal import Decimal, InvalidOperation
-from datetime import datetime
-import json
+from .dates import parse_date
 
 logger = logging.getLogger(__name__)
 
 
+# Read-only fields that readers.ValuesReader can produce without running the
+# SerializerMethodField:
+#   sql_fields   = {name: (expression factory(model), converter)}    computed by the database;
+#                  the converter is called on every value, NULL included
+#   label_fields = {name: (source field, {value: label})}            looked up per row
+
+def balance_sql(model):
+    """``(debit or 0) - (credit or 0)`` as a query expression."""
+    debit = model._meta.get_field('debit')
+    output = debit.clone() if isinstance(debit, DecimalField) else FloatField()
+    balance = (Coalesce(F('debit'), Value(0), output_field=output)
+               - Coalesce(F('credit'), Value(0), output_field=output))
+    if isinstance(debit, DecimalField):
+        # Exact on PostgreSQL; SQLite subtracts floats, so round away the error
+        balance = Round(balance, debit.decimal_places)
+    return balance
+
+
+def master_balance_sql(model):
+    """
+    balance_sql, but NULL when debit and credit are both 0 or NULL: that is
+    when ``get_balance`` returns the int 0 instead of a float.
+    """
+    debit = model._meta.get_field('debit')
+    output = debit.clone() if isinstance(debit, DecimalField) else FloatField()
+    empty = (Q(debit__isnull=True) | Q(debit=0)) & (Q(credit__isnull=True) | Q(credit=0))
+    return Case(When(empty, then=Value(None)), default=balance_sql(model), output_field=output)
+
+
+def master_balance(value):
+    return 0 if value is None else float(value)
+
+
+BALANCE_FIELDS = {'balance': (master_balance_sql, master_balance)}
+
+UNKNOWN_LABEL = 'Unknown'
+DIRECTDEALING_LABELS = {'Y': 'Yes', 'S': 'Self', 'N': 'Dealing No'}
+AMC_LABELS = {'F': 'Free', 'A': 'SUC', 'S': 'Service Charge'}
+LICTYPE_LABELS = {'E': 'Enterprise', 'P': 'Professional'}
+
+
 # ── Base serializers ──────────────────────────────────────────────────────────
 
 class BaseLedgerSerializer(serializers.ModelSerializer):
@@ -24,13 +66,9 @@ class BaseLedgerSerializer(serializers.ModelSerializer):
         if 'entry_date' in data and data['entry_date']:
             try:
                 if isinstance(data['entry_date'], str):
-                    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S']:
-                        try:
-                            parsed_date = datetime.strptime(data['entry_date'], fmt).date()
-                            data['entry_date'] = parsed_date.strftime('%Y-%m-%d')
-                            break
-                        except ValueError:
-                            continue
+                    parsed_date = parse_date(data['entry_date'])
+                    if parsed_date is not None:
+                        data['entry_date'] = parsed_date.strftime('%Y-%m-%d')
                     else:
                         logger.warning(f"Could not parse date: {data['entry_date']}")
                         data['entry_date'] = None
@@ -72,6 +110,8 @@ class IMC1Serializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'name', 'opening_balance', 'debit', 'credit',
                   'place', 'phone2', 'openingdepartment', 'synced_at', 'balance']
 
+    sql_fields = BALANCE_FIELDS
+
     def get_balance(self, obj):
         return (obj.debit or 0) - (obj.credit or 0)
 
@@ -116,6 +156,8 @@ class IMC2Serializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'name', 'opening_balance', 'debit', 'credit',
                   'place', 'phone2', 'openingdepartment', 'synced_at', 'balance']
 
+    sql_fields = BALANCE_FIELDS
+
     def get_balance(self, obj):
         return (obj.debit or 0) - (obj.credit or 0)
 
@@ -160,6 +202,8 @@ class SysmacSerializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'name', 'opening_balance', 'debit', 'credit',
                   'place', 'phone2', 'openingdepartment', 'synced_at', 'balance']
 
+    sql_fields = BALANCE_FIELDS
+
     def get_balance(self, obj):
         return (obj.debit or 0) - (obj.credit or 0)
 
@@ -204,6 +248,8 @@ class DQSerializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'name', 'opening_balance', 'debit', 'credit',
                   'place', 'phone2', 'openingdepartment', 'synced_at', 'balance']
 
+    sql_fields = BALANCE_FIELDS
+
     def get_balance(self, obj):
         return (obj.debit or 0) - (obj.credit or 0)
 
@@ -249,6 +295,8 @@ class PlanetMasterSerializer(serializers.ModelSerializer):
         fields = ['code', 'name', 'super_code', 'opening_balance', 'debit', 'credit',
                   'place', 'phone2', 'openingdepartment', 'balance']
 
+    sql_fields = BALANCE_FIELDS
+
     def get_balance(self, obj):
         return (obj.debit or 0) - (obj.credit or 0)
 
@@ -331,14 +379,20 @@ class PlanetClientsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['directdealing_label', 'amc_label', 'lictype_label']
 
+    label_fields = {
+        'directdealing_label': ('directdealing', DIRECTDEALING_LABELS),
+        'amc_label': ('amc', AMC_LABELS),
+        'lictype_label': ('lictype', LICTYPE_LABELS),
+    }
+
     def get_directdealing_label(self, obj):
-        return {'Y': 'Yes', 'S': 'Self', 'N': 'Dealing No'}.get(obj.directdealing, 'Unknown')
+        return DIRECTDEALING_LABELS.get(obj.directdealing, UNKNOWN_LABEL)
 
     def get_amc_label(self, obj):
-        return {'F': 'Free', 'A': 'SUC', 'S': 'Service Charge'}.get(obj.amc, 'Unknown')
+        return AMC_LABELS.get(obj.amc, UNKNOWN_LABEL)
 
     def get_lictype_label(self, obj):
-        return {'E': 'Enterprise', 'P': 'Professional'}.get(obj.lictype, 'Unknown')
+        return LICTYPE_LABELS.get(obj.lictype, UNKNOWN_LABEL)
 
 
 # ── InvMast base — all managed=True, have auto id ────────────────────────────
@@ -355,13 +409,9 @@ class BaseInvMastSerializer(serializers.ModelSerializer):
         if 'invdate' in data and data['invdate']:
             try:
                 if isinstance(data['invdate'], str):
-                    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S']:
-                        try:
-                            parsed_date = datetime.strptime(data['invdate'], fmt).date()
-                            data['invdate'] = parsed_date.strftime('%Y-%m-%d')
-                            break
-                        except ValueError:
-                            continue
+                    parsed_date = parse_date(data['invdate'])
+                    if parsed_date is not None:
+                        data['invdate'] = parsed_date.strftime('%Y-%m-%d')
                     else:
                         logger.warning(f"Could not parse invdate: {data['invdate']}")
                         data['invdate'] = None
@@ -526,12 +576,9 @@ class AccLedgerSerializer(serializers.ModelSerializer):
         # Parse date from common formats
         if data.get('date'):
             if isinstance(data['date'], str):
-                for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y'):
-                    try:
-                        data['date'] = datetime.strptime(data['date'], fmt).date().strftime('%Y-%m-%d')
-                        break
-                    except ValueError:
-                        continue
+                parsed_date = parse_date(data['date'])
+                if parsed_date is not None:
+                    data['date'] = parsed_date.strftime('%Y-%m-%d')
                 else:
                     logger.warning(f"AccLedger: could not parse date {data['date']!r}")
                     data['date'] = None
@@ -553,4 +600,23 @@ class AccLedgerSerializer(serializers.ModelSerializer):
             if data.get(field) is None:
                 data[field] = ''
 
-        return super().to_internal_value(data)
\ No newline at end of file
+        return super().to_internal_value(data)
+
+
+# ── AccLedgerBalance — read-only summary of acc_ledgers ──────────────────────
+
+# Renders debit - credit like the model's amount columns
+LEDGER_BALANCE = serializers.DecimalField(max_digits=20, decimal_places=5)
+
+
+class AccLedgerBalanceSerializer(serializers.ModelSerializer):
+    balance = serializers.SerializerMethodField()
+
+    class Meta:
+        model  = AccLedgerBalance
+        fields = ['client_id', 'code', 'debit', 'credit', 'balance', 'entries']
+
+    sql_fields = {'balance': (balance_sql, LEDGER_BALANCE.to_representation)}
+
+    def get_balance(self, obj):
+        return LEDGER_BALANCE.to_representation(obj.debit - obj.credit)
@@ -0,0 +1,270 @@
+"""
+Upload sessions: chunked, parallel pushes for the client-scoped endpoints.
+
+The plain POST endpoints for these tables only append, so the sync tool has
+to DELETE first and then send its chunks one at a time, and a tool that dies
+partway leaves the client's rows half loaded.  With a session:
+
+    POST   <endpoint>/sessions/                      begin → {"session_id": ...}
+    PUT    <endpoint>/sessions/<id>/chunks/<n>/      upload chunk n (any order,
+                                                     in parallel; re-sending n
+                                                     replaces it)
+    POST   <endpoint>/sessions/<id>/commit/          replace the client's rows
+                                                     with chunks 0..n in order
+    GET    <endpoint>/sessions/<id>/                 session status
+    DELETE <endpoint>/sessions/<id>/                 abort
+
+A session belongs to one client (X-Client-ID or ?client_id=, required).
+Chunks are validated when uploaded and staged in ``sync_upload_chunks``;
+commit deletes the client's rows and loads every chunk in one transaction.
+Chunk uploads and commit lock the session row, so a chunk is either in the
+commit or refused with 409.
+Sessions idle for longer than ``SYNC_UPLOAD_SESSION_TTL`` seconds expire;
+``manage.py purge_upload_sessions`` removes them.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import UploadChunk, UploadSession
+from .parsers import RecordStream, is_record_list
+from .partitions import ensure_partition
+from .views import (
+    SyncAPIView, PlanetClientsRecordView, AccMasterView, AccProductView,
+    AccDepartmentView, AccLedgerView,
+)
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that accept upload sessions → the view whose coercer and table
+# the session loads.
+SESSION_ENDPOINTS = {
+    'rrc-clients': PlanetClientsRecordView,
+    'acc-master': AccMasterView,
+    'acc-product': AccProductView,
+    'acc-departments': AccDepartmentView,
+    'acc-ledgers': AccLedgerView,
+}
+
+
+def session_ttl():
+    return timedelta(seconds=getattr(settings, 'SYNC_UPLOAD_SESSION_TTL', 3600))
+
+
+def purge_expired_sessions(now=None):
+    """
+    Delete expired uncommitted sessions and old committed ones; returns the
+    number of sessions removed.
+    """
+    now = now or timezone.now()
+    label = UploadSession._meta.label
+    _, expired = UploadSession.objects.filter(
+        committed_at__isnull=True, expires_at__lt=now).delete()
+    _, committed = UploadSession.objects.filter(
+        committed_at__lt=now - session_ttl()).delete()
+    return expired.get(label, 0) + committed.get(label, 0)
+
+
+def session_records(session):
+    """The staged records of ``session`` in chunk order, one chunk in memory."""
+    chunks = session.chunks.order_by('seq').values_list('records', flat=True)
+    return RecordStream(
+        record for records in chunks.iterator(chunk_size=1) for record in json.loads(records)
+    )
+
+
+class UploadSessionBaseView(SyncAPIView):
+
+    @property
+    def record_type(self):
+        view_class = SESSION_ENDPOINTS.get(self.kwargs.get('endpoint'))
+        return view_class.record_type if view_class is not None else None
+
+    @property
+    def coercer(self):
+        # The target's table, so a commit bumps its cached GET responses
+        view_class = SESSION_ENDPOINTS.get(self.kwargs.get('endpoint'))
+        return view_class.coercer if view_class is not None else None
+
+    def get_target(self, endpoint):
+        view_class = SESSION_ENDPOINTS.get(endpoint)
+        if view_class is None:
+            return None
+        view = view_class()
+        view.metrics = self.metrics
+        return view
+
+    def get_session(self, endpoint, session_id, lock=False):
+        """Return ``(session, error_response)``; exactly one is None."""
+        qs = UploadSession.objects.filter(endpoint=endpoint)
+        if lock:
+            qs = qs.select_for_update()
+        session = qs.filter(pk=session_id).first()
+        if session is None:
+            return None, Response({"error": "Unknown upload session"}, status=404)
+        if session.committed_at is not None:
+            return None, Response(
+                {"error": "Upload session already committed", "count": session.record_count},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if session.expires_at < timezone.now():
+            session.delete()
+            return None, Response({"error": "Upload session expired"}, status=status.HTTP_410_GONE)
+        return session, None
+
+
+class UploadSessionView(UploadSessionBaseView):
+    """POST begins a session; GET reports on it; DELETE aborts it."""
+
+    def post(self, request, endpoint):
+        if self.get_target(endpoint) is None:
+            return Response({"error": f"Upload sessions are not available for {endpoint}"}, status=404)
+        client_id = self._get_client_id(request)
+        if not client_id:
+            # A commit replaces the client's rows; without one it would replace the table
+            return Response({"error": "client_id is required"}, status=400)
+        purge_expired_sessions()
+        session = UploadSession.objects.create(
+            endpoint=endpoint,
+            client_id=client_id,
+            expires_at=timezone.now() + session_ttl(),
+        )
+        logger.info(f"{endpoint} - Upload session {session.pk} started (client_id={client_id!r})")
+        return Response(
+            {"session_id": str(session.pk), "client_id": client_id,
+             "expires_at": session.expires_at},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def get(self, request, endpoint, session_id):
+        session, error = self.get_session(endpoint, session_id)
+        if error is not None:
+            return error
+        chunks = list(session.chunks.order_by('seq').values_list('seq', 'record_count'))
+        return Response({
+            "session_id": str(session.pk),
+            "client_id": session.client_id,
+            "expires_at": session.expires_at,
+            "chunks": [seq for seq, _ in chunks],
+            "record_count": sum(count for _, count in chunks),
+        })
+
+    def delete(self, request, endpoint, session_id):
+        session, error = self.get_session(endpoint, session_id)
+        if error is not None:
+            return error
+        session.delete()
+        logger.info(f"{endpoint} - Upload session {session_id} aborted")
+        return Response({"deleted": True, "session_id": str(session_id)}, status=200)
+
+
+class UploadChunkView(UploadSessionBaseView):
+    """PUT (or POST) stages chunk ``seq`` of a session."""
+
+    def put(self, request, endpoint, session_id, seq):
+        target = self.get_target(endpoint)
+        session, error = self.get_session(endpoint, session_id)
+        if error is not None:
+            return error
+
+        data = request.data
+        if not is_record_list(data):
+            return Response({"error": "Expected a list of records"}, status=400)
+        records = list(data)
+
+        # Validate now so the tool hears about bad rows while it still has
+        # the chunk; commit coerces the staged records again.
+        _, failed = target.coercer.coerce_batch(records, {"client_id": session.client_id})
+        if failed:
+            errors = [{} for _ in records]
+            for idx, _, field_errors in failed:
+                errors[idx] = field_errors
+            logger.error(f"{endpoint} - Session {session_id} chunk {seq}: "
+                         f"{len(failed)} invalid records")
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Under the session's lock: a commit either sees this chunk or has
+        # already marked the session committed.
+        with transaction.atomic():
+            session, error = self.get_session(endpoint, session_id, lock=True)
+            if error is not None:
+                return error
+            UploadChunk.objects.update_or_create(
+                session=session, seq=seq,
+                defaults={"record_count": len(records), "records": json.dumps(records)},
+            )
+            UploadSession.objects.filter(pk=session.pk).update(
+                expires_at=timezone.now() + session_ttl())
+        return Response(
+            {"session_id": str(session_id), "chunk": seq, "count": len(records)},
+            status=status.HTTP_201_CREATED,
+        )
+
+    post = put
+
+
+class UploadCommitView(UploadSessionBaseView):
+    """
+    POST commits a session.  An optional ``{"chunks": N}`` body makes the
+    commit fail unless chunks 0..N-1 have all been uploaded.
+    """
+
+    def post(self, request, endpoint, session_id):
+        target = self.get_target(endpoint)
+        expected = request.data.get("chunks") if isinstance(request.data, dict) else None
+        if expected is not None:
+            if isinstance(expected, bool) or not str(expected).isdigit():
+                return Response({"error": "chunks must be a non-negative whole number"}, status=400)
+            expected = int(expected)
+
+        session, error = self.get_session(endpoint, session_id)
+        if error is not None:
+            return error
+        if not session.client_id:
+            return Response({"error": "Upload session has no client_id"}, status=400)
+        # Outside the transaction: creating a client's partition locks the table
+        ensure_partition(target.coercer.model, session.client_id)
+
+        with transaction.atomic():
+            session, error = self.get_session(endpoint, session_id, lock=True)
+            if error is not None:
+                return error
+
+            seqs = list(session.chunks.order_by('seq').values_list('seq', flat=True))
+            if not seqs:
+                return Response({"error": "No chunks uploaded"}, status=400)
+            if expected is not None:
+                missing = sorted(set(range(expected)) - set(seqs))
+                if missing:
+                    return Response(
+                        {"error": "Missing chunks", "missing": missing},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+            self.metrics.client_id = session.client_id
+            saved, errors = target.replace_client_rows(session.client_id, session_records(session))
+            if errors:
+                transaction.set_rollback(True)
+            else:
+                session.chunks.all().delete()
+                session.committed_at = timezone.now()
+                session.record_count = saved
+                session.save(update_fields=['committed_at', 'record_count'])
+
+        if errors:
+            logger.error(f"{endpoint} - Session {session_id} commit failed validation")
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"{endpoint} - Session {session_id} committed {saved} records "
+                    f"from {len(seqs)} chunks (client_id={session.client_id!r})")
+        return Response(
+            {"message": f"{endpoint} records saved", "count": saved,
+             "chunks": len(seqs), "client_id": session.client_id},
+            status=status.HTTP_201_CREATED,
+        )
@@ -0,0 +1,190 @@
+"""
+Shadow-table reloads for the full-table push endpoints (PostgreSQL only).
+
+Instead of ``DELETE FROM <table>`` followed by reinserting every row, a swap
+push loads into a fresh ``<table>__shadow`` created with
+``CREATE TABLE ... (LIKE <table> INCLUDING DEFAULTS INCLUDING IDENTITY)``, so
+the COPY runs against a table with no secondary indexes.  Only the primary
+key and unique constraints are created up front, so duplicate keys still fail
+the batch that carries them (and the ledger views can retry it row by row),
+unless the loader has a conflict policy to merge them by.
+``finish`` then:
+
+1. adds the remaining constraints and builds the other indexes on the shadow;
+2. takes an ACCESS EXCLUSIVE lock, renames the live table away and the
+   shadow into its place;
+3. drops the old table and gives the constraints, indexes and identity
+   sequences their original names.
+
+All of it runs in the request's transaction, so readers see the old table
+until commit and the new one after; nothing is left for VACUUM.  Tables
+that other objects depend on (views, incoming foreign keys, user triggers)
+cannot be swapped like this, and ``can_swap`` reports False for them so the
+caller falls back to delete-and-reinsert.  Grants are not copied; the sync
+tables are owned and read by the application role.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .bulk import BulkLoader
+
+# PostgreSQL truncates identifiers longer than this
+MAX_NAME_LENGTH = 63
+
+_INDEX_DEF = re.compile(r'^(CREATE (?:UNIQUE )?INDEX) \S+ ON (?:ONLY )?\S+ (USING .*)$', re.S)
+
+_DEPENDENTS_SQL = """
+    SELECT
+        (SELECT count(*) FROM pg_constraint
+          WHERE confrelid = %(rel)s::regclass AND conrelid <> %(rel)s::regclass)
+      + (SELECT count(*) FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+          WHERE d.refobjid = %(rel)s::regclass AND r.ev_class <> %(rel)s::regclass)
+      + (SELECT count(*) FROM pg_trigger
+          WHERE tgrelid = %(rel)s::regclass AND NOT tgisinternal)
+"""
+
+_CONSTRAINTS_SQL = """
+    SELECT conname, pg_get_constraintdef(oid)
+      FROM pg_constraint
+     WHERE conrelid = %s::regclass AND contype = ANY(%s)
+     ORDER BY conname
+"""
+
+# Constraints that reject individual rows, added before the load
+KEY_CONSTRAINTS = ['p', 'u', 'x']
+OTHER_CONSTRAINTS = ['c', 'f']
+
+_INDEXES_SQL = """
+    SELECT c.relname, pg_get_indexdef(i.indexrelid)
+      FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+     WHERE i.indrelid = %s::regclass
+       AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+     ORDER BY c.relname
+"""
+
+_SEQUENCES_SQL = """
+    SELECT a.attname, a.attidentity <> '', pg_get_serial_sequence(%s, a.attname)
+      FROM pg_attribute a
+     WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+       AND pg_get_serial_sequence(%s, a.attname) IS NOT NULL
+"""
+
+
+def _derived_name(name, suffix):
+    return name[:MAX_NAME_LENGTH - len(suffix)] + suffix
+
+
+class ShadowTableLoader:
+    """
+    Reload ``model``'s table through a shadow table and an atomic rename.
+
+        if ShadowTableLoader.can_swap(IMC1Record):
+            loader = ShadowTableLoader(IMC1Record).begin()
+            loader.load(rows)
+            loader.finish()
+
+    Must run inside a transaction; ``begin`` to ``finish`` is one push.
+    """
+
+    def __init__(self, model, fields=None, using=DEFAULT_DB_ALIAS, **loader_options):
+        self.model = model
+        self.table = model._meta.db_table
+        self.shadow = _derived_name(self.table, '__shadow')
+        self.retired = _derived_name(self.table, '__retired')
+        self.using = using
+        # ``loader_options``: BulkLoader's conflict and summed
+        self.loader = BulkLoader(model, fields=fields, using=using, table=self.shadow,
+                                 **loader_options)
+        self._renames = []
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    @classmethod
+    def can_swap(cls, model, using=DEFAULT_DB_ALIAS):
+        conn = connections[using]
+        if conn.vendor != 'postgresql':
+            return False
+        with conn.cursor() as cursor:
+            cursor.execute(_DEPENDENTS_SQL, {'rel': conn.ops.quote_name(model._meta.db_table)})
+            return cursor.fetchone()[0] == 0
+
+    def begin(self):
+        qn = self.connection.ops.quote_name
+        table, shadow = qn(self.table), qn(self.shadow)
+        with self.connection.cursor() as cursor:
+            # One swap per table at a time; released at commit/rollback.
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [self.shadow])
+            cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+            cursor.execute(
+                f"CREATE TABLE {shadow} "
+                f"(LIKE {table} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED)"
+            )
+            # Identity columns got a fresh sequence; carry on the live numbering.
+            cursor.execute(_SEQUENCES_SQL, [table, table, table])
+            for column, is_identity, sequence in cursor.fetchall():
+                if not is_identity:
+                    continue
+                cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+                last_value, is_called = cursor.fetchone()
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, %s), %s, %s)",
+                    [shadow, column, last_value, is_called],
+                )
+                cursor.execute(
+                    "SELECT pg_get_serial_sequence(%s, %s), relname FROM pg_class "
+                    "WHERE oid = %s::regclass",
+                    [shadow, column, sequence],
+                )
+                shadow_sequence, name = cursor.fetchone()
+                self._renames.append(f"ALTER SEQUENCE {shadow_sequence} RENAME TO {qn(name)}")
+            self._add_constraints(cursor, KEY_CONSTRAINTS)
+        return self
+
+    def _add_constraints(self, cursor, kinds):
+        qn = self.connection.ops.quote_name
+        cursor.execute(_CONSTRAINTS_SQL, [qn(self.table), kinds])
+        for name, definition in cursor.fetchall():
+            temp = _derived_name(name, '__shadow')
+            cursor.execute(
+                f"ALTER TABLE {qn(self.shadow)} ADD CONSTRAINT {qn(temp)} {definition}"
+            )
+            self._renames.append(
+                f"ALTER TABLE {qn(self.table)} RENAME CONSTRAINT {qn(temp)} TO {qn(name)}"
+            )
+
+    def load(self, rows):
+        return self.loader.load(rows)
+
+    def finish(self):
+        """Index the shadow table and swap it in for the live one."""
+        qn = self.connection.ops.quote_name
+        table, shadow, retired = qn(self.table), qn(self.shadow), qn(self.retired)
+        renames = self._renames
+        with self.connection.cursor() as cursor:
+            self._add_constraints(cursor, OTHER_CONSTRAINTS)
+
+            cursor.execute(_INDEXES_SQL, [table])
+            for name, definition in cursor.fetchall():
+                temp = _derived_name(name, '__shadow')
+                match = _INDEX_DEF.match(definition)
+                cursor.execute(f"{match.group(1)} {qn(temp)} ON {shadow} {match.group(2)}")
+                renames.append(f"ALTER INDEX {qn(temp)} RENAME TO {qn(name)}")
+
+            cursor.execute(_SEQUENCES_SQL, [table, table, table])
+            serials = [(column, seq) for column, is_identity, seq in cursor.fetchall()
+                       if not is_identity]
+
+            cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {retired}")
+            cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+            # serial columns share the old sequence; keep it when the old table goes
+            for column, sequence in serials:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{qn(column)}")
+            cursor.execute(f"DROP TABLE {retired}")
+            for statement in renames:
+                cursor.execute(statement)
+            cursor.execute(f"ANALYZE {table}")
+        return {'mode': 'swap'}
@@ -0,0 +1,76 @@
+-- Indexes for the client-scoped sync tables (PostgreSQL).
+--
+-- Every GET and DELETE on these tables filters by client_id, and
+-- acc-ledgers GETs also by code.  acc_ledgers is created by Django and gets
+-- its indexes from AccLedger.Meta.indexes on new databases; the other
+-- tables are unmanaged, so their constraints in models.py are only
+-- documentation.  This script brings an existing database in line with
+-- models.py.  The names match the ones in Meta.
+--
+-- CREATE INDEX CONCURRENTLY cannot run in a transaction, so run the script
+-- with plain psql (no --single-transaction):
+--
+--     psql "$DATABASE_URL" -f syncdata/sql/client_scoped_indexes.sql
+--
+-- Each statement is idempotent.  A unique index fails to build if a
+-- client already has duplicate rows.  The queries at the end of this file
+-- list the duplicates.  After a failed CONCURRENTLY build, drop the INVALID
+-- index it leaves behind before re-running.
+
+-- acc_ledgers: per-client GET/DELETE, ?code= lookups and per-code totals
+CREATE INDEX CONCURRENTLY IF NOT EXISTS acc_ledgers_client_code_idx
+    ON acc_ledgers (client_id, code);
+-- acc_ledgers: trial balance date ranges
+CREATE INDEX CONCURRENTLY IF NOT EXISTS acc_ledgers_client_date_idx
+    ON acc_ledgers (client_id, date);
+
+-- Natural keys of the master tables.  client_id leads so that the same
+-- index serves the per-client DELETE and GET.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS acc_master_client_code_uniq
+    ON acc_master (client_id, code);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS acc_product_client_code_uniq
+    ON acc_product (client_id, code);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS acc_departments_client_dept_uniq
+    ON acc_departments (client_id, department_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS planet_clients_client_code_uniq
+    ON planet_clients (client_id, code);
+
+-- Attach the unique indexes as constraints so they show up as such in \d
+-- and ON CONFLICT (client_id, ...) can name them.  The ALTER is quick: it
+-- reuses the index built above.
+DO $$
+DECLARE
+    item record;
+BEGIN
+    FOR item IN
+        SELECT * FROM (VALUES
+            ('acc_master', 'acc_master_client_code_uniq'),
+            ('acc_product', 'acc_product_client_code_uniq'),
+            ('acc_departments', 'acc_departments_client_dept_uniq'),
+            ('planet_clients', 'planet_clients_client_code_uniq')
+        ) AS t (tbl, idx)
+    LOOP
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = item.idx) THEN
+            EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I UNIQUE USING INDEX %I',
+                           item.tbl, item.idx, item.idx);
+        END IF;
+    END LOOP;
+END
+$$;
+
+ANALYZE acc_ledgers;
+ANALYZE acc_master;
+ANALYZE acc_product;
+ANALYZE acc_departments;
+ANALYZE planet_clients;
+
+-- Duplicates that block a unique index:
+--
+--   SELECT client_id, code, count(*) FROM acc_master
+--    GROUP BY client_id, code HAVING count(*) > 1;
+--   SELECT client_id, code, count(*) FROM acc_product
+--    GROUP BY client_id, code HAVING count(*) > 1;
+--   SELECT client_id, department_id, count(*) FROM acc_departments
+--    GROUP BY client_id, department_id HAVING count(*) > 1;
+--   SELECT client_id, code, count(*) FROM planet_clients
+--    GROUP BY client_id, code HAVING count(*) > 1;
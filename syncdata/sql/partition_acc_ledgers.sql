@@ -0,0 +1,78 @@
+-- Convert acc_ledgers into a table LIST-partitioned by client_id (PostgreSQL 11+).
+--
+-- Each client's ledger rows move into their own partition, which means:
+--   * a client reload is a TRUNCATE of one partition rather than a DELETE
+--     across every tenant's rows;
+--   * client-scoped reads touch only that client's partition.
+-- New clients get their partition from partitions.ensure_partition when
+-- they first push.  There is no DEFAULT partition: a DEFAULT partition
+-- holding a client's rows would stop that client's own partition from
+-- being created.
+--
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f syncdata/sql/partition_acc_ledgers.sql
+--
+-- The copy runs in one transaction and holds an exclusive lock on
+-- acc_ledgers, so run it in a maintenance window.  Restart the workers
+-- afterwards, because they look up once per process whether the table is
+-- partitioned.  The old table is kept as acc_ledgers_unpartitioned.  Drop
+-- it once the counts match:
+--
+--     SELECT (SELECT count(*) FROM acc_ledgers), (SELECT count(*) FROM acc_ledgers_unpartitioned);
+--     DROP TABLE acc_ledgers_unpartitioned;
+--
+-- acc_master and acc_product can be converted the same way.  Their
+-- (client_id, code) unique key already includes the partition column.
+
+BEGIN;
+
+LOCK TABLE acc_ledgers IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE acc_ledgers RENAME TO acc_ledgers_unpartitioned;
+ALTER TABLE acc_ledgers_unpartitioned RENAME CONSTRAINT acc_ledgers_pkey TO acc_ledgers_unpartitioned_pkey;
+ALTER INDEX IF EXISTS acc_ledgers_client_code_idx RENAME TO acc_ledgers_unpartitioned_client_code_idx;
+ALTER INDEX IF EXISTS acc_ledgers_client_date_idx RENAME TO acc_ledgers_unpartitioned_client_date_idx;
+
+-- Same columns as AccLedger; the primary key has to include the partition key
+CREATE TABLE acc_ledgers (
+    id          bigint GENERATED BY DEFAULT AS IDENTITY,
+    code        varchar(30)    NOT NULL,
+    particulars varchar(250)   NULL,
+    debit       numeric(15, 5) NULL,
+    credit      numeric(15, 5) NULL,
+    entry_mode  varchar(30)    NULL,
+    voucher_no  numeric(15, 5) NULL,
+    narration   varchar(250)   NULL,
+    date        date           NULL,
+    client_id   varchar(50)    NOT NULL,
+    CONSTRAINT acc_ledgers_pkey PRIMARY KEY (id, client_id)
+) PARTITION BY LIST (client_id);
+
+-- Partitioned indexes; every partition gets its own copy
+CREATE INDEX acc_ledgers_client_code_idx ON acc_ledgers (client_id, code);
+CREATE INDEX acc_ledgers_client_date_idx ON acc_ledgers (client_id, date);
+
+-- One partition per existing client, named like partitions.partition_name()
+DO $$
+DECLARE
+    client text;
+BEGIN
+    FOR client IN SELECT DISTINCT client_id FROM acc_ledgers_unpartitioned LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF acc_ledgers FOR VALUES IN (%L)',
+                       'acc_ledgers_p_' || left(md5(client), 16), client);
+    END LOOP;
+END
+$$;
+
+INSERT INTO acc_ledgers (id, code, particulars, debit, credit, entry_mode,
+                         voucher_no, narration, date, client_id)
+SELECT id, code, particulars, debit, credit, entry_mode,
+       voucher_no, narration, date, client_id
+  FROM acc_ledgers_unpartitioned;
+
+-- Continue the ids where the old table left off
+SELECT setval(pg_get_serial_sequence('acc_ledgers', 'id'), COALESCE(max(id), 0) + 1, false)
+  FROM acc_ledgers;
+
+COMMIT;
+
+ANALYZE acc_ledgers;
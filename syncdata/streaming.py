@@ -0,0 +1,64 @@
+"""
+Streamed JSON array responses for the sync GET endpoints.
+
+A full-table GET used to build ``serializer.data`` for every row and render
+it as one string, so worker memory and time-to-first-byte grew with the
+table.  ``StreamingJSONResponse`` reads the queryset through
+``QuerySet.iterator(chunk_size=...)`` (a server-side cursor on PostgreSQL)
+and writes the array ``chunk_size`` rows at a time; the body is the same
+JSON DRF's JSONRenderer would produce.  Rows come from the serializer's
+``readers.ValuesReader`` when it has one, else from the serializer itself.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .readers import ValuesReader
+
+CHUNK_SIZE = 2000
+
+
+def dumps(data):
+    # JSONRenderer's defaults (COMPACT_JSON, UNICODE_JSON)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def serialized_batches(queryset, serializer_class, chunk_size=CHUNK_SIZE):
+    """``serializer_class(..., many=True).data`` for ``chunk_size`` rows at a time."""
+    batch = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        batch.append(instance)
+        if len(batch) == chunk_size:
+            yield serializer_class(batch, many=True).data
+            batch = []
+    if batch:
+        yield serializer_class(batch, many=True).data
+
+
+def row_batches(queryset, serializer_class, chunk_size=CHUNK_SIZE, fast=True):
+    """Batches of output dicts, through the ValuesReader when ``fast`` and possible."""
+    reader = ValuesReader.for_serializer(serializer_class) if fast else None
+    if reader is not None:
+        return reader.batches(queryset, chunk_size)
+    return serialized_batches(queryset, serializer_class, chunk_size)
+
+
+def json_array_chunks(batches):
+    """Yield ``batches`` of rows as the pieces of one JSON array."""
+    yield b'['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        yield (b'' if first else b',') + dumps(batch)[1:-1].encode()
+        first = False
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+
+    def __init__(self, queryset, serializer_class, chunk_size=CHUNK_SIZE, fast=True, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(
+            json_array_chunks(row_batches(queryset, serializer_class, chunk_size, fast)), **kwargs)
@@ -1,3 +1,1695 @@
-from django.test import TestCase
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .models import (
+    AccDepartment, AccLedger, AccLedgerBalance, AccMaster, AccProduct, IMC1Record, IMC1RecordLedgers,
+    PlanetClient, PlanetMaster, SyncRowDigest, UploadChunk, UploadSession,
+)
+from .checks import check_conflict_policies, conflict_policies
+from .coercion import RowCoercer, RowError
+from .bulk import BulkLoader, _CopyStream
+from .dates import DATE_FORMATS, DateParser
+from .cache import RESPONSE_CACHE
+from .log import QueuedFileHandler, RateLimitFilter
+from .metrics import Registry, RequestMetrics
+from .pagination import KeysetPagination, decode_cursor, encode_cursor
+from .purge import purge
+from .partitions import ensure_partition, find_partition, is_partitioned, partition_name, truncate_partition
+from .parsers import (
+    DECODERS, ColumnarCSVParser, ColumnarMsgPackParser, RecordStream, StreamingJSONParser, msgpack, zstandard,
+)
+from .readers import ValuesReader
+from .reports import _trial_balance_sql
+from .serializers import IMC1LedgersSerializer, IMC1Serializer, PlanetClientsSerializer, PlanetMasterSerializer
+from .shadow import ShadowTableLoader
+from .streaming import dumps, serialized_batches
+from .views import IMC1LedgersView
+
+CLIENTS = 20
+ROWS_PER_CLIENT = 50
+
+# Indexes that can answer ``WHERE client_id = %s`` on each table
+CLIENT_INDEXES = {
+    AccMaster: ['acc_master_client_code_uniq'],
+    AccProduct: ['acc_product_client_code_uniq'],
+    AccDepartment: ['acc_departments_client_dept_uniq'],
+    PlanetClient: ['planet_clients_client_code_uniq'],
+    AccLedger: ['acc_ledgers_client_code_idx', 'acc_ledgers_client_date_idx'],
+}
+
+
+def setUpModule():
+    # The test runner only creates the managed tables
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in apps.get_app_config('syncdata').get_models():
+            if not model._meta.managed and model._meta.db_table not in existing:
+                editor.create_model(model)
+
+
+# Keep tests from sharing version files and cached responses with each other
+@override_settings(SYNC_CACHE_VERSION_DIR='', SYNC_METRICS_DIR='')
+class SyncAPITestCase(APITestCase):
+    """Base for tests that go through the api/sync/ endpoints."""
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are checked on PostgreSQL')
+class ClientScopedQueryPlanTests(TestCase):
+    """
+    The per-client GETs and DELETEs find their rows through the client_id
+    indexes declared in models.py (sql/client_scoped_indexes.sql) instead
+    of scanning every tenant's rows.
+
+    The test tables are too small for the planner to prefer an index on its
+    own, so sequential scans are priced out: a query with no usable index
+    still plans as a Seq Scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Codes repeat across clients, as they do between DSNs; the test
+        # tables' single-column primary keys need them prefixed.
+        clients = [f'DSN{c:02}' for c in range(CLIENTS)]
+        codes = [f'{n:04}' for n in range(ROWS_PER_CLIENT)]
+        AccMaster.objects.bulk_create(
+            AccMaster(code=f'{client}-{code}', name=code, client_id=client)
+            for client in clients for code in codes)
+        AccProduct.objects.bulk_create(
+            AccProduct(code=f'{client}-{code}', client_id=client)
+            for client in clients for code in codes)
+        AccDepartment.objects.bulk_create(
+            AccDepartment(department_id=f'{client}-{code}', client_id=client)
+            for client in clients for code in codes)
+        PlanetClient.objects.bulk_create(
+            PlanetClient(code=f'{client}-{code}', client_id=client)
+            for client in clients for code in codes)
+        start = datetime.date(2024, 4, 1)
+        AccLedger.objects.bulk_create(
+            AccLedger(code=code, debit=n, credit=0, client_id=client,
+                      date=start + datetime.timedelta(days=n))
+            for client in clients for n, code in enumerate(codes))
+        with connection.cursor() as cursor:
+            for model in (AccMaster, AccProduct, AccDepartment, PlanetClient, AccLedger):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return list(plan_nodes(plan[0]['Plan']))
+
+    def assertUsesIndex(self, sql, params, table, indexes):
+        nodes = self.explain(sql, params)
+        seq_scans = [n for n in nodes if n['Node Type'] == 'Seq Scan' and n.get('Relation Name') == table]
+        self.assertEqual(seq_scans, [], f'{table} is scanned sequentially by: {sql}')
+        used = {n['Index Name'] for n in nodes if 'Index Name' in n}
+        self.assertTrue(used & set(indexes), f'{sql} uses {sorted(used)}, not one of {indexes}')
+
+    def assertQuerysetUsesIndex(self, queryset, indexes):
+        sql, params = queryset.query.sql_with_params()
+        self.assertUsesIndex(sql, params, queryset.model._meta.db_table, indexes)
+
+    def test_client_get_uses_client_index(self):
+        for model, indexes in CLIENT_INDEXES.items():
+            with self.subTest(model=model.__name__):
+                self.assertQuerysetUsesIndex(model.objects.filter(client_id='DSN03'), indexes)
+
+    def test_client_delete_uses_client_index(self):
+        for model, indexes in CLIENT_INDEXES.items():
+            table = model._meta.db_table
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(
+                    f'DELETE FROM {table} WHERE client_id = %s', ['DSN03'], table, indexes)
+
+    def test_ledger_get_by_code_uses_client_code_index(self):
+        self.assertQuerysetUsesIndex(
+            AccLedger.objects.filter(client_id='DSN03', code='0007'), ['acc_ledgers_client_code_idx'])
+
+    def test_trial_balance_uses_ledger_indexes(self):
+        params = {'client_id': 'DSN03', 'date_from': datetime.date(2024, 4, 10),
+                  'date_to': datetime.date(2024, 4, 30)}
+        sql = _trial_balance_sql(connection.ops.quote_name, params['date_from'], params['date_to'])
+        self.assertUsesIndex(sql, params, 'acc_ledgers',
+                             ['acc_ledgers_client_code_idx', 'acc_ledgers_client_date_idx'])
+        self.assertUsesIndex(sql, params, 'acc_master', ['acc_master_client_code_uniq'])
+
+
+class FastReadPathTests(TestCase):
+    """ValuesReader renders the same JSON as the serializers it stands in for."""
+
+    def assertSameJSON(self, queryset, serializer_class):
+        reader = ValuesReader.for_serializer(serializer_class)
+        self.assertIsNotNone(reader)
+        fast = [row for batch in reader.batches(queryset) for row in batch]
+        slow = [row for batch in serialized_batches(queryset, serializer_class) for row in batch]
+        self.assertEqual(dumps(fast), dumps(slow))
+
+    def test_float_master_balance(self):
+        IMC1Record.objects.bulk_create([
+            IMC1Record(code='A', name='zero', opening_balance=0, debit=0, credit=0),
+            IMC1Record(code='B', name='even', opening_balance=1, debit=5.5, credit=5.5),
+            IMC1Record(code='C', name='debit', opening_balance=0, debit=12.25, credit=0),
+            IMC1Record(code='D', name='credit', opening_balance=0, debit=0, credit=3),
+        ])
+        self.assertSameJSON(IMC1Record.objects.order_by('pk'), IMC1Serializer)
+
+    def test_decimal_master_balance(self):
+        PlanetMaster.objects.bulk_create([
+            PlanetMaster(code='A', name='null'),
+            PlanetMaster(code='B', name='zero', debit=0, credit=Decimal('0.000')),
+            PlanetMaster(code='C', name='even', debit=Decimal('2.500'), credit=Decimal('2.500')),
+            PlanetMaster(code='D', name='mixed', debit=Decimal('10.125'), credit=None),
+        ])
+        self.assertSameJSON(PlanetMaster.objects.order_by('pk'), PlanetMasterSerializer)
+
+    def test_planet_client_labels(self):
+        PlanetClient.objects.bulk_create([
+            PlanetClient(code='P1', directdealing='Y', amc='F', amcamt=Decimal('12.50'),
+                         installationdate=datetime.date(2024, 1, 31)),
+            PlanetClient(code='P2', directdealing='?', amc=None),
+        ])
+        self.assertSameJSON(PlanetClient.objects.order_by('pk'), PlanetClientsSerializer)
+
+
+class DeltaConflictPolicyTests(SyncAPITestCase):
+    """Delta pushes merge repeated keys by the view's conflict policy."""
+
+    url = '/api/sync/imc1-ledgers/?mode=delta'
+
+    def push(self, records):
+        response = self.client.post(self.url, records, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['failed_count'], 0, response.data['failed_records'])
+        return response.data
+
+    def test_repeated_keys_are_merged(self):
+        records = [
+            {'code': 'A', 'debit': '1', 'particulars': 'first'},
+            {'code': 'B', 'debit': '2'},
+            {'code': 'A', 'debit': '3', 'particulars': 'last'},
+        ]
+        first = self.push(records)
+        self.assertEqual(first['processed_count'], 3)
+        self.assertEqual(IMC1RecordLedgers.objects.get(code='A').particulars, 'last')
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 2)
+
+        # The same push again matches the stored hashes
+        second = self.push(records)
+        self.assertEqual((second['mode'], second['unchanged'], second['updated']), ('delta', 2, 0))
+
+        records[2]['particulars'] = 'changed'
+        third = self.push(records)
+        self.assertEqual(third['updated'], 1)
+        self.assertEqual(IMC1RecordLedgers.objects.get(code='A').particulars, 'changed')
+
+    def test_repeated_keys_across_batches(self):
+        rows = [{'code': f'C{n}', 'debit': '1'} for n in range(600)]
+        rows.append({'code': 'C0', 'debit': '9', 'particulars': 'late'})
+        self.push(rows)
+        ids = sorted(IMC1RecordLedgers.objects.values_list('pk', flat=True))
+        second = self.push(rows)
+        self.assertEqual((second['inserted'], second['updated'], second['unchanged']), (0, 0, 600))
+        self.assertEqual(sorted(IMC1RecordLedgers.objects.values_list('pk', flat=True)), ids)
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 600)
+        self.assertEqual(IMC1RecordLedgers.objects.get(code='C0').particulars, 'late')
+
+
+class ConflictPolicySettingTests(SyncAPITestCase):
+    """Bad SYNC_CONFLICT_POLICIES entries are reported and ignored, not fatal."""
+
+    policies = ['bogus', 'nosuch=last', 'planet_ledgers=max', 'planet_master=last',
+                'syncdata_imc1recordledgers=first']
+
+    def test_check_reports_bad_entries(self):
+        with override_settings(SYNC_CONFLICT_POLICIES=self.policies), \
+                self.assertLogs('syncdata.checks', 'ERROR'):
+            errors = check_conflict_policies(None)
+            self.assertEqual(conflict_policies(), {'syncdata_imc1recordledgers': 'first'})
+        self.assertEqual([e.id for e in errors], ['syncdata.E001'] * 4)
+        for error, word in zip(errors, ['bogus', 'nosuch', 'max', 'planet_master']):
+            self.assertIn(word, error.msg)
+
+    def test_valid_entry_overrides_view_policy(self):
+        with override_settings(SYNC_CONFLICT_POLICIES=self.policies):
+            response = self.client.post('/api/sync/imc1-ledgers/', [
+                {'code': 'A', 'particulars': 'first'}, {'code': 'A', 'particulars': 'second'},
+            ], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(IMC1RecordLedgers.objects.get(code='A').particulars, 'first')
+
+
+class LedgerBalanceTests(SyncAPITestCase):
+    """acc_ledger_balances follows acc-ledgers pushes, one upsert per batch."""
+
+    def test_pushes_add_to_the_summary(self):
+        rows = [{'code': f'L{n % 7}', 'debit': '1.25', 'credit': str(n % 3)} for n in range(1200)]
+        for client_id in ('DSN01', 'DSN02', 'DSN01'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/sync/acc-ledgers/', rows, format='json',
+                                            HTTP_X_CLIENT_ID=client_id)
+            self.assertEqual(response.status_code, 201, response.data)
+            upserts = [q for q in queries if q['sql'].startswith('INSERT INTO "acc_ledger_balances"')]
+            self.assertEqual(len(upserts), 3)   # 1200 rows in batches of 500
+            for upsert in upserts:
+                # every code of the batch in the one statement
+                self.assertTrue(all(f"'L{n}'" in upsert['sql'] for n in range(7)), upsert['sql'])
+
+        expected = {
+            (row['client_id'], row['code']): (row['debit'], row['credit'], row['entries'])
+            for row in AccLedger.objects.values('client_id', 'code').annotate(
+                debit=Sum('debit'), credit=Sum('credit'), entries=Count('id'))
+        }
+        summary = {
+            (b.client_id, b.code): (b.debit, b.credit, b.entries)
+            for b in AccLedgerBalance.objects.all()
+        }
+        self.assertEqual(summary, expected)
+        self.assertEqual(summary['DSN01', 'L0'][2], 2 * 172)
+
+    def test_totals_are_upserted_in_key_order(self):
+        rows = [{'code': code, 'debit': '1', 'credit': '0'} for code in ('L9', 'L2', 'L7', 'L2', 'L0')]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/sync/acc-ledgers/', rows, format='json',
+                                        HTTP_X_CLIENT_ID='DSN01')
+        self.assertEqual(response.status_code, 201, response.data)
+        upsert, = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "acc_ledger_balances"')]
+        positions = [upsert.index(f"'{code}'") for code in ('L0', 'L2', 'L7', 'L9')]
+        self.assertEqual(positions, sorted(positions))
+
+
+class AccDepartmentPushTests(SyncAPITestCase):
+    """A department push replaces the pushing client's rows only."""
+
+    def push(self, client_id, codes):
+        response = self.client.post('/api/sync/acc-departments/',
+                                    [{'department_id': code, 'department': code} for code in codes],
+                                    format='json', HTTP_X_CLIENT_ID=client_id)
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_push_replaces_only_the_clients_rows(self):
+        self.push('DSN01', ['A1', 'A2'])
+        self.push('DSN02', ['B1'])
+        self.push('DSN01', ['A3'])
+        self.assertEqual(
+            sorted(AccDepartment.objects.values_list('client_id', 'department_id')),
+            [('DSN01', 'A3'), ('DSN02', 'B1')])
+
+
+class CountingStream(io.BytesIO):
+    """A request body that remembers how many bytes were read from it."""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class StreamingJSONParserTests(SimpleTestCase):
+    """A top-level array is decoded element by element as it is read."""
+
+    def parse(self, body, read_size=StreamingJSONParser.read_size):
+        parser = StreamingJSONParser()
+        parser.read_size = read_size
+        stream = body if isinstance(body, io.BytesIO) else io.BytesIO(body.encode())
+        return parser.parse(stream, 'application/json', {})
+
+    def test_tokens_split_across_reads(self):
+        records = [
+            {'code': 'A1', 'name': 'Café – “quoted” \\ \u00e9', 'debit': -1234.5e-3,
+             'credit': None, 'flag': True, 'empty': ''},
+            {'code': 'B2', 'name': 'x' * 50, 'debit': 12345678901234567890, 'flag': False},
+        ]
+        body = json.dumps(records, ensure_ascii=False)
+        for read_size in (1, 2, 3, 5, 8, 64):
+            with self.subTest(read_size=read_size):
+                data = self.parse(body, read_size)
+                self.assertIsInstance(data, RecordStream)
+                self.assertEqual(list(data), records)
+
+    def test_nested_values(self):
+        records = [{'a': {'b': [1, [2, {'c': '[]{},'}]]}}, [[[]]], 'text', 0]
+        self.assertEqual(list(self.parse(json.dumps(records), read_size=4)), records)
+
+    def test_empty_array(self):
+        for body in ('[]', '  [ \n ]  '):
+            with self.subTest(body=body):
+                data = self.parse(body, read_size=1)
+                self.assertIsInstance(data, RecordStream)
+                self.assertFalse(data)
+                self.assertEqual(list(data), [])
+
+    def test_non_array_body_is_parsed_eagerly(self):
+        self.assertEqual(self.parse('{"chunks": 3}', read_size=2), {'chunks': 3})
+        with self.assertRaises(ParseError):
+            self.parse('{"chunks": }')
+
+    def test_trailing_comma(self):
+        with self.assertRaises(ParseError):
+            list(self.parse('[{"a": 1}, ]'))
+
+    def test_truncated_body(self):
+        for body in ('[{"a": 1}, {"b": ', '[1, 2', '["abc', '[{"a": 1}'):
+            with self.subTest(body=body):
+                data = self.parse(body, read_size=3)
+                with self.assertRaises(ParseError):
+                    list(data)
+
+    def test_malformed_element_fails_without_reading_the_rest(self):
+        padding = ', '.join(['{"pad": "%s"}' % ('x' * 100)] * 20000)
+        body = CountingStream(f'[{{"a": 1}}, {{"b": }}, {padding}]'.encode())
+        data = self.parse(body, read_size=1024)
+        with self.assertRaises(ParseError):
+            list(data)
+        self.assertLessEqual(body.bytes_read, 2 * 1024)
+
+
+def log_record(msg, level=logging.WARNING, name='syncdata.views'):
+    return logging.makeLogRecord({'name': name, 'levelno': level, 'msg': msg})
+
+
+class RateLimitFilterTests(SimpleTestCase):
+
+    def test_info_is_not_limited_or_tracked(self):
+        f = RateLimitFilter(interval=60, burst=2)
+        self.assertTrue(all(f.filter(log_record(f'chunk {n}', logging.INFO)) for n in range(5000)))
+        self.assertEqual(f._windows, {})
+
+    def test_warnings_are_limited_per_template(self):
+        f = RateLimitFilter(interval=60, burst=2)
+        passed = [f.filter(log_record('Could not parse %s')) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(f.filter(log_record('Another %s')))
+        self.assertEqual(f.flush(), [('syncdata.views', logging.WARNING, 'Could not parse %s', 3)])
+
+    def test_suppressed_count_rides_on_next_interval(self):
+        f = RateLimitFilter(interval=0.01, burst=1)
+        f.filter(log_record('x %s'))
+        f.filter(log_record('x %s'))
+        threading.Event().wait(0.02)
+        record = log_record('x %s')
+        self.assertTrue(f.filter(record))
+        self.assertEqual(record.suppressed, 1)
+
+    def test_burst_that_does_not_recur_is_reported_once_expired(self):
+        f = RateLimitFilter(interval=0.01, burst=1)
+        for _ in range(3):
+            f.filter(log_record('x %s'))
+        self.assertEqual(f.expired(), [])
+        threading.Event().wait(0.02)
+        self.assertTrue(f.filter(log_record('other %s')))
+        self.assertEqual(f.expired(), [('syncdata.views', logging.WARNING, 'x %s', 2)])
+        threading.Event().wait(0.02)
+        self.assertEqual(f.expired(), [])
+        self.assertEqual(f.flush(), [])
+
+    def test_tracked_templates_are_bounded(self):
+        f = RateLimitFilter(interval=60, burst=1)
+        f.max_keys = 50
+        for n in range(1000):
+            self.assertTrue(f.filter(log_record(f'unique {n}')))
+        self.assertLessEqual(len(f._windows), 50)
+
+
+class QueuedFileHandlerTests(SimpleTestCase):
+
+    def test_expired_burst_is_written_after_the_next_record(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sync.log')
+            handler = QueuedFileHandler(path)
+            handler.addFilter(RateLimitFilter(interval=0.01, burst=1))
+            for _ in range(3):
+                handler.handle(log_record('x %s'))
+            threading.Event().wait(0.02)
+            handler.handle(log_record('chunk 1', logging.INFO))
+            handler.close()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(lines, ['x %s', 'chunk 1', 'Suppressed 2 records like: x %s'])
+
+    def test_one_listener_under_concurrent_first_emits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = QueuedFileHandler(os.path.join(directory, 'sync.log'))
+            started = []
+            start = handler._start
+
+            def counting_start():
+                started.append(handler._pid)
+                start()
+            handler._start = counting_start
+            barrier = threading.Barrier(8)
+
+            def emit():
+                barrier.wait()
+                handler.emit(log_record('hello', logging.INFO))
+            threads = [threading.Thread(target=emit) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            listener = handler.listener
+            handler.close()
+            self.assertIsNotNone(listener)
+            with open(os.path.join(directory, 'sync.log')) as log:
+                self.assertEqual(len(log.readlines()), 8)
+
+
+class CachedListResponseTests(SyncAPITestCase):
+    url = '/api/sync/acc-master/'
+
+    @classmethod
+    def setUpTestData(cls):
+        AccMaster.objects.bulk_create(
+            AccMaster(code=f'A{n:03}', name=f'Account {n}', client_id='DSN01') for n in range(30))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(SYNC_CACHE_VERSION_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        RESPONSE_CACHE.clear()
+        self.addCleanup(RESPONSE_CACHE.clear)
+
+    def get(self, **headers):
+        response = self.client.get(self.url, {'client_id': 'DSN01'}, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_table_is_streamed_then_served_from_cache(self):
+        first, body = self.get()
+        self.assertTrue(first.streaming)
+        self.assertEqual([row['code'] for row in json.loads(body)], [f'A{n:03}' for n in range(30)])
+
+        with self.assertNumQueries(0):
+            second, cached = self.get()
+        self.assertFalse(second.streaming)
+        self.assertEqual(cached, body)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        not_modified, _ = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_body_over_the_entry_cap_is_not_buffered(self):
+        with mock.patch.object(RESPONSE_CACHE, 'max_bytes', 400):
+            first, body = self.get()
+            second, again = self.get()
+        self.assertTrue(first.streaming)
+        self.assertTrue(second.streaming)
+        self.assertEqual(again, body)
+        self.assertEqual(RESPONSE_CACHE.size, 0)
+
+    def test_unfinished_stream_is_not_cached(self):
+        response = self.client.get(self.url, {'client_id': 'DSN01'})
+        next(iter(response.streaming_content))
+        response.close()
+        self.assertEqual(RESPONSE_CACHE.size, 0)
+
+    def test_pages_are_cached_whole(self):
+        page = self.client.get(self.url, {'client_id': 'DSN01', 'limit': 5})
+        self.assertFalse(page.streaming)
+        self.assertEqual(len(page.json()['results']), 5)
+        self.assertEqual(RESPONSE_CACHE.size, len(page.content))
+
+
+def legacy_ledger_clean(record):
+    """The IMC1 ledger view's clean_record from before RowCoercer replaced it."""
+    cleaned = record.copy()
+    if 'entry_date' in cleaned:
+        if cleaned['entry_date'] is None or cleaned['entry_date'] == '':
+            cleaned['entry_date'] = None
+        elif isinstance(cleaned['entry_date'], str):
+            for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']:
+                try:
+                    parsed = datetime.datetime.strptime(cleaned['entry_date'], fmt).date()
+                    cleaned['entry_date'] = parsed.strftime('%Y-%m-%d')
+                    break
+                except ValueError:
+                    continue
+            else:
+                cleaned['entry_date'] = None
+    for field in ['debit', 'credit', 'voucher_no']:
+        if field in cleaned:
+            if cleaned[field] is None or cleaned[field] == '':
+                cleaned[field] = None
+            else:
+                try:
+                    cleaned[field] = str(Decimal(str(cleaned[field])))
+                except (ValueError, ArithmeticError, TypeError):
+                    cleaned[field] = None
+    for field in ['code', 'particulars', 'entry_mode', 'narration']:
+        if field in cleaned:
+            if cleaned[field] is None:
+                cleaned[field] = '' if field != 'code' else None
+            else:
+                cleaned[field] = str(cleaned[field]).strip()
+    if not cleaned.get('code'):
+        return None
+    return cleaned
+
+
+class RowCoercerTests(SimpleTestCase):
+    """RowCoercer accepts and converts records as clean_record + the serializer did."""
+
+    coercer = RowCoercer(IMC1RecordLedgers)
+
+    def legacy(self, record):
+        cleaned = legacy_ledger_clean(record)
+        if cleaned is None:
+            return None
+        serializer = IMC1LedgersSerializer(data=cleaned)
+        if not serializer.is_valid():
+            return None
+        return tuple(serializer.validated_data.get(name) for name in self.coercer.names)
+
+    def coerce(self, record):
+        try:
+            return self.coercer.coerce(record)
+        except RowError:
+            return None
+
+    def test_matches_legacy_cleaning(self):
+        full = {'code': 'A1', 'particulars': 'Sales', 'debit': '10.5', 'credit': 0,
+                'entry_mode': 'CR', 'entry_date': '2024-04-01', 'voucher_no': 12, 'narration': 'n'}
+        records = [
+            full,
+            {**full, 'code': '  A2  ', 'particulars': '  padded  ', 'narration': None},
+            {**full, 'debit': '', 'credit': None, 'voucher_no': '7'},
+            {**full, 'debit': 'abc'},
+            {**full, 'debit': 1.25, 'credit': '00003.10000'},
+            {**full, 'entry_date': '31/03/2024'},
+            {**full, 'entry_date': '2024-03-31 10:15:00'},
+            {**full, 'entry_date': '31-03-2024'},
+            {**full, 'entry_date': 'someday'},
+            {**full, 'entry_date': ''},
+            {**full, 'particulars': 12345},
+            {**full, 'debit': '1234567890.123456'},
+            {**full, 'voucher_no': '1.5'},
+            {**full, 'code': ''},
+            {**full, 'code': None},
+            {**full, 'narration': 'x' * 251},
+        ]
+        with self.assertLogs('syncdata', 'WARNING'):
+            for record in records:
+                with self.subTest(record=record):
+                    self.assertEqual(self.coerce(record), self.legacy(record))
+
+    def test_missing_and_blank_required_field_messages(self):
+        for record, message in [
+            ({}, 'This field is required.'),
+            ({'code': None}, 'This field may not be null.'),
+            ({'code': '   '}, 'This field may not be blank.'),
+        ]:
+            with self.subTest(record=record), self.assertRaises(RowError) as caught:
+                self.coercer.coerce(record)
+            self.assertEqual(caught.exception.errors, {'code': [message]})
+
+    def test_decimal_limits_report_drf_messages(self):
+        with self.assertRaises(RowError) as caught:
+            self.coercer.coerce({'code': 'A', 'debit': '1.123456', 'voucher_no': '1234567890123'})
+        self.assertEqual(caught.exception.errors, {
+            'debit': ['Ensure that there are no more than 5 decimal places.'],
+            'voucher_no': ['Ensure that there are no more than 12 digits in total.'],
+        })
+
+    def test_defaults_and_fill(self):
+        coercer = RowCoercer(IMC1Record, defaults={'debit': 0})
+        row = dict(zip(coercer.names, coercer.coerce(
+            {'code': 'C', 'name': 'n', 'opening_balance': 1, 'credit': 2, 'debit': None})))
+        self.assertEqual(row['debit'], 0)
+        self.assertEqual(row['place'], '')
+
+        coercer = RowCoercer(AccMaster)
+        rows, errors = coercer.coerce_batch(
+            [{'code': 'A', 'name': 'n'}, {'code': 'B', 'name': 'n', 'client_id': 'OWN'}, 'junk'],
+            fill={'client_id': 'DSN01'})
+        self.assertEqual([row[coercer.names.index('client_id')] for row in rows], ['DSN01', 'OWN'])
+        self.assertEqual(errors, [(2, 'junk', {'non_field_errors': [
+            'Invalid data. Expected a dictionary, but got str.']})])
+
+    def test_blank_to_null(self):
+        coercer = RowCoercer(PlanetClient, blank_to_null=True)
+        row = dict(zip(coercer.names, coercer.coerce({'code': 'P', 'directdealing': '  '})))
+        self.assertIsNone(row['directdealing'])
+
+
+class DateParserTests(SimpleTestCase):
+
+    def test_formats_match_strptime(self):
+        values = ['2024-04-01', '01/04/2024', '2024-04-01 13:45:00', '01-04-2024',
+                  '2024-4-1', '1/4/2024', ' 2024-04-01 ', '2024-01-31T00:00:00',
+                  '31/02/2024', '2024-13-01', '04/01/24', 'someday', '']
+        parser = DateParser()
+        for value in values:
+            expected = None
+            for fmt in DATE_FORMATS:
+                try:
+                    expected = datetime.datetime.strptime(value.strip(), fmt).date()
+                    break
+                except ValueError:
+                    continue
+            if value == '2024-01-31T00:00:00':
+                expected = datetime.date(2024, 1, 31)
+            with self.subTest(value=value):
+                self.assertEqual(parser.parse(value), expected)
+
+    def test_detect_pins_the_batch_format(self):
+        parser = DateParser()
+        self.assertEqual(parser.detect([None, '', 'junk', '31/03/2024', '2024-04-01']), '%d/%m/%Y')
+        self.assertEqual(parser._order[0], '%d/%m/%Y')
+        # Pinning changes the order formats are tried in, never the result
+        self.assertEqual(parser.parse('2024-04-01'), datetime.date(2024, 4, 1))
+        self.assertEqual(parser.detect(['2024-04-01 00:00:00']), '%Y-%m-%d %H:%M:%S')
+
+    def test_repeated_values_are_cached(self):
+        parser = DateParser(cache_size=2)
+        for value in ['01/04/2024', '01/04/2024', '02/04/2024', '01/04/2024']:
+            parser.parse(value)
+        info = parser.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 2, 2))
+        parser.parse('03/04/2024')
+        self.assertEqual(parser.cache_info().currsize, 2)
+
+
+class DeltaSyncTests(SyncAPITestCase):
+    """Delta pushes only rewrite the rows whose hash changed."""
+
+    url = '/api/sync/imc1/'
+
+    def push(self, records, mode='delta'):
+        response = self.client.post(f'{self.url}?mode={mode}', records, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def counts(self, summary):
+        return {k: summary[k] for k in ('mode', 'inserted', 'updated', 'deleted', 'unchanged')}
+
+    def names(self):
+        return sorted(IMC1Record.objects.values_list('code', 'name'))
+
+    def records(self, n=5):
+        return [{'code': f'C{i}', 'name': f'Name {i}', 'opening_balance': i, 'debit': 1, 'credit': 0}
+                for i in range(n)]
+
+    def test_unchanged_push_writes_nothing(self):
+        records = self.records()
+        self.assertEqual(self.counts(self.push(records)),
+                         {'mode': 'full', 'inserted': 5, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        ids = sorted(IMC1Record.objects.values_list('pk', flat=True))
+
+        self.assertEqual(self.counts(self.push(records)),
+                         {'mode': 'delta', 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 5})
+        self.assertEqual(sorted(IMC1Record.objects.values_list('pk', flat=True)), ids)
+
+    def test_changed_new_and_missing_keys(self):
+        records = self.records()
+        self.push(records)
+        records[1]['name'] = 'Renamed'
+        del records[3]
+        records.append({'code': 'C9', 'name': 'New', 'opening_balance': 0, 'debit': 0, 'credit': 0})
+        self.assertEqual(self.counts(self.push(records)),
+                         {'mode': 'delta', 'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 3})
+        self.assertEqual(self.names(), sorted((r['code'], r['name']) for r in records))
+        self.assertEqual(SyncRowDigest.objects.filter(table_name='syncdata_imc1record').count(), 5)
+
+    def test_repeated_keys_are_hashed_as_a_group(self):
+        records = self.records(2) + [
+            {'code': 'C0', 'name': 'Second C0', 'opening_balance': 0, 'debit': 0, 'credit': 0}]
+        self.assertEqual(self.counts(self.push(records)),
+                         {'mode': 'full', 'inserted': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        ids = sorted(IMC1Record.objects.values_list('pk', flat=True))
+        self.assertEqual(self.counts(self.push(records)),
+                         {'mode': 'delta', 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 2})
+        self.assertEqual(sorted(IMC1Record.objects.values_list('pk', flat=True)), ids)
+
+        records[2]['name'] = 'Changed C0'
+        summary = self.push(records)
+        self.assertEqual((summary['updated'], summary['unchanged']), (1, 1))
+        self.assertEqual(self.names(), sorted((r['code'], r['name']) for r in records))
+        self.assertEqual(self.counts(self.push(records))['unchanged'], 2)
+
+        del records[2]
+        summary = self.push(records)
+        self.assertEqual(self.names(), [('C0', 'Name 0'), ('C1', 'Name 1')])
+        self.assertEqual(summary['unchanged'], 1)
+
+    def test_key_that_starts_repeating_keeps_its_stored_row(self):
+        records = self.records(2)
+        self.push(records)
+        records.append({'code': 'C0', 'name': 'Second C0', 'opening_balance': 0, 'debit': 0, 'credit': 0})
+        summary = self.push(records)
+        self.assertEqual((summary['inserted'], summary['updated'], summary['unchanged']), (0, 1, 1))
+        self.assertEqual(self.names(), sorted((r['code'], r['name']) for r in records))
+        self.assertEqual(self.push(records)['unchanged'], 2)
+
+    def test_full_push_forgets_the_hashes(self):
+        self.push(self.records())
+        self.push(self.records(3), mode='full')
+        self.assertFalse(SyncRowDigest.objects.filter(table_name='syncdata_imc1record').exists())
+        summary = self.push(self.records())
+        self.assertEqual((summary['mode'], summary['inserted']), ('full', 5))
+        self.assertEqual(IMC1Record.objects.count(), 5)
+
+
+class ColumnarParserTests(SimpleTestCase):
+    """CSV and MessagePack bodies decode to the records the same JSON array holds."""
+
+    def parse(self, parser, body, read_size=7):
+        parser.read_size = read_size
+        return list(parser.parse(io.BytesIO(body), parser.media_type, {}))
+
+    def test_csv(self):
+        body = (
+            '\ufeffcode,particulars,debit\r\n'
+            'A1,"Sales, cash",10.5\r\n'
+            'A2,"two\nlines ""quoted""",\\N\r\n'
+            'A3,,\n'
+            'A4,Café,1'
+        ).encode()
+        self.assertEqual(self.parse(ColumnarCSVParser(), body), [
+            {'code': 'A1', 'particulars': 'Sales, cash', 'debit': '10.5'},
+            {'code': 'A2', 'particulars': 'two\nlines "quoted"', 'debit': None},
+            {'code': 'A3', 'particulars': '', 'debit': ''},
+            {'code': 'A4', 'particulars': 'Café', 'debit': '1'},
+        ])
+
+    def test_csv_empty_and_header_only(self):
+        self.assertEqual(self.parse(ColumnarCSVParser(), b''), [])
+        self.assertEqual(self.parse(ColumnarCSVParser(), b'code,name\n'), [])
+
+    def test_csv_errors(self):
+        for body, message in [
+            (b'code,code\nA,B\n', 'repeated field name'),
+            (b'code,name\nA\n', 'row 2 has 1 fields, expected 2'),
+            (b'code,name\nA,"open\n', 'CSV parse error'),
+            (b'code,name\nA,\xff\n', 'CSV parse error'),
+        ]:
+            with self.subTest(body=body), self.assertRaisesMessage(ParseError, message):
+                self.parse(ColumnarCSVParser(), body)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        body = b''.join(msgpack.packb(row) for row in [
+            ['code', 'debit', 'entry_date'],
+            ['A1', 10.5, '2024-04-01'],
+            ['A2', None, None],
+        ])
+        self.assertEqual(self.parse(ColumnarMsgPackParser(), body), [
+            {'code': 'A1', 'debit': 10.5, 'entry_date': '2024-04-01'},
+            {'code': 'A2', 'debit': None, 'entry_date': None},
+        ])
+        with self.assertRaisesMessage(ParseError, 'body ends inside a row'):
+            self.parse(ColumnarMsgPackParser(), body[:-3])
+        with self.assertRaisesMessage(ParseError, 'every row must be an array'):
+            self.parse(ColumnarMsgPackParser(), msgpack.packb(['code']) + msgpack.packb('A'))
+
+
+class ColumnarPushTests(SyncAPITestCase):
+    url = '/api/sync/imc1-ledgers/'
+
+    def rows(self):
+        return list(IMC1RecordLedgers.objects.order_by('code').values_list(
+            'code', 'particulars', 'debit', 'entry_date'))
+
+    def test_csv_push_stores_what_json_does(self):
+        records = [
+            {'code': 'A1', 'particulars': 'Sales', 'debit': '10.5', 'entry_date': '01/04/2024'},
+            {'code': 'A2', 'particulars': None, 'debit': None, 'entry_date': None},
+        ]
+        response = self.client.post(self.url, records, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        expected = self.rows()
+
+        body = 'code,particulars,debit,entry_date\nA1,Sales,10.5,01/04/2024\nA2,\\N,\\N,\\N\n'
+        response = self.client.post(self.url, gzip.compress(body.encode()),
+                                    content_type='text/csv', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.rows(), expected)
+
+    @skipUnless(msgpack is None, 'msgpack is installed')
+    def test_msgpack_without_the_package_is_refused(self):
+        response = self.client.post(self.url, b'\x91\xa4code', content_type='application/x-msgpack')
+        self.assertEqual(response.status_code, 415)
+
+
+def savepoints(queries):
+    """Load attempts made: each runs under its own savepoint (COPY is not captured)."""
+    return sum(1 for q in queries.captured_queries if q['sql'].startswith('SAVEPOINT'))
+
+
+class BulkLoaderTests(TestCase):
+    """COPY text rendering and VALUES batching."""
+
+    AWKWARD = [
+        ('D1', 'tab\there', 'X'),
+        ('D2', 'line\nbreak\r\nend', 'X'),
+        ('D3', 'back\\slash \\N', 'X'),
+        ('D4', None, 'X'),
+        ('D5', '', 'X'),
+    ]
+
+    def test_copy_text_escaping(self):
+        stream = _CopyStream([
+            ('tab\there', 'line\nbreak\rend', 'back\\slash'),
+            (None, '', '\\N'),
+            (True, False, datetime.date(2024, 4, 1)),
+        ])
+        self.assertEqual(stream.read(), (
+            'tab\\there\tline\\nbreak\\rend\tback\\\\slash\n'
+            '\\N\t\t\\\\N\n'
+            't\tf\t2024-04-01\n'
+        ))
+        self.assertEqual(stream.count, 3)
+        self.assertEqual(stream.read(), '')
+
+    def test_copy_stream_reads_in_pieces(self):
+        rows = [(n, f'row {n}') for n in range(100)]
+        whole = _CopyStream(rows).read()
+        stream = _CopyStream(rows)
+        pieces = list(iter(lambda: stream.read(7), ''))
+        self.assertTrue(all(len(piece) <= 7 for piece in pieces))
+        self.assertEqual(''.join(pieces), whole)
+        self.assertEqual(stream.count, 100)
+
+    def test_awkward_values_round_trip(self):
+        # COPY on PostgreSQL, VALUES elsewhere; NULL and '' must stay apart
+        loaded = BulkLoader(AccDepartment).load(self.AWKWARD)
+        self.assertEqual(loaded, 5)
+        self.assertEqual(
+            list(AccDepartment.objects.order_by('department_id')
+                 .values_list('department_id', 'department', 'client_id')),
+            self.AWKWARD)
+
+    def test_values_batches_fit_the_parameter_limit(self):
+        loader = BulkLoader(AccDepartment)
+        rows = [(f'D{n}', f'Dept {n}', 'X') for n in range(5)]
+        # 3 columns, at most 7 parameters: 2 rows per INSERT
+        with mock.patch.object(connection.features, 'max_query_params', 7), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(loader._load_values(rows), 5)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO')]
+        self.assertEqual([sql.count('(') - 1 for sql in inserts], [2, 2, 1])
+        self.assertEqual(AccDepartment.objects.count(), 5)
+
+
+class BisectingLoadTests(TestCase):
+    """Rows the database rejects are found by bisecting the batch under savepoints."""
+
+    def setUp(self):
+        self.view = IMC1LedgersView()
+        self.loader = BulkLoader(IMC1RecordLedgers, fields=self.view.coercer.fields)
+        IMC1RecordLedgers.objects.create(code='TAKEN')
+
+    def rows(self, codes):
+        return [self.view.coercer.coerce({'code': code}) for code in codes]
+
+    def test_bad_rows_are_isolated(self):
+        codes = [f'R{n:04}' for n in range(1000)]
+        codes[10] = codes[700] = 'TAKEN'
+        with CaptureQueriesContext(connection) as queries:
+            loaded, rejected = self.view.load_bisecting(self.loader, self.rows(codes))
+        self.assertEqual(loaded, 998)
+        self.assertEqual([position for position, _ in rejected], [10, 700])
+        self.assertTrue(all(message for _, message in rejected))
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 999)
+        # Two bad rows cost a few dozen attempts, not one per row
+        self.assertLess(savepoints(queries), 60)
+
+    def test_clean_batch_is_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            loaded, rejected = self.view.load_bisecting(self.loader, self.rows(['A', 'B', 'C']))
+        self.assertEqual((loaded, rejected), (3, []))
+        self.assertEqual(savepoints(queries), 1)
+
+    def test_chunk_reports_original_positions(self):
+        chunk = [{'code': 'A'}, {'code': ''}, {'code': 'TAKEN'}, {'code': 'B'}]
+        failed = []
+        with self.assertLogs('syncdata.views', 'WARNING'):
+            loaded = self.view.load_chunk(self.loader, chunk, 100, failed)
+        self.assertEqual(loaded, 2)
+        self.assertEqual([(f['index'], f['record']) for f in failed],
+                         [(101, {'code': ''}), (102, {'code': 'TAKEN'})])
+        self.assertEqual(failed[0]['error'], {'code': ['This field may not be blank.']})
+        self.assertEqual(list(failed[1]['error']), ['non_field_errors'])
+
+
+class RejectedRowPushTests(SyncAPITestCase):
+
+    @mock.patch.object(IMC1LedgersView, 'conflict_policy', None)
+    def test_push_keeps_the_good_rows(self):
+        records = [{'code': f'C{n}', 'debit': '1'} for n in range(600)]
+        records[550] = {'code': 'C3'}
+        response = self.client.post('/api/sync/imc1-ledgers/', records, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['processed_count'], response.data['failed_count']), (599, 1))
+        self.assertEqual(response.data['failed_records'][0]['index'], 550)
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 599)
+
+
+class KeysetPaginationTests(SyncAPITestCase):
+    """?limit= and ?cursor= page through the view's ordering."""
+
+    url = '/api/sync/acc-master/'
+
+    @classmethod
+    def setUpTestData(cls):
+        # The test table keys on code alone, so codes carry the client
+        AccMaster.objects.bulk_create(
+            AccMaster(code=f'A{n}-{client}', name=f'{client} {n}', client_id=client)
+            for client in ('DSN01', 'DSN02', 'DSN03') for n in range(7))
+
+    def walk(self, url, params):
+        keys = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            keys += [(row['code'], row['client_id']) for row in response.data['results']]
+            if response.data['next'] is None:
+                self.assertIsNone(response.data['next_cursor'])
+                return keys
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_every_row_once_in_order(self):
+        keys = self.walk(self.url, {'limit': 4})
+        self.assertEqual(keys, sorted(AccMaster.objects.values_list('code', 'client_id')))
+
+    def test_pages_keep_the_client_filter(self):
+        keys = self.walk(self.url, {'limit': 2, 'client_id': 'DSN02'})
+        self.assertEqual(keys, [(f'A{n}-DSN02', 'DSN02') for n in range(7)])
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_pages(self):
+        first = self.client.get(self.url, {'limit': 5}).data
+        AccMaster.objects.create(code='A0-DSN00', name='late', client_id='DSN00')
+        second = self.client.get(self.url, {'limit': 5, 'cursor': first['next_cursor']}).data
+        self.assertEqual(decode_cursor(first['next_cursor'], 2), ['A1-DSN02', 'DSN02'])
+        self.assertEqual(second['results'][0]['code'], 'A1-DSN03')
+
+    @override_settings(SYNC_MAX_PAGE_SIZE=3)
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.client.get(self.url, {'limit': 100}).data['results']), 3)
+        self.assertEqual(len(self.client.get(self.url, {'limit': 0}).data['results']), 1)
+
+    def test_ties_on_the_leading_column(self):
+        IMC1Record.objects.bulk_create(
+            IMC1Record(code=f'C{n % 3}', name=str(n), opening_balance=0, debit=0, credit=0)
+            for n in range(10))
+        paginator = KeysetPagination(('code', 'pk'))
+        seen = []
+        params = {'limit': 3}
+        while True:
+            request = Request(APIRequestFactory().get('/', params))
+            seen += [(row.code, row.pk) for row in paginator.paginate_queryset(IMC1Record.objects.all(), request)]
+            if paginator.next_cursor is None:
+                break
+            params['cursor'] = paginator.next_cursor
+        self.assertEqual(seen, sorted(IMC1Record.objects.values_list('code', 'pk')))
+
+    def test_page_boundary_inside_duplicate_natural_keys(self):
+        PlanetMaster.objects.bulk_create(
+            PlanetMaster(code='A' if n < 5 else 'B', name='same', debit=n) for n in range(7))
+        seen = []
+        response = self.client.get('/api/sync/sysmac/', {'limit': 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['debit'] for row in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, list(range(7)))
+
+    def test_invalid_cursor_is_404(self):
+        for cursor in ['not base64!', encode_cursor(['A1']), encode_cursor({'code': 'A1'})]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_without_limit_or_cursor_the_table_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 21)
+
+
+def client_bucket_hashes(records, checksum, buckets):
+    """Bucket hashes of ``records`` computed as checksums.py tells the sync tool to."""
+    sums = [0] * buckets
+    for record in records:
+        values = []
+        for column in checksum['columns']:
+            value = record.get(column['name'])
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None and 'decimal_places' not in column:
+                value = ''  # acc_master stores missing text as ''
+            if value is None:
+                values.append('\\N')
+            elif 'decimal_places' in column:
+                values.append(f"{Decimal(str(value)).quantize(Decimal(1).scaleb(-column['decimal_places'])):f}")
+            else:
+                values.append(str(value))
+        row_hash = int(hashlib.md5('\x1f'.join(values).encode()).hexdigest(), 16)
+        key = str(record[checksum['key']])
+        bucket = int(hashlib.md5(key.encode()).hexdigest()[:8], 16) % buckets
+        sums[bucket] = (sums[bucket] + row_hash) % 2 ** 128
+    return [f'{total:032x}' for total in sums]
+
+
+class ChecksumTests(SyncAPITestCase):
+    """Bucket checksums match what the sync tool computes, and a POST replaces only those buckets."""
+
+    url = '/api/sync/acc-master/checksum/'
+    buckets = 8
+
+    def setUp(self):
+        self.records = [
+            {'code': f'M{n:03}', 'name': f' Account {n} ', 'super_code': 'S' if n % 2 else None,
+             'opening_balance': n * 1.5, 'debit': '10.25', 'credit': None}
+            for n in range(40)
+        ]
+        self.post_master(self.records, 'DSN01')
+        self.post_master([{'code': 'OTHER', 'name': 'Other client'}], 'DSN02')
+
+    def post_master(self, records, client_id):
+        response = self.client.post('/api/sync/acc-master/', records, format='json',
+                                    HTTP_X_CLIENT_ID=client_id)
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def checksum(self):
+        response = self.client.get(self.url, {'client_id': 'DSN01', 'buckets': self.buckets})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_hashes_match_the_documented_algorithm(self):
+        checksum = self.checksum()
+        self.assertEqual((checksum['count'], checksum['key']), (40, 'code'))
+        self.assertNotIn('client_id', [column['name'] for column in checksum['columns']])
+        self.assertEqual(checksum['hashes'], client_bucket_hashes(self.records, checksum, self.buckets))
+
+    def test_post_replaces_only_the_changed_buckets(self):
+        checksum = self.checksum()
+        records = [dict(r) for r in self.records]
+        records[5]['name'] = 'Renamed'
+        del records[9]
+        records.append({'code': 'M999', 'name': 'New'})
+        local = client_bucket_hashes(records, checksum, self.buckets)
+        changed = [b for b in range(self.buckets) if local[b] != checksum['hashes'][b]]
+        self.assertTrue(0 < len(changed) <= 3)
+
+        bucket_records = [
+            r for r in records
+            if int(hashlib.md5(r['code'].encode()).hexdigest()[:8], 16) % self.buckets in changed]
+        response = self.client.post(
+            f"{self.url}?client_id=DSN01&buckets={self.buckets}&changed={','.join(map(str, changed))}",
+            bucket_records, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['total'], 40)
+        self.assertEqual(response.data['hashes'], {str(b): local[b] for b in changed})
+
+        self.assertEqual(self.checksum()['hashes'], local)
+        self.assertEqual(AccMaster.objects.get(code='M005').name, 'Renamed')
+        self.assertFalse(AccMaster.objects.filter(code='M009').exists())
+        self.assertTrue(AccMaster.objects.filter(code='OTHER', client_id='DSN02').exists())
+
+    def test_row_outside_the_changed_buckets_rolls_back(self):
+        before = self.checksum()['hashes']
+        bucket = int(hashlib.md5(b'M000').hexdigest()[:8], 16) % self.buckets
+        other = (bucket + 1) % self.buckets
+        response = self.client.post(
+            f'{self.url}?client_id=DSN01&buckets={self.buckets}&changed={other}',
+            [{'code': 'M000', 'name': 'Moved'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.checksum()['hashes'], before)
+
+    def test_bad_requests(self):
+        for method, url, params in [
+            ('get', self.url, {'buckets': 8}),
+            ('get', self.url, {'client_id': 'DSN01', 'buckets': 0}),
+            ('get', self.url, {'client_id': 'DSN01', 'buckets': 'x'}),
+            ('post', f'{self.url}?client_id=DSN01&buckets=8&changed=8', None),
+            ('post', f'{self.url}?client_id=DSN01&buckets=8', None),
+        ]:
+            with self.subTest(method=method, url=url, params=params):
+                if method == 'get':
+                    response = self.client.get(url, params)
+                else:
+                    response = self.client.post(url, [], format='json')
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/sync/imc1/checksum/', {'client_id': 'DSN01'})
+        self.assertEqual(response.status_code, 404)
+
+
+class UploadSessionTests(SyncAPITestCase):
+    """Chunked pushes through acc-master upload sessions."""
+
+    url = '/api/sync/acc-master/sessions/'
+
+    def setUp(self):
+        AccMaster.objects.bulk_create([
+            AccMaster(code='OLD', name='Old', client_id='DSN01'),
+            AccMaster(code='OTHER', name='Other client', client_id='DSN02'),
+        ])
+
+    def begin(self, client_id='DSN01'):
+        response = self.client.post(self.url, HTTP_X_CLIENT_ID=client_id)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['client_id'], client_id)
+        return f"{self.url}{response.data['session_id']}/"
+
+    def put_chunk(self, session, seq, codes):
+        return self.client.put(f'{session}chunks/{seq}/',
+                               [{'code': code, 'name': f'Name {code}'} for code in codes], format='json')
+
+    def commit(self, session, body=None):
+        return self.client.post(f'{session}commit/', body or {}, format='json')
+
+    def test_chunks_in_any_order_replace_the_clients_rows(self):
+        session = self.begin()
+        for seq, codes in [(2, ['E']), (0, ['A', 'B']), (1, ['C', 'D'])]:
+            response = self.put_chunk(session, seq, codes)
+            self.assertEqual(response.status_code, 201, response.data)
+        # Re-sending a chunk replaces it
+        self.assertEqual(self.put_chunk(session, 1, ['C']).status_code, 201)
+
+        status = self.client.get(session)
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual((status.data['chunks'], status.data['record_count']), ([0, 1, 2], 4))
+
+        response = self.commit(session, {'chunks': 3})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['count'], response.data['chunks']), (4, 3))
+        self.assertEqual(sorted(AccMaster.objects.filter(client_id='DSN01').values_list('code', flat=True)),
+                         ['A', 'B', 'C', 'E'])
+        self.assertTrue(AccMaster.objects.filter(code='OTHER', client_id='DSN02').exists())
+        self.assertFalse(UploadChunk.objects.exists())
+
+    def test_client_id_is_required(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_unscoped_session_is_not_committed(self):
+        session = self.begin()
+        self.assertEqual(self.put_chunk(session, 0, ['A']).status_code, 201)
+        UploadSession.objects.update(client_id='')
+        self.assertEqual(self.commit(session).status_code, 400)
+        self.assertEqual(AccMaster.objects.count(), 2)
+
+    def test_commit_without_chunks_keeps_the_rows(self):
+        response = self.commit(self.begin())
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(AccMaster.objects.filter(code='OLD').exists())
+
+    def test_missing_chunks(self):
+        session = self.begin()
+        self.put_chunk(session, 0, ['A'])
+        self.put_chunk(session, 2, ['C'])
+        response = self.commit(session, {'chunks': 4})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['missing'], [1, 3])
+        for chunks in [-1, 'x', True]:
+            with self.subTest(chunks=chunks):
+                self.assertEqual(self.commit(session, {'chunks': chunks}).status_code, 400)
+        self.assertTrue(AccMaster.objects.filter(code='OLD').exists())
+
+    def test_invalid_chunk_is_refused(self):
+        session = self.begin()
+        response = self.client.put(f'{session}chunks/0/', [{'code': 'A', 'name': 'A'}, {'code': 'B'}],
+                                   format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('name', response.data[1])
+        self.assertFalse(UploadChunk.objects.exists())
+
+    def test_expired_session_is_gone(self):
+        session = self.begin()
+        self.put_chunk(session, 0, ['A'])
+        UploadSession.objects.update(expires_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(self.commit(session).status_code, 410)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(self.client.get(session).status_code, 404)
+
+    def test_committed_session_refuses_commit_and_chunks(self):
+        session = self.begin()
+        self.put_chunk(session, 0, ['A'])
+        self.assertEqual(self.commit(session).status_code, 201)
+        second = self.commit(session)
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.data['count'], 1)
+        self.assertEqual(self.put_chunk(session, 1, ['B']).status_code, 409)
+        self.assertFalse(AccMaster.objects.filter(code='B').exists())
+
+    def test_abort(self):
+        session = self.begin()
+        self.put_chunk(session, 0, ['A'])
+        response = self.client.delete(session)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UploadChunk.objects.exists())
+        self.assertEqual(self.client.get(session).status_code, 404)
+        self.assertEqual(self.commit(session).status_code, 404)
+
+    def test_unknown_endpoint(self):
+        response = self.client.post('/api/sync/imc1/sessions/', HTTP_X_CLIENT_ID='DSN01')
+        self.assertEqual(response.status_code, 404)
+
+
+class PartitionTests(SyncAPITestCase):
+    """Client partitions are only looked for on PostgreSQL, and never for a missing client_id."""
+
+    def test_partition_name(self):
+        name = partition_name('acc_ledgers', 'DSN 01/é')
+        self.assertRegex(name, r'^acc_ledgers_p_[0-9a-f]{16}$')
+        self.assertEqual(name, partition_name('acc_ledgers', 'DSN 01/é'))
+        self.assertNotEqual(name, partition_name('acc_ledgers', 'DSN 02'))
+
+    @skipUnless(connection.vendor != 'postgresql', 'see PostgresPartitionTests')
+    def test_other_databases_are_not_partitioned(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(is_partitioned(AccLedger))
+            self.assertIsNone(ensure_partition(AccLedger, 'DSN01'))
+            self.assertIsNone(find_partition(AccLedger, 'DSN01'))
+            self.assertIsNone(truncate_partition(AccLedger, 'DSN01'))
+        self.assertEqual(len(queries), 0)
+
+    @mock.patch('syncdata.views.ensure_partition')
+    def test_ledger_push_without_client_id_creates_no_partition(self, ensure):
+        rows = [{'code': 'L1', 'debit': '1'}]
+        response = self.client.post('/api/sync/acc-ledgers/', rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        ensure.assert_not_called()
+        response = self.client.post('/api/sync/acc-ledgers/', rows, format='json', HTTP_X_CLIENT_ID='DSN01')
+        self.assertEqual(response.status_code, 201, response.data)
+        ensure.assert_called_once_with(AccLedger, 'DSN01')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'partitioned tables are checked on PostgreSQL')
+class PostgresPartitionTests(TestCase):
+    """ensure_partition, find_partition and truncate_partition on a LIST-partitioned table."""
+
+    table = 'sync_partition_test'
+
+    def setUp(self):
+        patcher = mock.patch.multiple('syncdata.partitions', _partitioned={}, _partitions={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {self.table} (client_id varchar(50) NOT NULL, n integer) '
+                           'PARTITION BY LIST (client_id)')
+        self.model = mock.Mock(_meta=mock.Mock(db_table=self.table))
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0]
+
+    def test_ensure_creates_the_partition_once(self):
+        self.assertTrue(is_partitioned(self.model))
+        self.assertIsNone(find_partition(self.model, 'DSN01'))
+        name = ensure_partition(self.model, 'DSN01')
+        self.assertEqual(name, partition_name(self.table, 'DSN01'))
+        self.assertEqual(ensure_partition(self.model, 'DSN01'), name)
+        self.assertEqual(find_partition(self.model, 'DSN01'), name)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} VALUES ('DSN01', 1)")
+        self.assertEqual(self.count(name), 1)
+
+    def test_truncate_empties_only_the_clients_partition(self):
+        ensure_partition(self.model, 'DSN01')
+        ensure_partition(self.model, 'DSN02')
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} SELECT 'DSN01', n FROM generate_series(1, 5) n")
+            cursor.execute(f"INSERT INTO {self.table} VALUES ('DSN02', 1)")
+        self.assertEqual(truncate_partition(self.model, 'DSN01'), 5)
+        self.assertEqual(self.count(self.table), 1)
+        self.assertEqual(truncate_partition(self.model, 'DSN03'), 0)
+        self.assertIsNone(find_partition(self.model, 'DSN03'))
+
+    def test_purge_in_a_transaction_deletes_only_the_clients_rows(self):
+        ensure_partition(self.model, 'DSN01')
+        ensure_partition(self.model, 'DSN02')
+        with connection.cursor() as cursor:
+            # Same ctids in both partitions
+            for client_id in ('DSN01', 'DSN02'):
+                cursor.execute(f"INSERT INTO {self.table} SELECT %s, n FROM generate_series(1, 5) n",
+                               [client_id])
+        result = purge(self.model, 'DSN01', size=2)
+        self.assertEqual((result.rows, result.batches, result.method), (5, 3, 'batched delete'))
+        self.assertEqual(self.count(partition_name(self.table, 'DSN02')), 5)
+        self.assertEqual(self.count(partition_name(self.table, 'DSN01')), 0)
+
+    def test_unpartitioned_table(self):
+        self.assertFalse(is_partitioned(AccMaster))
+        self.assertIsNone(ensure_partition(AccMaster, 'DSN01'))
+        self.assertIsNone(truncate_partition(AccMaster, 'DSN01'))
+
+
+class SyncMetricsTests(SyncAPITestCase):
+    """Pushes show up on /api/sync/metrics, and exited workers' files are folded in."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_push_is_reported(self):
+        rows = [{'code': f'MT{n}', 'name': 'Metrics'} for n in range(3)]
+        with override_settings(SYNC_METRICS_DIR=self.directory):
+            response = self.client.post('/api/sync/acc-master/', rows, format='json',
+                                        HTTP_X_CLIENT_ID='METRICS')
+            self.assertEqual(response.status_code, 201, response.data)
+            scrape = self.client.get('/api/sync/metrics')
+        self.assertEqual(scrape.status_code, 200)
+        text = scrape.content.decode()
+        labels = 'client_id="METRICS",endpoint="AccMaster"'
+        self.assertIn(f'sync_requests_total{{{labels},method="POST",status="201"}} 1\n', text)
+        self.assertIn(f'sync_rows_total{{{labels},outcome="loaded"}} 3\n', text)
+        for stage in ('delete', 'coerce', 'insert', 'parse'):
+            self.assertIn(f'sync_stage_seconds_count{{{labels},stage="{stage}"}} 1\n', text)
+            self.assertIn(f'sync_stage_seconds_sum{{{labels},stage="{stage}"}} ', text)
+        self.assertIn('# TYPE sync_stage_seconds summary\n', text)
+        self.assertIn(f'{os.getpid()}.json', os.listdir(self.directory))
+
+    @mock.patch('syncdata.metrics.FLUSH_INTERVAL', 0.05)
+    def test_quick_last_request_is_written_later(self):
+        registry = Registry()
+        with override_settings(SYNC_METRICS_DIR=self.directory):
+            for _ in range(2):
+                RequestMetrics('AccMaster', 'METRICS', registry=registry).finish('POST', 201)
+            registry._timer.join()
+            # Scraped by another worker
+            scraper = Registry()
+            with mock.patch('syncdata.metrics.os.getpid', return_value=os.getpid() + 1), \
+                    mock.patch('syncdata.metrics._alive', return_value=True):
+                counters, _ = scraper.collect()
+        key = ('sync_requests_total', (('client_id', 'METRICS'), ('endpoint', 'AccMaster'),
+                                       ('method', 'POST'), ('status', '201')))
+        self.assertEqual(counters[key], 2)
+
+    def write_worker(self, pid, worker, value):
+        with open(os.path.join(self.directory, f'{pid}.json'), 'w') as f:
+            json.dump({'worker': worker, 'counters': [['sync_requests_total', {}, value]],
+                       'gauges': [['sync_rows_per_second', {}, value, value]]}, f)
+
+    def test_exited_workers_are_folded_and_removed(self):
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        self.write_worker(exited.pid, 'exited', 5)
+        self.write_worker(os.getppid(), 'running', 2)
+        registry = Registry()
+
+        def total():
+            counters, gauges = registry.collect()
+            return counters['sync_requests_total', ()], gauges['sync_rows_per_second', ()]
+
+        with override_settings(SYNC_METRICS_DIR=self.directory):
+            self.assertEqual(total(), (7, 5))
+            # Folded, but kept until the next scrape for scrapes still reading it
+            self.assertIn(f'{exited.pid}.json', os.listdir(self.directory))
+            self.assertEqual(total(), (7, 5))
+            self.assertEqual(sorted(os.listdir(self.directory)), [f'{os.getppid()}.json', 'retired.json'])
+            self.assertEqual(total(), (7, 5))
+
+    def test_recycled_pid_is_not_taken_for_the_folded_worker(self):
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        self.write_worker(exited.pid, 'exited', 5)
+        registry = Registry()
+        with override_settings(SYNC_METRICS_DIR=self.directory):
+            registry.collect()
+            self.write_worker(exited.pid, 'recycled', 1)
+            with mock.patch('syncdata.metrics._alive', return_value=True):
+                counters, _ = registry.collect()
+            self.assertEqual(counters['sync_requests_total', ()], 6)
+            self.assertIn(f'{exited.pid}.json', os.listdir(self.directory))
+
+
+class PurgeTests(TestCase):
+    """purge() counts what it deletes and batches client-scoped deletes."""
+
+    def setUp(self):
+        AccMaster.objects.bulk_create(
+            [AccMaster(code=f'A{n}', name='A', client_id='DSN01') for n in range(7)]
+            + [AccMaster(code=f'B{n}', name='B', client_id='DSN02') for n in range(3)])
+
+    def test_client_rows_are_deleted_in_batches(self):
+        for size, batches in [(3, 3), (7, 2), (100, 1)]:
+            with self.subTest(size=size), transaction.atomic():
+                result = purge(AccMaster, 'DSN01', size=size)
+                self.assertEqual((result.rows, result.batches, result.method), (7, batches, 'batched delete'))
+                self.assertEqual(AccMaster.objects.filter(client_id='DSN01').count(), 0)
+                self.assertEqual(AccMaster.objects.filter(client_id='DSN02').count(), 3)
+                transaction.set_rollback(True)
+
+    def test_unknown_client(self):
+        result = purge(AccMaster, 'DSN09', size=3)
+        self.assertEqual((result.rows, result.batches), (0, 1))
+        self.assertEqual(AccMaster.objects.count(), 10)
+
+    def test_unscoped_purge_in_a_transaction_is_a_delete(self):
+        result = purge(AccMaster)
+        self.assertEqual((result.rows, result.method), (10, 'delete'))
+        self.assertFalse(AccMaster.objects.exists())
+
+    @mock.patch('syncdata.purge.truncate_partition', return_value=4)
+    def test_partition_is_truncated_only_outside_a_transaction(self, truncate):
+        result = purge(AccMaster, 'DSN01', size=3)
+        truncate.assert_not_called()
+        self.assertEqual(result.method, 'batched delete')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            result = purge(AccMaster, 'DSN02')
+        truncate.assert_called_once_with(AccMaster, 'DSN02', 'default')
+        self.assertEqual((result.rows, result.method), (4, 'partition truncate'))
+
+
+def imc1_records(names):
+    return [{'code': f'C{i}', 'name': name, 'opening_balance': i, 'debit': 1, 'credit': 0}
+            for i, name in enumerate(names)]
+
+
+class ShadowSwapFallbackTests(SyncAPITestCase):
+    """Off PostgreSQL a swap push is an ordinary delete-and-reinsert."""
+
+    @skipUnless(connection.vendor != 'postgresql', 'see ShadowTableLoaderTests')
+    def test_swap_falls_back_to_full(self):
+        self.assertFalse(ShadowTableLoader.can_swap(IMC1Record))
+        for names in (['A', 'B', 'C'], ['D', 'E']):
+            response = self.client.post('/api/sync/imc1/?mode=swap', imc1_records(names), format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertNotIn('mode', response.data)
+        self.assertEqual(sorted(IMC1Record.objects.values_list('name', flat=True)), ['D', 'E'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'shadow tables are swapped on PostgreSQL')
+class ShadowTableLoaderTests(SyncAPITestCase):
+    """A swap push renames a freshly loaded and indexed copy of the table into place."""
+
+    url = '/api/sync/imc1/?mode=swap'
+    table = IMC1Record._meta.db_table
+
+    def setUp(self):
+        self.post(['Old 1', 'Old 2'], url='/api/sync/imc1/')
+        self.old_max = IMC1Record.objects.order_by('-pk').values_list('pk', flat=True)[0]
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE INDEX imc1_name_idx ON {self.table} (name)')
+            cursor.execute(f'ALTER TABLE {self.table} ADD CONSTRAINT imc1_debit_check CHECK (debit >= 0)')
+
+    def post(self, names, url=None, records=None):
+        return self.client.post(url or self.url, records or imc1_records(names), format='json')
+
+    def catalog(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s', [self.table])
+            indexes = {row[0] for row in cursor.fetchall()}
+            cursor.execute('SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass', [self.table])
+            constraints = {row[0] for row in cursor.fetchall()}
+            cursor.execute('SELECT to_regclass(%s), to_regclass(%s)',
+                           [f'{self.table}__shadow', f'{self.table}__retired'])
+            leftovers = [name for name in cursor.fetchone() if name]
+        return indexes, constraints, leftovers
+
+    def test_swap(self):
+        before = self.catalog()
+        response = self.post(['New 1', 'New 2', 'New 3'])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['mode'], 'swap')
+        self.assertEqual(sorted(IMC1Record.objects.values_list('name', flat=True)), ['New 1', 'New 2', 'New 3'])
+
+        indexes, constraints, leftovers = self.catalog()
+        self.assertEqual((indexes, constraints, leftovers), before[:2] + ([],))
+        self.assertIn('imc1_name_idx', indexes)
+        self.assertIn('imc1_debit_check', constraints)
+        # The identity sequence carries on from the old table's
+        self.assertGreater(min(IMC1Record.objects.values_list('pk', flat=True)), self.old_max)
+
+    def test_constraints_added_after_the_load_still_reject_rows(self):
+        records = imc1_records(['New 1', 'New 2'])
+        records[1]['debit'] = -1
+        response = self.post(None, records=records)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(sorted(IMC1Record.objects.values_list('name', flat=True)), ['Old 1', 'Old 2'])
+
+    def test_dependent_view_falls_back_to_full(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE VIEW imc1_names AS SELECT name FROM {self.table}')
+        self.assertFalse(ShadowTableLoader.can_swap(IMC1Record))
+        response = self.post(['New 1'])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn('mode', response.data)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT name FROM imc1_names')
+            self.assertEqual(cursor.fetchall(), [('New 1',)])
+
+
+class TrialBalanceViewTests(SyncAPITestCase):
+    """/api/sync/acc-trial-balance/ sums a client's ledgers per account and per group."""
+
+    url = '/api/sync/acc-trial-balance/'
+
+    @classmethod
+    def setUpTestData(cls):
+        AccMaster.objects.bulk_create([
+            AccMaster(code='A1', name='Cash', super_code='AS', opening_balance=100, client_id='DSN01'),
+            AccMaster(code='A2', name='Bank', super_code='AS', opening_balance=50, client_id='DSN01'),
+            AccMaster(code='L1', name='Loan', super_code='LI', opening_balance=-200, client_id='DSN01'),
+            AccMaster(code='B1', name='Other', super_code='AS', opening_balance=1, client_id='DSN02'),
+        ])
+        AccLedger.objects.bulk_create([
+            AccLedger(code='A1', date=datetime.date(2024, 3, 31), debit=10, client_id='DSN01'),
+            AccLedger(code='A1', date=datetime.date(2024, 4, 5), debit=20, credit=5, client_id='DSN01'),
+            AccLedger(code='A1', date=datetime.date(2024, 5, 1), debit=7, client_id='DSN01'),
+            AccLedger(code='A1', date=None, debit=1000, client_id='DSN01'),
+            AccLedger(code='L1', date=datetime.date(2024, 4, 10), credit=30, client_id='DSN01'),
+            AccLedger(code='ZZ', date=datetime.date(2024, 4, 15), debit=4, client_id='DSN01'),
+            AccLedger(code='A1', date=datetime.date(2024, 4, 5), debit=999, client_id='DSN02'),
+        ])
+
+    def get(self, **params):
+        response = self.client.get(self.url, {'client_id': 'DSN01', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def amounts(self, rows, key):
+        return {row[key]: tuple(Decimal(row[c]) for c in ('opening', 'debit', 'credit', 'closing'))
+                for row in rows}
+
+    def test_period_carries_earlier_entries_into_the_opening_balance(self):
+        report = self.get(**{'from': '2024-04-01', 'to': '2024-04-30'})
+        self.assertEqual((report['from'], report['to']), ('2024-04-01', '2024-04-30'))
+        self.assertEqual([a['code'] for a in report['accounts']], ['A1', 'A2', 'L1', 'ZZ'])
+        self.assertEqual(self.amounts(report['accounts'], 'code'), {
+            'A1': (110, 20, 5, 125),
+            'A2': (50, 0, 0, 50),
+            'L1': (-200, 0, 30, -230),
+            'ZZ': (0, 4, 0, 4),
+        })
+        self.assertEqual(report['accounts'][0]['opening'], '110.00000')
+
+    def test_without_a_period_every_entry_counts(self):
+        report = self.get()
+        self.assertEqual(self.amounts(report['accounts'], 'code')['A1'], (100, 1037, 5, 1132))
+
+    def test_codes_missing_from_the_master(self):
+        zz = self.get()['accounts'][-1]
+        self.assertEqual((zz['code'], zz['name'], zz['super_code']), ('ZZ', None, None))
+
+    def test_group_totals(self):
+        groups = self.get(**{'from': '2024-04-01', 'to': '2024-04-30'})['groups']
+        self.assertEqual([(g['super_code'], g['accounts']) for g in groups], [('AS', 2), ('LI', 1), (None, 1)])
+        self.assertEqual(self.amounts(groups, 'super_code'), {
+            'AS': (160, 20, 5, 175),
+            'LI': (-200, 0, 30, -230),
+            None: (0, 4, 0, 4),
+        })
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        for params in [{'from': '2024-13-01'}, {'to': '30/04/2024'}, {'from': 'yesterday'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, {'client_id': 'DSN01', **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('YYYY-MM-DD', response.json()['error'])
+
+
+class CompressedBodyTests(SyncAPITestCase):
+    """gzip/zstd request bodies are inflated under SYNC_MAX_DECOMPRESSED_SIZE."""
+
+    url = '/api/sync/imc1-ledgers/'
+
+    def body(self, n=600):
+        return json.dumps([{'code': f'C{i}', 'particulars': 'x' * 20} for i in range(n)]).encode()
+
+    def post(self, body, encoding='gzip'):
+        return self.client.post(self.url, body, content_type='application/json',
+                                HTTP_CONTENT_ENCODING=encoding)
+
+    def test_gzip_body(self):
+        response = self.post(gzip.compress(self.body()))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 600)
+
+    def test_body_inflating_past_the_limit_is_refused(self):
+        body = self.body()
+        with override_settings(SYNC_MAX_DECOMPRESSED_SIZE=len(body) - 1):
+            response = self.post(gzip.compress(body))
+        self.assertEqual(response.status_code, 413)
+        # Refused mid-stream, after the first batches were loaded and rolled back
+        self.assertFalse(IMC1RecordLedgers.objects.exists())
+        with override_settings(SYNC_MAX_DECOMPRESSED_SIZE=len(body)):
+            self.assertEqual(self.post(gzip.compress(body)).status_code, 201)
+
+    def test_compression_bomb(self):
+        bomb = gzip.compress(b'[' + b' ' * (16 * 1024 * 1024) + b']')
+        with override_settings(SYNC_MAX_DECOMPRESSED_SIZE=1024 * 1024):
+            response = self.post(bomb)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('1048576 bytes', response.data['detail'])
+
+    def test_corrupt_body(self):
+        for body in [b'not gzip at all', gzip.compress(self.body())[:-20]]:
+            with self.subTest(body=body[:10]):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Invalid gzip request body', response.data['detail'])
+        self.assertFalse(IMC1RecordLedgers.objects.exists())
+
+    def test_unsupported_encoding(self):
+        response = self.post(b'\x00', encoding='br')
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('"br"', response.data['detail'])
+
+    def test_zstd_without_the_package_is_refused(self):
+        decoders = {name: decoder for name, decoder in DECODERS.items() if name != 'zstd'}
+        with mock.patch.dict(DECODERS, decoders, clear=True):
+            response = self.post(b'(\xb5/\xfd', encoding='zstd')
+        self.assertEqual(response.status_code, 415)
+
+    @skipUnless(zstandard is not None, 'zstandard is not installed')
+    def test_zstd_body(self):
+        response = self.post(zstandard.ZstdCompressor().compress(self.body()), encoding='zstd')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(IMC1RecordLedgers.objects.count(), 600)
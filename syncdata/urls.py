@@ -1,12 +1,15 @@
 from django.urls import path
 from .views import (
-    AccLedgerView, AccMasterView, AccProductView, AccDepartmentView,
+    AccLedgerView, AccLedgerBalanceView, AccMasterView, AccProductView, AccDepartmentView,
     IMC1RecordView, IMC1LedgersView, IMC1InvMastView,
     IMC2RecordView, IMC2LedgersView, IMC2InvMastView,
     SysmacRecordView, SysmacLedgersView, SysmacInvMastView,
     DQRecordView, DQLedgersView, DQInvMastView,
-    PlanetClientsRecordView, PlanetLedgersView, PlanetMasterRecordView, PlanetInvMastView
+    PlanetClientsRecordView, PlanetLedgersView, PlanetMasterRecordView, PlanetInvMastView,
+    SyncMetricsView, TrialBalanceView,
 )
+from .checksums import ChecksumView
+from .sessions import UploadSessionView, UploadChunkView, UploadCommitView
 
 urlpatterns = [
     # SYNC - API'S
@@ -35,4 +38,18 @@ urlpatterns = [
     path('acc-product/',     AccProductView.as_view()),
     path('acc-departments/', AccDepartmentView.as_view()),
     path('acc-ledgers/', AccLedgerView.as_view()),
+    path('acc-ledger-balances/', AccLedgerBalanceView.as_view()),
+    path('acc-trial-balance/', TrialBalanceView.as_view()),
+
+    # Prometheus scrape target
+    path('metrics', SyncMetricsView.as_view()),
+
+    # Upload sessions for the client-scoped endpoints above (see sessions.py)
+    path('<slug:endpoint>/sessions/', UploadSessionView.as_view()),
+    path('<slug:endpoint>/sessions/<uuid:session_id>/', UploadSessionView.as_view()),
+    path('<slug:endpoint>/sessions/<uuid:session_id>/chunks/<int:seq>/', UploadChunkView.as_view()),
+    path('<slug:endpoint>/sessions/<uuid:session_id>/commit/', UploadCommitView.as_view()),
+
+    # Bucketed checksums for the client-scoped master tables (see checksums.py)
+    path('<slug:endpoint>/checksum/', ChecksumView.as_view()),
 ]
\ No newline at end of file
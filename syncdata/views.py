@@ -1,162 +1,368 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
-from .models import IMC1Record, IMC2Record, SysmacRecord, DQRecord, PlanetMaster, PlanetClient, IMC1RecordLedgers, IMC2RecordLedgers, SysmacRecordLedgers, DQRecordsLedgers, PlanetLedgers, PlanetInvMast, IMC1InvMast, IMC2InvMast, SysmacInvMast, DQInvMast, AccMaster, AccProduct, AccLedger
-from .serializers import IMC1Serializer, IMC2Serializer, SysmacSerializer, DQSerializer, PlanetClientsSerializer, PlanetMasterSerializer, IMC1LedgersSerializer, IMC2LedgersSerializer, SysmacLedgersSerializer, DQLedgersSerializer, PlanetLedgersSerializer, PlanetInvMastSerializer, IMC1InvMastSerializer, IMC2InvMastSerializer, SysmacInvMastSerializer, DQInvMastSerializer, AccMasterSerializer, AccProductSerializer, AccLedgerSerializer
+from rest_framework.exceptions import ParseError
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from .models import IMC1Record, IMC2Record, SysmacRecord, DQRecord, PlanetMaster, PlanetClient, IMC1RecordLedgers, IMC2RecordLedgers, SysmacRecordLedgers, DQRecordsLedgers, PlanetLedgers, PlanetInvMast, IMC1InvMast, IMC2InvMast, SysmacInvMast, DQInvMast, AccMaster, AccProduct, AccLedger, AccLedgerBalance
+from .serializers import IMC1Serializer, IMC2Serializer, SysmacSerializer, DQSerializer, PlanetClientsSerializer, PlanetMasterSerializer, IMC1LedgersSerializer, IMC2LedgersSerializer, SysmacLedgersSerializer, DQLedgersSerializer, PlanetLedgersSerializer, PlanetInvMastSerializer, IMC1InvMastSerializer, IMC2InvMastSerializer, SysmacInvMastSerializer, DQInvMastSerializer, AccMasterSerializer, AccProductSerializer, AccLedgerSerializer, AccLedgerBalanceSerializer
+from .balances import LedgerBalanceLoader, clear_balances, rebuild_balances
+from .bulk import BulkLoader
+from .checks import conflict_policies
+from .cache import RESPONSE_CACHE, bump_version, data_version, make_etag, request_key
+from .coercion import RowCoercer, RowError
+from .delta import DeltaSync, invalidate_digests
+from .shadow import ShadowTableLoader
+from .log import summarize_errors
+from .metrics import NULL_METRICS, REGISTRY, RequestMetrics
+from .pagination import KeysetPagination
+from .partitions import ensure_partition
+from .purge import purge
+from .reports import AMOUNT_COLUMNS, group_totals, trial_balance
+from .streaming import StreamingJSONResponse, dumps, json_array_chunks, row_batches
+from .parsers import SYNC_PARSER_CLASSES, RecordStream, is_record_list, iter_batches, sample_records
+import datetime
 import logging
 import json
 import traceback
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from decimal import ROUND_HALF_UP
 
 logger = logging.getLogger(__name__)
 
-class BaseLedgersView(APIView):
+# The master-table serializers defaulted missing/null balances to 0.0
+ZERO_BALANCES = {'opening_balance': 0, 'debit': 0, 'credit': 0}
+
+
+class SyncAPIView(APIView):
+    """
+    Base class for every api/sync/ endpoint.
+
+    Request bodies are parsed with StreamingJSONParser, so ``request.data`` for
+    a JSON array is a RecordStream that is consumed batch by batch instead of
+    a fully materialised list.  CSV (and MessagePack) bodies in the columnar
+    layout described in parsers.py arrive as the same RecordStream.
+
+    Pushes and deletes are timed per stage into ``self.metrics`` and counted
+    under the view's ``record_type`` (see metrics.py).
+
+    GETs page through ``ordering`` when asked for ``?limit=``/``?cursor=``
+    (see pagination.py); ``ordering`` must be unique for the table.  Without
+    them the whole table is streamed ``stream_chunk_size`` rows at a time
+    (see streaming.py).  With ``cache_responses`` the encoded GET responses
+    are cached per data version and carry an ETag (see cache.py); every
+    POST and DELETE bumps the version of the ``coercer``'s table.
+
+    Full-table pushes merge rows with a repeated primary key by
+    ``conflict_policy`` ('last', 'first' or 'sum' of ``summed_columns``, see
+    bulk.py) instead of rejecting them; ``SYNC_CONFLICT_POLICIES`` overrides
+    it per table.
+    """
+
+    parser_classes = SYNC_PARSER_CLASSES
+    batch_size = 500
+    record_type = None
+    metrics = NULL_METRICS
+    ordering = ('pk',)
+    stream_chunk_size = 2000
+    # Stream through readers.ValuesReader instead of the serializer
+    fast_reads = True
+    cache_responses = False
+    conflict_policy = None
+    summed_columns = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ("POST", "PUT", "DELETE"):
+            self.metrics = RequestMetrics(
+                self.record_type or type(self).__name__, self._get_client_id(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(self.metrics, RequestMetrics):
+            coercer = getattr(self, "coercer", None)
+            if request.method in ("POST", "DELETE") and coercer is not None:
+                bump_version(coercer.model._meta.db_table, self.metrics.client_id)
+            data = getattr(request, "_full_data", None)
+            self.metrics.finish(
+                request.method, response.status_code,
+                body_bytes=int(request.META.get("CONTENT_LENGTH") or 0),
+                parse_seconds=data.parse_seconds if isinstance(data, RecordStream) else 0.0,
+            )
+        return response
+
+    def _get_client_id(self, request):
+        return (
+            request.headers.get("X-Client-ID", "").strip()
+            or request.query_params.get("client_id", "").strip()
+        )
+
+    def list_response(self, request, queryset, serializer_class):
+        """Serialize ``queryset``: every row, or one keyset page when requested."""
+        if self.cache_responses:
+            client_id = self._get_client_id(request)
+            version = data_version(queryset.model._meta.db_table, client_id)
+            if version is not None:
+                return self.cached_list_response(
+                    request, queryset, serializer_class, request_key(request, client_id), version)
+        paginator = KeysetPagination(self.ordering)
+        if not paginator.is_requested(request):
+            return StreamingJSONResponse(
+                queryset, serializer_class, self.stream_chunk_size, fast=self.fast_reads)
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+    def cached_list_response(self, request, queryset, serializer_class, key, version):
+        """list_response through the response cache, answering If-None-Match with 304."""
+        paginator = KeysetPagination(self.ordering)
+        if paginator.is_requested(request):
+            def build():
+                page = paginator.paginate_queryset(queryset, request)
+                return dumps(paginator.get_paginated_response(
+                    serializer_class(page, many=True).data).data).encode()
+        else:
+            def build():
+                return json_array_chunks(row_batches(
+                    queryset, serializer_class, self.stream_chunk_size, self.fast_reads))
+        return self.cached_response(request, key, version, build)
+
+    def cached_response(self, request, key, version, build):
+        """
+        The JSON body ``build()`` returns, cached under ``key`` for ``version``.
+
+        ``build`` returns the body as bytes, or as an iterable of byte chunks
+        that is streamed and cached only if it stays small enough (see
+        ResponseCache.tee).
+        """
+        etag = make_etag(key, version)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            return HttpResponseNotModified(headers=headers)
+
+        body = RESPONSE_CACHE.get(key, etag)
+        if body is None:
+            body = build()
+            if not isinstance(body, bytes):
+                return StreamingHttpResponse(
+                    RESPONSE_CACHE.tee(key, etag, body),
+                    content_type="application/json", headers=headers)
+            RESPONSE_CACHE.set(key, etag, body)
+        return HttpResponse(body, content_type="application/json", headers=headers)
+
+    def _get_sync_mode(self, request):
+        """'full' (default), 'delta' or 'swap', from X-Sync-Mode or ?mode=."""
+        mode = (
+            request.headers.get("X-Sync-Mode", "").strip()
+            or request.query_params.get("mode", "").strip()
+        ).lower()
+        return mode if mode in ("delta", "swap") else "full"
+
+    def get_conflict_policy(self, model):
+        return conflict_policies().get(model._meta.db_table, self.conflict_policy) or None
+
+    def replace_loader(self, request, model, coercer, key=None):
+        """
+        Loader for a push that replaces the whole of ``model``'s table.
+
+        delta – a DeltaSync that only rewrites changed rows.
+        swap  – a ShadowTableLoader that loads a fresh copy of the table and
+                renames it into place (PostgreSQL; elsewhere falls back to full).
+        full  – the table is emptied here (raw SQL avoids the ORM id lookup on
+                managed=False tables) and a plain BulkLoader is returned.
+
+        Call ``finish_load`` once every row has been loaded.
+        """
+        mode = self._get_sync_mode(request)
+        merge = {"conflict": self.get_conflict_policy(model), "summed": self.summed_columns}
+        with self.metrics.stage("delete"):
+            if mode == "delta":
+                return DeltaSync(model, coercer, key=key, **merge).begin()
+            invalidate_digests(model)
+            if mode == "swap" and ShadowTableLoader.can_swap(model):
+                return ShadowTableLoader(model, fields=coercer.fields, **merge).begin()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {model._meta.db_table}")
+        return BulkLoader(model, fields=coercer.fields, **merge)
+
+    def finish_load(self, loader):
+        """Complete a replace_loader push; returns the summary for the response."""
+        finish = getattr(loader, "finish", None)
+        if finish is None:
+            return {}
+        with self.metrics.stage("finish"):
+            return finish()
+
+    def replace_client_rows(self, client_id, data):
+        """
+        Replace ``client_id``'s rows (every row when it is empty) with ``data``.
+
+        Uses the view's ``coercer``; returns ``(saved, errors)`` like
+        validate_and_load, and the caller's transaction must be rolled back
+        when ``errors`` is set.
+
+        On a table LIST-partitioned by client_id a new client's partition is
+        created before loading (see partitions.py).  That locks the table
+        until the transaction ends, so callers should call ensure_partition
+        before opening theirs; this call then only finds it.
+        """
+        model = self.coercer.model
+        with self.metrics.stage("delete"):
+            self.delete_client_rows(model, client_id)
+        if client_id:
+            ensure_partition(model, client_id)
+        loader = BulkLoader(model, fields=self.coercer.fields)
+        return self.validate_and_load(data, self.coercer, loader, fill={"client_id": client_id})
+
+    def delete_client_rows(self, model, client_id):
+        """
+        Delete ``client_id``'s rows of ``model`` (every row when it is empty)
+        with purge.py and return how many there were.
+
+        On a table LIST-partitioned by client_id this truncates the client's
+        partition, when it has one and no transaction is open; it never
+        creates one.
+        """
+        result = purge(model, client_id)
+        logger.info("%s - Purged %s (client_id=%r)",
+                    self.record_type or type(self).__name__, result, client_id)
+        return result.rows
+
+    def validate_and_load(self, data, coercer, loader, fill=None):
+        """
+        Coerce ``data`` one batch at a time and bulk-load the valid batches.
+
+        Returns ``(saved, errors)``.  ``errors`` is None when every record
+        was valid; otherwise it is the same per-record list a ``many=True``
+        serializer would report for the whole payload, and the caller must
+        roll back since rows before the first bad batch were already loaded.
+        """
+        saved = 0
+        seen = 0
+        errors = None
+        for batch in iter_batches(data, self.batch_size):
+            with self.metrics.stage("coerce"):
+                rows, failed = coercer.coerce_batch(batch, fill)
+            if not failed:
+                if errors is None:
+                    with self.metrics.stage("insert"):
+                        saved += loader.load(rows)
+                else:
+                    errors.extend({} for _ in batch)
+            else:
+                if errors is None:
+                    errors = [{} for _ in range(seen)]
+                batch_errors = [{} for _ in batch]
+                for idx, _, field_errors in failed:
+                    batch_errors[idx] = field_errors
+                errors.extend(batch_errors)
+            seen += len(batch)
+        if errors is None:
+            self.metrics.rows(loaded=saved)
+        else:
+            self.metrics.rows(failed=sum(1 for e in errors if e))
+        return saved, errors
+
+    def load_bisecting(self, loader, rows):
+        """
+        Load ``rows``, isolating the ones the database rejects.
+
+        Each attempt runs under its own savepoint.  A batch that fails is
+        split in half and only the failing halves are retried, so k bad rows
+        among n cost O(k log n) statements instead of one per row.  Returns
+        ``(loaded, rejected)`` with ``(position, message)`` per bad row.
+        """
+        loaded = 0
+        rejected = []
+        pending = [(0, rows)]
+        while pending:
+            start, batch = pending.pop()
+            try:
+                with self.metrics.stage("insert"), transaction.atomic():
+                    loaded += loader.load(batch)
+                continue
+            except Exception as e:
+                if len(batch) == 1:
+                    # PostgreSQL's CONTEXT line points into the one-row retry
+                    message = str(e).split('\nCONTEXT:')[0].strip()
+                    rejected.append((start, message))
+                    continue
+            mid = len(batch) // 2
+            # Stack: the first half is retried first, keeping row order.
+            pending.append((start + mid, batch[mid:]))
+            pending.append((start, batch[:mid]))
+        return loaded, rejected
+
+    def load_chunk(self, loader, chunk, offset, failed_records):
+        """
+        Coerce and load one chunk of records, appending every record that
+        fails coercion or is rejected by the database to ``failed_records``
+        as ``{'index', 'record', 'error'}``.  Returns the number loaded.
+        """
+        with self.metrics.stage("coerce"):
+            rows, failed = self.coercer.coerce_batch(chunk)
+        failures = [
+            {'index': offset + idx, 'record': record, 'error': errors}
+            for idx, record, errors in failed
+        ]
+        loaded = 0
+        if rows:
+            loaded, rejected = self.load_bisecting(loader, rows)
+            if rejected:
+                bad = {idx for idx, _, _ in failed}
+                positions = [idx for idx in range(len(chunk)) if idx not in bad]
+                for pos, message in rejected:
+                    idx = positions[pos]
+                    logger.warning("%s - Database rejected record %d: %s", self.record_type, offset + idx, message)
+                    failures.append({
+                        'index': offset + idx,
+                        'record': chunk[idx],
+                        'error': {'non_field_errors': [message]},
+                    })
+                failures.sort(key=lambda failure: failure['index'])
+        failed_records.extend(failures)
+        self.metrics.rows(loaded=loaded, failed=len(failures))
+        return loaded
+
+
+class BaseLedgersView(SyncAPIView):
     """Base class for all ledgers views with common functionality"""
     
     model = None
     serializer_class = None
+    coercer = None
     record_type = None
+    # Ledger codes repeat within a push; the table keys on code
+    conflict_policy = "last"
+    summed_columns = ("debit", "credit")
     
-    def clean_record(self, record):
-        """Clean and validate individual record before serialization"""
-        cleaned = record.copy()
-        
-        # Handle date fields
-        if 'entry_date' in cleaned:
-            if cleaned['entry_date'] is None or cleaned['entry_date'] == '':
-                cleaned['entry_date'] = None
-            elif isinstance(cleaned['entry_date'], str):
-                # Try to parse various date formats
-                date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']
-                for fmt in date_formats:
-                    try:
-                        parsed_date = datetime.strptime(cleaned['entry_date'], fmt).date()
-                        cleaned['entry_date'] = parsed_date.strftime('%Y-%m-%d')
-                        break
-                    except ValueError:
-                        continue
-                else:
-                    logger.warning(f"Could not parse date: {cleaned['entry_date']}")
-                    cleaned['entry_date'] = None
-        
-        # Handle decimal fields
-        decimal_fields = ['debit', 'credit', 'voucher_no']
-        for field in decimal_fields:
-            if field in cleaned:
-                if cleaned[field] is None or cleaned[field] == '':
-                    cleaned[field] = None
-                else:
-                    try:
-                        cleaned[field] = str(Decimal(str(cleaned[field])))
-                    except (ValueError, InvalidOperation, TypeError):
-                        logger.warning(f"Could not convert {field} to decimal: {cleaned[field]}")
-                        cleaned[field] = None
-        
-        # Handle string fields
-        string_fields = ['code', 'particulars', 'entry_mode', 'narration']
-        for field in string_fields:
-            if field in cleaned:
-                if cleaned[field] is None:
-                    cleaned[field] = '' if field != 'code' else None  # code is required
-                else:
-                    cleaned[field] = str(cleaned[field]).strip()
-        
-        # Validate required fields
-        if not cleaned.get('code'):
-            return None  # Invalid record without code
-        
-        return cleaned
-    
-    def process_in_chunks(self, data, chunk_size=500):
+    def process_in_chunks(self, data, loader, chunk_size=500):
         """Process data in smaller chunks to identify problematic records"""
-        total_records = len(data)
+        total_records = 0
         processed_count = 0
         failed_records = []
         
-        logger.info(f"{self.record_type} - Processing {total_records} records in chunks of {chunk_size}")
+        logger.info(f"{self.record_type} - Processing records in chunks of {chunk_size}")
         
-        for i in range(0, total_records, chunk_size):
-            chunk = data[i:i + chunk_size]
-            chunk_num = (i // chunk_size) + 1
+        for chunk_num, chunk in enumerate(iter_batches(data, chunk_size), start=1):
+            i = total_records
+            total_records += len(chunk)
             
             logger.info(f"{self.record_type} - Processing chunk {chunk_num} ({len(chunk)} records)")
             
-            # Clean each record in the chunk
-            cleaned_chunk = []
-            for idx, record in enumerate(chunk):
-                cleaned_record = self.clean_record(record)
-                if cleaned_record is not None:
-                    cleaned_chunk.append(cleaned_record)
-                else:
-                    failed_records.append({
-                        'index': i + idx,
-                        'record': record,
-                        'error': 'Missing required field: code'
-                    })
-            
-            if not cleaned_chunk:
-                logger.warning(f"{self.record_type} - Chunk {chunk_num} has no valid records")
-                continue
-            
-            # Try to serialize the chunk
-            serializer = self.serializer_class(data=cleaned_chunk, many=True)
-            if serializer.is_valid():
-                try:
-                    # Use raw SQL insert to avoid ORM id lookup on managed=False tables
-                    from django.db import connection as _conn
-                    fields = [f.column for f in self.model._meta.concrete_fields if not f.primary_key or not f.auto_created]
-                    placeholders = ', '.join(['%s'] * len(fields))
-                    col_names = ', '.join(fields)
-                    sql = f"INSERT INTO {self.model._meta.db_table} ({col_names}) VALUES ({placeholders})"
-                    rows = [
-                        tuple(item.get(f.attname, None) for f in self.model._meta.concrete_fields if not f.primary_key or not f.auto_created)
-                        for item in serializer.validated_data
-                    ]
-                    with _conn.cursor() as _cur:
-                        _cur.executemany(sql, rows)
-                    processed_count += len(rows)
-                    logger.info(f"{self.record_type} - Successfully processed chunk {chunk_num} ({len(rows)} records)")
-                except Exception as e:
-                    logger.error(f"{self.record_type} - Database error in chunk {chunk_num}: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    # Try individual record processing for this chunk
-                    individual_count = self.process_individual_records(cleaned_chunk)
-                    processed_count += individual_count
-            else:
-                logger.error(f"{self.record_type} - Serialization failed for chunk {chunk_num}")
-                # Process individual records to identify specific issues
-                individual_count = self.process_individual_records(cleaned_chunk)
-                processed_count += individual_count
+            # Coerce straight to insert rows; rows the database rejects are
+            # isolated by bisecting the chunk under savepoints
+            loaded = self.load_chunk(loader, chunk, i, failed_records)
+            processed_count += loaded
+            logger.info(f"{self.record_type} - Processed chunk {chunk_num} ({loaded} of {len(chunk)} records)")
         
-        return processed_count, failed_records
-    
-    def process_individual_records(self, records):
-        """Process records individually to identify specific issues"""
-        processed_count = 0
-        
-        for idx, record in enumerate(records):
-            try:
-                serializer = self.serializer_class(data=record)
-                if serializer.is_valid():
-                    model_instance = self.model(**serializer.validated_data)
-                    model_instance.save()
-                    processed_count += 1
-                else:
-                    logger.error(f"{self.record_type} - Record {idx} validation failed: {serializer.errors}")
-                    logger.error(f"{self.record_type} - Problematic record: {json.dumps(record, indent=2, default=str)}")
-            except Exception as e:
-                logger.error(f"{self.record_type} - Exception processing record {idx}: {str(e)}")
-                logger.error(f"{self.record_type} - Record data: {json.dumps(record, indent=2, default=str)}")
-        
-        return processed_count
+        return processed_count, failed_records, total_records
     
     def post(self, request):
         data = request.data
         
         # Validate input
-        if not isinstance(data, list):
+        if not is_record_list(data):
             logger.error(f"{self.record_type} - Expected a list of records")
             return Response({"error": "Expected a list of records"}, status=400)
         
@@ -164,247 +370,310 @@ class BaseLedgersView(APIView):
             logger.warning(f"{self.record_type} - Received empty data")
             return Response({"message": f"{self.record_type} - No records to process"}, status=200)
         
-        logger.info(f"{self.record_type} - Received {len(data)} records")
-        
         # Log sample records
-        for i, sample in enumerate(data[:2]):
-            logger.info(f"{self.record_type} - Sample Record {i+1}: {json.dumps(sample, indent=2, default=str)}")
+        for i, sample in enumerate(sample_records(data)):
+            logger.info(f"{self.record_type} - Sample Record {i+1}: {json.dumps(sample, default=str)}")
         
         try:
             with transaction.atomic():
-                # Clear existing records — use raw SQL to avoid ORM id lookup on managed=False tables
-                from django.db import connection as _conn
-                with _conn.cursor() as _cur:
-                    _cur.execute(f"DELETE FROM {self.model._meta.db_table}")
+                # Clear existing records (or diff against them in delta mode)
+                loader = self.replace_loader(request, self.model, self.coercer)
                 
-                # Process records in chunks
-                processed_count, failed_records = self.process_in_chunks(data)
+                # Process records in chunks as they stream in
+                processed_count, failed_records, total_count = self.process_in_chunks(data, loader)
+                summary = self.finish_load(loader)
                 
                 # Log results
-                logger.info(f"{self.record_type} - Successfully processed {processed_count} out of {len(data)} records")
+                logger.info(f"{self.record_type} - Received {total_count} records")
+                logger.info(f"{self.record_type} - Successfully processed {processed_count} out of {total_count} records")
                 
                 if failed_records:
-                    logger.warning(f"{self.record_type} - {len(failed_records)} records failed validation")
+                    logger.warning(f"{self.record_type} - {len(failed_records)} records failed")
                     for failed in failed_records[:5]:  # Log first 5 failed records
-                        logger.warning(f"Failed record at index {failed['index']}: {failed['error']}")
+                        logger.warning("Failed record at index %d: %s", failed['index'], failed['error'])
                 
                 return Response({
                     "message": f"{self.record_type} records processed",
                     "processed_count": processed_count,
-                    "total_count": len(data),
-                    "failed_count": len(failed_records)
+                    "total_count": total_count,
+                    "failed_count": len(failed_records),
+                    "failed_records": failed_records,
+                    **summary
                 }, status=status.HTTP_201_CREATED)
                 
+        except ParseError:
+            raise
         except Exception as e:
             logger.error(f"{self.record_type} - Critical error: {str(e)}")
             logger.error(traceback.format_exc())
             return Response({"error": "Internal server error"}, status=500)
     
     def get(self, request):
-        records = self.model.objects.all()
-        serializer = self.serializer_class(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, self.model.objects.all(), self.serializer_class)
 
 
 class IMC1LedgersView(BaseLedgersView):
     model = IMC1RecordLedgers
     serializer_class = IMC1LedgersSerializer
+    coercer = RowCoercer(IMC1RecordLedgers)
     record_type = "IMC1 Ledgers"
 
 
 class IMC2LedgersView(BaseLedgersView):
     model = IMC2RecordLedgers
     serializer_class = IMC2LedgersSerializer
+    coercer = RowCoercer(IMC2RecordLedgers)
     record_type = "IMC2 Ledgers"
 
 
 class SysmacLedgersView(BaseLedgersView):
     model = SysmacRecordLedgers
     serializer_class = SysmacLedgersSerializer
+    coercer = RowCoercer(SysmacRecordLedgers)
     record_type = "Sysmac Ledgers"
 
 
 class DQLedgersView(BaseLedgersView):
     model = DQRecordsLedgers
     serializer_class = DQLedgersSerializer
+    coercer = RowCoercer(DQRecordsLedgers)
     record_type = "DQ Ledgers"
 
 
 class PlanetLedgersView(BaseLedgersView):
     model = PlanetLedgers
     serializer_class = PlanetLedgersSerializer
+    coercer = RowCoercer(PlanetLedgers)
     record_type = "Planet Ledgers"
 
 
-class IMC1RecordView(APIView):
+class IMC1RecordView(SyncAPIView):
+    record_type = "IMC1"
+    coercer = RowCoercer(IMC1Record, defaults=ZERO_BALANCES)
+
     def post(self, request):
-        logger.info(f"IMC1 - Received {len(request.data)} records")
-        serializer = IMC1Serializer(data=request.data, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    IMC1Record.objects.all().delete()
-                    records = [IMC1Record(**item) for item in serializer.validated_data]
-                    IMC1Record.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"Saved {len(records)} IMC-1 records")
-                return Response({"message": "IMC-1 records saved"}, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                logger.error(f"IMC1 DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error", "detail": str(e)}, status=500)
+        data = request.data
+        if not is_record_list(data):
+            logger.error("IMC1 - Expected a list of records")
+            return Response({"error": "Expected a list of records"}, status=400)
+
+        summary = {}
+        try:
+            with transaction.atomic():
+                loader = self.replace_loader(request, IMC1Record, self.coercer, key='code')
+                saved, errors = self.validate_and_load(data, self.coercer, loader)
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    summary = self.finish_load(loader)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"IMC1 DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error", "detail": str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f"Saved {saved} IMC-1 records")
+            return Response({"message": "IMC-1 records saved", **summary},
+                            status=status.HTTP_201_CREATED)
         
         # Enhanced error logging
-        logger.error(f"IMC1 Validation Errors: {json.dumps(serializer.errors, indent=2)}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        logger.error(f"IMC1 Validation Errors: {summarize_errors(errors)}")
+        
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get(self, request):
-        records = IMC1Record.objects.all()
-        serializer = IMC1Serializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, IMC1Record.objects.all(), IMC1Serializer)
 
 
 
-class IMC2RecordView(APIView):
+class IMC2RecordView(SyncAPIView):
+    record_type = "IMC2"
+    coercer = RowCoercer(IMC2Record, defaults=ZERO_BALANCES)
+
     def post(self, request):
-        logger.info(f"IMC2 - Received {len(request.data)} records")
-        serializer = IMC2Serializer(data=request.data, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    IMC2Record.objects.all().delete()
-                    records = [IMC2Record(**item) for item in serializer.validated_data]
-                    IMC2Record.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"Saved {len(records)} IMC-2 records")
-                return Response({"message": "IMC-2 records saved"}, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                logger.error(f"IMC2 DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error", "detail": str(e)}, status=500)
+        data = request.data
+        if not is_record_list(data):
+            logger.error("IMC2 - Expected a list of records")
+            return Response({"error": "Expected a list of records"}, status=400)
+
+        summary = {}
+        try:
+            with transaction.atomic():
+                loader = self.replace_loader(request, IMC2Record, self.coercer, key='code')
+                saved, errors = self.validate_and_load(data, self.coercer, loader)
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    summary = self.finish_load(loader)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"IMC2 DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error", "detail": str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f"Saved {saved} IMC-2 records")
+            return Response({"message": "IMC-2 records saved", **summary},
+                            status=status.HTTP_201_CREATED)
         
         # Enhanced error logging
-        logger.error(f"IMC2 Validation Errors: {json.dumps(serializer.errors, indent=2)}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        logger.error(f"IMC2 Validation Errors: {summarize_errors(errors)}")
+        
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get(self, request):
-        records = IMC2Record.objects.all()
-        serializer = IMC2Serializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, IMC2Record.objects.all(), IMC2Serializer)
     
 
-class SysmacRecordView(APIView):
+class SysmacRecordView(SyncAPIView):
+    record_type = "Sysmac"
+    coercer = RowCoercer(SysmacRecord, defaults=ZERO_BALANCES)
+
     def post(self, request):
-        logger.info(f"Sysmac - Received {len(request.data)} records")
-        
+        data = request.data
+        if not is_record_list(data):
+            logger.error("Sysmac - Expected a list of records")
+            return Response({"error": "Expected a list of records"}, status=400)
+
         # Log sample data to debug
-        if request.data:
-            logger.info(f"Sysmac - Sample record: {json.dumps(request.data[0], indent=2)}")
-        
-        serializer = SysmacSerializer(data=request.data, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    SysmacRecord.objects.all().delete()
-                    records = [SysmacRecord(**item) for item in serializer.validated_data]
-                    SysmacRecord.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"Saved {len(records)} Sysmac records")
-                return Response({"message": "Sysmac records saved"}, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                logger.error(f"Sysmac DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error", "detail": str(e)}, status=500)
+        for sample in sample_records(data)[:1]:
+            logger.info(f"Sysmac - Sample record: {json.dumps(sample, default=str)}")
+
+        summary = {}
+        try:
+            with transaction.atomic():
+                loader = self.replace_loader(request, SysmacRecord, self.coercer, key='code')
+                saved, errors = self.validate_and_load(data, self.coercer, loader)
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    summary = self.finish_load(loader)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"Sysmac DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error", "detail": str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f"Saved {saved} Sysmac records")
+            return Response({"message": "Sysmac records saved", **summary},
+                            status=status.HTTP_201_CREATED)
         
         # Enhanced error logging
-        logger.error(f"Sysmac Validation Errors: {json.dumps(serializer.errors, indent=2)}")
-        
+        logger.error(f"Sysmac Validation Errors: {summarize_errors(errors)}")
+
         # Log the first few invalid records for debugging
-        if hasattr(serializer, 'initial_data') and serializer.initial_data:
-            for i, record in enumerate(serializer.initial_data[:3]):  # First 3 records
-                logger.error(f"Sysmac - Invalid record {i}: {json.dumps(record, indent=2)}")
+        for i, record in enumerate(sample_records(data)):
+            logger.error(f"Sysmac - Invalid record {i}: {json.dumps(record, default=str)}")
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get(self, request):
-        records = SysmacRecord.objects.all()
-        serializer = SysmacSerializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, SysmacRecord.objects.all(), SysmacSerializer)
     
     
-class DQRecordView(APIView):
+class DQRecordView(SyncAPIView):
+    record_type = "DQ"
+    coercer = RowCoercer(DQRecord, defaults=ZERO_BALANCES)
+
     def post(self, request):
-        logger.info(f"DQ - Received {len(request.data)} records")
-        
+        data = request.data
+        if not is_record_list(data):
+            logger.error("DQ - Expected a list of records")
+            return Response({"error": "Expected a list of records"}, status=400)
+
         # Log sample data to debug
-        if request.data:
-            logger.info(f"DQ - Sample record: {json.dumps(request.data[0], indent=2)}")
-        
-        serializer = DQSerializer(data=request.data, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    DQRecord.objects.all().delete()
-                    records = [DQRecord(**item) for item in serializer.validated_data]
-                    DQRecord.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"Saved {len(records)} DQ records")
-                return Response({"message": "DQ records saved"}, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                logger.error(f"DQ DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error", "detail": str(e)}, status=500)
+        for sample in sample_records(data)[:1]:
+            logger.info(f"DQ - Sample record: {json.dumps(sample, default=str)}")
+
+        summary = {}
+        try:
+            with transaction.atomic():
+                loader = self.replace_loader(request, DQRecord, self.coercer, key='code')
+                saved, errors = self.validate_and_load(data, self.coercer, loader)
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    summary = self.finish_load(loader)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"DQ DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error", "detail": str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f"Saved {saved} DQ records")
+            return Response({"message": "DQ records saved", **summary},
+                            status=status.HTTP_201_CREATED)
         
         # Enhanced error logging
-        logger.error(f"DQ Validation Errors: {json.dumps(serializer.errors, indent=2)}")
-        
+        logger.error(f"DQ Validation Errors: {summarize_errors(errors)}")
+
         # Log the first few invalid records for debugging
-        if hasattr(serializer, 'initial_data') and serializer.initial_data:
-            for i, record in enumerate(serializer.initial_data[:3]):  # First 3 records
-                logger.error(f"DQ - Invalid record {i}: {json.dumps(record, indent=2)}")
+        for i, record in enumerate(sample_records(data)):
+            logger.error(f"DQ - Invalid record {i}: {json.dumps(record, default=str)}")
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get(self, request):
-        records = DQRecord.objects.all()
-        serializer = DQSerializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, DQRecord.objects.all(), DQSerializer)
+
 
+class PlanetMasterRecordView(SyncAPIView):
+    record_type = "PLANET_MASTER"
+    # code (then name) is the natural key, but nothing makes it unique; the
+    # pk breaks ties so a page boundary inside a run of duplicates is exact
+    ordering = ('code', 'name', 'pk')
+    # The serializer took these as floats, so extra decimals were rounded by
+    # the database rather than rejected.
+    coercer = RowCoercer(PlanetMaster, defaults=ZERO_BALANCES, rounding=ROUND_HALF_UP)
 
-class PlanetMasterRecordView(APIView):
     def post(self, request):
+        data = request.data
         try:
-            logger.info(f"PLANET_MASTER - Received {len(request.data)} records")
-            serializer = PlanetMasterSerializer(data=request.data, many=True)
-            if serializer.is_valid():
-                with transaction.atomic():
-                    from django.db import connection as _conn
-                    with _conn.cursor() as _cur:
-                        _cur.execute("DELETE FROM planet_master")
-                        fields = [f.column for f in PlanetMaster._meta.concrete_fields if not f.primary_key or not f.auto_created]
-                        placeholders = ', '.join(['%s'] * len(fields))
-                        col_names = ', '.join(fields)
-                        rows = [tuple(item.get(f.attname, None) for f in PlanetMaster._meta.concrete_fields if not f.primary_key or not f.auto_created) for item in serializer.validated_data]
-                        _cur.executemany(f"INSERT INTO planet_master ({col_names}) VALUES ({placeholders})", rows)
-                records = serializer.validated_data
-                logger.info(f"Saved {len(records)} PLANET_MASTER records")
-                return Response({"message": "PLANET_MASTER records saved"}, status=status.HTTP_201_CREATED)
-
-            logger.error(f"PLANET_MASTER Validation Errors: {json.dumps(serializer.errors, indent=2)}")
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            if not is_record_list(data):
+                logger.error("PLANET_MASTER - Expected a list of records")
+                return Response({"error": "Expected a list of records"}, status=400)
+
+            summary = {}
+            with transaction.atomic():
+                # planet_master has no id column, so rows are keyed on code
+                loader = self.replace_loader(request, PlanetMaster, self.coercer, key='code')
+                saved, errors = self.validate_and_load(data, self.coercer, loader)
+                if errors:
+                    transaction.set_rollback(True)
+                else:
+                    summary = self.finish_load(loader)
+
+            if errors is None:
+                logger.info(f"Saved {saved} PLANET_MASTER records")
+                return Response({"message": "PLANET_MASTER records saved", **summary},
+                                status=status.HTTP_201_CREATED)
+
+            logger.error(f"PLANET_MASTER Validation Errors: {summarize_errors(errors)}")
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
+        except ParseError:
+            raise
         except Exception as e:
             logger.error(f"PLANET_MASTER Exception: {str(e)}")
             logger.error(traceback.format_exc())
-            if request.data:
-                logger.error(f"Sample record: {json.dumps(request.data[0], indent=2)}")
+            for sample in sample_records(data)[:1]:
+                logger.error(f"Sample record: {json.dumps(sample, default=str)}")
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def get(self, request):
-        records = PlanetMaster.objects.all()
-        serializer = PlanetMasterSerializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, PlanetMaster.objects.all(), PlanetMasterSerializer)
     
 
 
 
-class PlanetClientsRecordView(APIView):
+class PlanetClientsRecordView(SyncAPIView):
     """
     POST  – deletes planet_clients rows for the given client_id, then inserts
             fresh records tagged with that client_id.
@@ -413,38 +682,25 @@ class PlanetClientsRecordView(APIView):
     DELETE– removes all rows for a client_id (truncate step from sync tool).
     """
 
-    def _get_client_id(self, request):
-        return (
-            request.headers.get("X-Client-ID", "").strip()
-            or request.query_params.get("client_id", "").strip()
-        )
+    record_type = "PLANET_CLIENTS"
+    cache_responses = True
+    # Rows used to go straight to SQL, so the database rounded amcamt.
+    coercer = RowCoercer(PlanetClient, blank_to_null=True, rounding=ROUND_HALF_UP)
 
     def post(self, request):
+        data = request.data
         try:
             client_id = self._get_client_id(request)
-            data = request.data
 
-            if not isinstance(data, list):
+            if not is_record_list(data):
                 return Response({"error": "Expected a list of records"}, status=400)
             if not data:
                 return Response({"message": "No records to process"}, status=200)
 
-            logger.info(f"PLANET_CLIENTS - Received {len(data)} records "
-                        f"(client_id={client_id!r})")
+            for i, record in enumerate(sample_records(data)):
+                logger.info(f"Sample record {i}: {json.dumps(record, default=str)}")
 
-            for i, record in enumerate(data[:2]):
-                logger.info(f"Sample record {i}: {json.dumps(record, indent=2, default=str)}")
-
-            # ── Build column list directly from the model (skip auto PK) ──────
-            all_fields = [
-                f for f in PlanetClient._meta.concrete_fields
-                if not f.primary_key or not f.auto_created
-            ]
-            col_names    = ', '.join(f.column for f in all_fields)
-            placeholders = ', '.join(['%s'] * len(all_fields))
-            insert_sql   = (
-                f"INSERT INTO planet_clients ({col_names}) VALUES ({placeholders})"
-            )
+            loader = BulkLoader(PlanetClient, fields=self.coercer.fields)
 
             # ── Coerce each incoming record directly — no serializer ──────────
             # Bypassing PlanetClientsSerializer.is_valid() here is intentional.
@@ -454,88 +710,78 @@ class PlanetClientsRecordView(APIView):
             # That caused all 314 existing-code rows to fail validation silently,
             # leaving only the 15 brand-new codes to insert (329 fetched → 15 saved).
             # Raw SQL bypasses UniqueValidator entirely and inserts all rows.
-            from datetime import date as _date
-            rows    = []
+            fill = {"client_id": client_id}
             skipped = 0
-            for rec in data:
-                code = str(rec.get("code", "") or "").strip()
-                if not code:
-                    skipped += 1
-                    continue
-
-                row = []
-                for f in all_fields:
-                    val = rec.get(f.attname, rec.get(f.column))
-
-                    # Inject client_id when missing
-                    if f.attname == "client_id" and (val is None or val == ""):
-                        val = client_id
-
-                    # Coerce installationdate -> YYYY-MM-DD or None
-                    if f.attname == "installationdate" and val:
-                        if isinstance(val, _date):
-                            val = val.isoformat()
-                        elif isinstance(val, str) and val.strip():
-                            val = val[:10]
-                        else:
-                            val = None
-
-                    # Blank strings -> None for nullable columns
-                    if val == "" and f.null:
-                        val = None
+            invalid = 0
+
+            def coerce_rows(records):
+                nonlocal skipped, invalid
+                for rec in records:
+                    code = str(rec.get("code", "") or "").strip()
+                    if not code:
+                        skipped += 1
+                        continue
+                    try:
+                        yield self.coercer.coerce(rec, fill)
+                    except RowError as e:
+                        invalid += 1
+                        logger.warning("PLANET_CLIENTS - Skipped record %r: %s", code, e.errors)
 
-                    row.append(val)
-                rows.append(tuple(row))
+            # ── Insert only — the client already called DELETE before posting chunks ──
+            # Deleting here would wipe every previously-pushed chunk, leaving only
+            # the last chunk in the DB (2,015 rows pushed → only 15 saved).
+            # The separate DELETE endpoint handles truncation; POST just inserts.
+            # Rows are coerced and loaded one batch at a time as they are parsed.
+            saved = 0
+            with transaction.atomic():
+                for batch in iter_batches(data, self.batch_size):
+                    with self.metrics.stage("coerce"):
+                        rows = list(coerce_rows(batch))
+                    with self.metrics.stage("insert"):
+                        saved += loader.load(rows)
+            self.metrics.rows(loaded=saved, failed=invalid)
+
+            logger.info(f"PLANET_CLIENTS - Received {saved + skipped + invalid} records "
+                        f"(client_id={client_id!r})")
 
             if skipped:
                 logger.warning(f"PLANET_CLIENTS - Skipped {skipped} records missing 'code'")
 
-            if not rows:
+            if not saved:
                 return Response(
-                    {"message": "No valid records to insert", "skipped": skipped},
+                    {"message": "No valid records to insert", "skipped": skipped,
+                     "invalid": invalid},
                     status=200,
                 )
 
-            # ── Insert only — the client already called DELETE before posting chunks ──
-            # Deleting here would wipe every previously-pushed chunk, leaving only
-            # the last chunk in the DB (2,015 rows pushed → only 15 saved).
-            # The separate DELETE endpoint handles truncation; POST just inserts.
-            with transaction.atomic():
-                from django.db import connection as _conn
-                with _conn.cursor() as _cur:
-                    _cur.executemany(insert_sql, rows)
-
             logger.info(
-                f"PLANET_CLIENTS - Saved {len(rows)} records for client_id={client_id!r} "
-                f"(skipped {skipped} without code)"
+                f"PLANET_CLIENTS - Saved {saved} records for client_id={client_id!r} "
+                f"(skipped {skipped} without code, {invalid} invalid)"
             )
             return Response(
                 {
                     "message":   "PLANET_CLIENTS records saved",
-                    "count":     len(rows),
+                    "count":     saved,
                     "skipped":   skipped,
+                    "invalid":   invalid,
                     "client_id": client_id,
                 },
                 status=status.HTTP_201_CREATED,
             )
 
+        except ParseError:
+            raise
         except Exception as e:
             logger.error(f"PLANET_CLIENTS Exception: {str(e)}")
             logger.error(traceback.format_exc())
-            if request.data:
-                logger.error(f"Sample record: {json.dumps(request.data[0], indent=2, default=str)}")
+            for sample in sample_records(data)[:1]:
+                logger.error(f"Sample record: {json.dumps(sample, default=str)}")
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def delete(self, request):
         client_id = self._get_client_id(request)
-        from django.db import connection as _conn
-        with _conn.cursor() as _cur:
-            if client_id:
-                _cur.execute("DELETE FROM planet_clients WHERE client_id = %s", [client_id])
-                deleted = _cur.rowcount
-            else:
-                _cur.execute("DELETE FROM planet_clients")
-                deleted = _cur.rowcount
+        with self.metrics.stage("delete"):
+            deleted = self.delete_client_rows(PlanetClient, client_id)
         logger.info(f"PLANET_CLIENTS - Deleted {deleted} rows (client_id={client_id!r})")
         return Response({"deleted": deleted, "client_id": client_id}, status=200)
 
@@ -543,134 +789,46 @@ class PlanetClientsRecordView(APIView):
         client_id = self._get_client_id(request)
         qs = (PlanetClient.objects.filter(client_id=client_id)
               if client_id else PlanetClient.objects.all())
-        serializer = PlanetClientsSerializer(qs, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, qs, PlanetClientsSerializer)
 
 
-class BaseInvMastView(APIView):
+class BaseInvMastView(SyncAPIView):
     """Base class for all invoice master views with common functionality"""
     
     model = None
     serializer_class = None
+    coercer = None
     record_type = None
+    # A customer appears once per invoice; the table keys on customerid
+    conflict_policy = "last"
+    summed_columns = ("nettotal", "paid")
     
-    def clean_record(self, record):
-        """Clean and validate individual record before serialization"""
-        cleaned = record.copy()
-        
-        # Handle date field
-        if 'invdate' in cleaned:
-            if cleaned['invdate'] is None or cleaned['invdate'] == '':
-                cleaned['invdate'] = None
-            elif isinstance(cleaned['invdate'], str):
-                date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']
-                for fmt in date_formats:
-                    try:
-                        parsed_date = datetime.strptime(cleaned['invdate'], fmt).date()
-                        cleaned['invdate'] = parsed_date.strftime('%Y-%m-%d')
-                        break
-                    except ValueError:
-                        continue
-                else:
-                    logger.warning(f"Could not parse invdate: {cleaned['invdate']}")
-                    cleaned['invdate'] = None
-        
-        # Handle decimal fields
-        decimal_fields = ['nettotal', 'paid']
-        for field in decimal_fields:
-            if field in cleaned:
-                if cleaned[field] is None or cleaned[field] == '':
-                    cleaned[field] = None
-                else:
-                    try:
-                        cleaned[field] = str(Decimal(str(cleaned[field])))
-                    except (ValueError, InvalidOperation, TypeError):
-                        logger.warning(f"Could not convert {field} to decimal: {cleaned[field]}")
-                        cleaned[field] = None
-        
-        # Handle string fields
-        string_fields = ['modeofpayment', 'customerid', 'bill_ref']
-        for field in string_fields:
-            if field in cleaned:
-                if cleaned[field] is None:
-                    cleaned[field] = ''
-                else:
-                    cleaned[field] = str(cleaned[field]).strip()
-        
-        return cleaned
-    
-    def process_in_chunks(self, data, chunk_size=500):
+    def process_in_chunks(self, data, loader, chunk_size=500):
         """Process data in smaller chunks"""
-        total_records = len(data)
+        total_records = 0
         processed_count = 0
         failed_records = []
         
-        logger.info(f"{self.record_type} - Processing {total_records} records in chunks of {chunk_size}")
+        logger.info(f"{self.record_type} - Processing records in chunks of {chunk_size}")
         
-        for i in range(0, total_records, chunk_size):
-            chunk = data[i:i + chunk_size]
-            chunk_num = (i // chunk_size) + 1
+        for chunk_num, chunk in enumerate(iter_batches(data, chunk_size), start=1):
+            i = total_records
+            total_records += len(chunk)
             
             logger.info(f"{self.record_type} - Processing chunk {chunk_num} ({len(chunk)} records)")
             
-            # Clean each record in the chunk
-            cleaned_chunk = []
-            for idx, record in enumerate(chunk):
-                cleaned_record = self.clean_record(record)
-                if cleaned_record is not None:
-                    cleaned_chunk.append(cleaned_record)
-                else:
-                    failed_records.append({
-                        'index': i + idx,
-                        'record': record,
-                        'error': 'Invalid record data'
-                    })
-            
-            if not cleaned_chunk:
-                logger.warning(f"{self.record_type} - Chunk {chunk_num} has no valid records")
-                continue
-            
-            # Try to serialize the chunk
-            serializer = self.serializer_class(data=cleaned_chunk, many=True)
-            if serializer.is_valid():
-                try:
-                    records = [self.model(**item) for item in serializer.validated_data]
-                    self.model.objects.bulk_create(records, batch_size=1000)
-                    processed_count += len(records)
-                    logger.info(f"{self.record_type} - Successfully processed chunk {chunk_num} ({len(records)} records)")
-                except Exception as e:
-                    logger.error(f"{self.record_type} - Database error in chunk {chunk_num}: {str(e)}")
-                    individual_count = self.process_individual_records(cleaned_chunk)
-                    processed_count += individual_count
-            else:
-                logger.error(f"{self.record_type} - Serialization failed for chunk {chunk_num}")
-                individual_count = self.process_individual_records(cleaned_chunk)
-                processed_count += individual_count
-        
-        return processed_count, failed_records
-    
-    def process_individual_records(self, records):
-        """Process records individually to identify specific issues"""
-        processed_count = 0
-        
-        for idx, record in enumerate(records):
-            try:
-                serializer = self.serializer_class(data=record)
-                if serializer.is_valid():
-                    model_instance = self.model(**serializer.validated_data)
-                    model_instance.save()
-                    processed_count += 1
-                else:
-                    logger.error(f"{self.record_type} - Record {idx} validation failed: {serializer.errors}")
-            except Exception as e:
-                logger.error(f"{self.record_type} - Exception processing record {idx}: {str(e)}")
+            # Coerce straight to insert rows; rows the database rejects are
+            # isolated by bisecting the chunk under savepoints
+            loaded = self.load_chunk(loader, chunk, i, failed_records)
+            processed_count += loaded
+            logger.info(f"{self.record_type} - Processed chunk {chunk_num} ({loaded} of {len(chunk)} records)")
         
-        return processed_count
+        return processed_count, failed_records, total_records
     
     def post(self, request):
         data = request.data
         
-        if not isinstance(data, list):
+        if not is_record_list(data):
             logger.error(f"{self.record_type} - Expected a list of records")
             return Response({"error": "Expected a list of records"}, status=400)
         
@@ -678,69 +836,76 @@ class BaseInvMastView(APIView):
             logger.warning(f"{self.record_type} - Received empty data")
             return Response({"message": f"{self.record_type} - No records to process"}, status=200)
         
-        logger.info(f"{self.record_type} - Received {len(data)} records")
-        
         # Log sample records
-        for i, sample in enumerate(data[:2]):
-            logger.info(f"{self.record_type} - Sample Record {i+1}: {json.dumps(sample, indent=2, default=str)}")
+        for i, sample in enumerate(sample_records(data)):
+            logger.info(f"{self.record_type} - Sample Record {i+1}: {json.dumps(sample, default=str)}")
         
         try:
             with transaction.atomic():
-                self.model.objects.all().delete()
-                processed_count, failed_records = self.process_in_chunks(data)
+                loader = self.replace_loader(request, self.model, self.coercer)
+                processed_count, failed_records, total_count = self.process_in_chunks(data, loader)
+                summary = self.finish_load(loader)
                 
-                logger.info(f"{self.record_type} - Successfully processed {processed_count} out of {len(data)} records")
+                logger.info(f"{self.record_type} - Received {total_count} records")
+                logger.info(f"{self.record_type} - Successfully processed {processed_count} out of {total_count} records")
                 
                 return Response({
                     "message": f"{self.record_type} records processed",
                     "processed_count": processed_count,
-                    "total_count": len(data),
-                    "failed_count": len(failed_records)
+                    "total_count": total_count,
+                    "failed_count": len(failed_records),
+                    "failed_records": failed_records,
+                    **summary
                 }, status=status.HTTP_201_CREATED)
                 
+        except ParseError:
+            raise
         except Exception as e:
             logger.error(f"{self.record_type} - Critical error: {str(e)}")
             logger.error(traceback.format_exc())
             return Response({"error": "Internal server error"}, status=500)
     
     def get(self, request):
-        records = self.model.objects.all()
-        serializer = self.serializer_class(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, self.model.objects.all(), self.serializer_class)
 
 
 class PlanetInvMastView(BaseInvMastView):
     model = PlanetInvMast
     serializer_class = PlanetInvMastSerializer
+    coercer = RowCoercer(PlanetInvMast, required=())
     record_type = "Planet InvMast"
 
 
 class IMC1InvMastView(BaseInvMastView):
     model = IMC1InvMast
     serializer_class = IMC1InvMastSerializer
+    coercer = RowCoercer(IMC1InvMast, required=())
     record_type = "IMC1 InvMast"
 
 
 class IMC2InvMastView(BaseInvMastView):
     model = IMC2InvMast
     serializer_class = IMC2InvMastSerializer
+    coercer = RowCoercer(IMC2InvMast, required=())
     record_type = "IMC2 InvMast"
 
 
 class SysmacInvMastView(BaseInvMastView):
     model = SysmacInvMast
     serializer_class = SysmacInvMastSerializer
+    coercer = RowCoercer(SysmacInvMast, required=())
     record_type = "Sysmac InvMast"
 
 
 class DQInvMastView(BaseInvMastView):
     model = DQInvMast
     serializer_class = DQInvMastSerializer
+    coercer = RowCoercer(DQInvMast, required=())
     record_type = "DQ InvMast"
 
 
 
-class AccMasterView(APIView):
+class AccMasterView(SyncAPIView):
     """
     POST  – deletes acc_master rows for the given client_id, then bulk-inserts
             fresh records tagged with that client_id.
@@ -750,17 +915,17 @@ class AccMasterView(APIView):
     DELETE– removes all rows for a client_id (called by the sync tool before re-push).
     """
 
-    def _get_client_id(self, request):
-        return (
-            request.headers.get("X-Client-ID", "").strip()
-            or request.query_params.get("client_id", "").strip()
-        )
+    record_type = "AccMaster"
+    coercer = RowCoercer(AccMaster)
+    cache_responses = True
+    # codes repeat across clients, so client_id breaks ties
+    ordering = ('code', 'client_id')
 
     def post(self, request):
         data = request.data
         client_id = self._get_client_id(request)
 
-        if not isinstance(data, list):
+        if not is_record_list(data):
             logger.error("AccMaster - Expected a list of records")
             return Response({"error": "Expected a list of records"}, status=400)
 
@@ -768,53 +933,49 @@ class AccMasterView(APIView):
             logger.warning("AccMaster - Received empty payload")
             return Response({"message": "No records to process"}, status=200)
 
-        logger.info(f"AccMaster - Received {len(data)} records (client_id={client_id!r})")
+        # Fill client_id on every record that does not carry its own
+        fill = {"client_id": client_id}
 
-        # Inject client_id into every record so the serializer sees it
-        tagged = []
-        for rec in data:
-            r = dict(rec)
-            r.setdefault("client_id", client_id)
-            tagged.append(r)
-
-        for i, sample in enumerate(tagged[:2]):
+        for i, sample in enumerate(sample_records(data)):
             logger.info(f"AccMaster - Sample record {i + 1}: "
-                        f"{json.dumps(sample, indent=2, default=str)}")
+                        f"{json.dumps({**fill, **sample}, default=str)}")
 
-        serializer = AccMasterSerializer(data=tagged, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    # Delete existing rows for this client before re-inserting
-                    if client_id:
-                        deleted, _ = AccMaster.objects.filter(client_id=client_id).delete()
-                    else:
-                        deleted, _ = AccMaster.objects.all().delete()
-                    logger.info(f"AccMaster - Deleted {deleted} existing rows (client_id={client_id!r})")
-                    records = [AccMaster(**item) for item in serializer.validated_data]
-                    AccMaster.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"AccMaster - Saved {len(records)} records for client_id={client_id!r}")
-                return Response(
-                    {"message": "AccMaster records saved", "count": len(records),
-                     "client_id": client_id},
-                    status=status.HTTP_201_CREATED,
-                )
-            except Exception as e:
-                logger.error(f"AccMaster - DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error"}, status=500)
+        # Outside the transaction: creating a client's partition locks the table
+        if client_id:
+            ensure_partition(AccMaster, client_id)
+
+        try:
+            with transaction.atomic():
+                # Delete existing rows for this client before re-inserting
+                with self.metrics.stage("delete"):
+                    deleted = self.delete_client_rows(AccMaster, client_id)
+                logger.info(f"AccMaster - Deleted {deleted} existing rows (client_id={client_id!r})")
+                saved, errors = self.validate_and_load(
+                    data, self.coercer, BulkLoader(AccMaster), fill=fill)
+                if errors:
+                    transaction.set_rollback(True)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"AccMaster - DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error"}, status=500)
 
-        errors_sample = list(serializer.errors)[:5]
-        logger.error(f"AccMaster - Validation errors (first 5): "
-                     f"{json.dumps(errors_sample, indent=2, default=str)}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if errors is None:
+            logger.info(f"AccMaster - Saved {saved} records for client_id={client_id!r}")
+            return Response(
+                {"message": "AccMaster records saved", "count": saved,
+                 "client_id": client_id},
+                status=status.HTTP_201_CREATED,
+            )
+
+        logger.error(f"AccMaster - Validation errors: {summarize_errors(errors)}")
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
         client_id = self._get_client_id(request)
-        if client_id:
-            deleted, _ = AccMaster.objects.filter(client_id=client_id).delete()
-        else:
-            deleted, _ = AccMaster.objects.all().delete()
+        with self.metrics.stage("delete"):
+            deleted = self.delete_client_rows(AccMaster, client_id)
         logger.info(f"AccMaster - Deleted {deleted} rows (client_id={client_id!r})")
         return Response({"deleted": deleted, "client_id": client_id}, status=200)
 
@@ -828,11 +989,10 @@ class AccMasterView(APIView):
         if super_code:
             qs = qs.filter(super_code=super_code)
 
-        serializer = AccMasterSerializer(qs, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, qs, AccMasterSerializer)
 
 
-class AccProductView(APIView):
+class AccProductView(SyncAPIView):
     """
     POST  – deletes acc_product rows for the given client_id, then bulk-inserts
             fresh records tagged with that client_id.
@@ -840,17 +1000,16 @@ class AccProductView(APIView):
     DELETE– removes all rows for a client_id.
     """
 
-    def _get_client_id(self, request):
-        return (
-            request.headers.get("X-Client-ID", "").strip()
-            or request.query_params.get("client_id", "").strip()
-        )
+    record_type = "AccProduct"
+    coercer = RowCoercer(AccProduct)
+    cache_responses = True
+    ordering = ('code', 'client_id')
 
     def post(self, request):
         data = request.data
         client_id = self._get_client_id(request)
 
-        if not isinstance(data, list):
+        if not is_record_list(data):
             logger.error("AccProduct - Expected a list of records")
             return Response({"error": "Expected a list of records"}, status=400)
 
@@ -858,192 +1017,145 @@ class AccProductView(APIView):
             logger.warning("AccProduct - Received empty payload")
             return Response({"message": "No records to process"}, status=200)
 
-        logger.info(f"AccProduct - Received {len(data)} records (client_id={client_id!r})")
-
-        tagged = []
-        for rec in data:
-            r = dict(rec)
-            r.setdefault("client_id", client_id)
-            tagged.append(r)
+        fill = {"client_id": client_id}
 
-        for i, sample in enumerate(tagged[:2]):
+        for i, sample in enumerate(sample_records(data)):
             logger.info(f"AccProduct - Sample record {i + 1}: "
-                        f"{json.dumps(sample, indent=2, default=str)}")
+                        f"{json.dumps({**fill, **sample}, default=str)}")
 
-        serializer = AccProductSerializer(data=tagged, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    # Delete existing rows for this client before re-inserting
-                    if client_id:
-                        deleted, _ = AccProduct.objects.filter(client_id=client_id).delete()
-                    else:
-                        deleted, _ = AccProduct.objects.all().delete()
-                    logger.info(f"AccProduct - Deleted {deleted} existing rows (client_id={client_id!r})")
-                    records = [AccProduct(**item) for item in serializer.validated_data]
-                    AccProduct.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"AccProduct - Saved {len(records)} records for client_id={client_id!r}")
-                return Response(
-                    {"message": "AccProduct records saved", "count": len(records),
-                     "client_id": client_id},
-                    status=status.HTTP_201_CREATED,
-                )
-            except Exception as e:
-                logger.error(f"AccProduct - DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error"}, status=500)
+        # Outside the transaction: creating a client's partition locks the table
+        if client_id:
+            ensure_partition(AccProduct, client_id)
+
+        try:
+            with transaction.atomic():
+                # Delete existing rows for this client before re-inserting
+                with self.metrics.stage("delete"):
+                    deleted = self.delete_client_rows(AccProduct, client_id)
+                logger.info(f"AccProduct - Deleted {deleted} existing rows (client_id={client_id!r})")
+                saved, errors = self.validate_and_load(
+                    data, self.coercer, BulkLoader(AccProduct), fill=fill)
+                if errors:
+                    transaction.set_rollback(True)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"AccProduct - DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error"}, status=500)
 
-        errors_sample = list(serializer.errors)[:5]
-        logger.error(f"AccProduct - Validation errors (first 5): "
-                     f"{json.dumps(errors_sample, indent=2, default=str)}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if errors is None:
+            logger.info(f"AccProduct - Saved {saved} records for client_id={client_id!r}")
+            return Response(
+                {"message": "AccProduct records saved", "count": saved,
+                 "client_id": client_id},
+                status=status.HTTP_201_CREATED,
+            )
+
+        logger.error(f"AccProduct - Validation errors: {summarize_errors(errors)}")
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
         client_id = self._get_client_id(request)
-        if client_id:
-            deleted, _ = AccProduct.objects.filter(client_id=client_id).delete()
-        else:
-            deleted, _ = AccProduct.objects.all().delete()
+        with self.metrics.stage("delete"):
+            deleted = self.delete_client_rows(AccProduct, client_id)
         logger.info(f"AccProduct - Deleted {deleted} rows (client_id={client_id!r})")
         return Response({"deleted": deleted, "client_id": client_id}, status=200)
 
     def get(self, request):
         client_id = self._get_client_id(request)
         qs = AccProduct.objects.filter(client_id=client_id) if client_id else AccProduct.objects.all()
-        serializer = AccProductSerializer(qs, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, qs, AccProductSerializer)
 from .models import AccDepartment
 from .serializers import AccDepartmentSerializer
 
-class AccDepartmentView(APIView):
-    def _get_client_id(self, request):
-        return (
-            request.headers.get('X-Client-ID', '').strip()
-            or request.query_params.get('client_id', '').strip()
-        )
+class AccDepartmentView(SyncAPIView):
+    record_type = "AccDepartment"
+    coercer = RowCoercer(AccDepartment)
+    ordering = ('department_id', 'client_id')
 
     def post(self, request):
         data      = request.data
         client_id = self._get_client_id(request)
-        if not isinstance(data, list):
+        if not is_record_list(data):
             return Response({'error': 'Expected a list of records'}, status=400)
         if not data:
             return Response({'message': 'No records to process'}, status=200)
 
-        logger.info(f'AccDepartment - Received {len(data)} records (client_id={client_id!r})')
-
-        # Tag every record with client_id so the serializer/insert sees it,
+        # Tag every record with client_id so the insert sees it,
         # same pattern as AccMasterView / AccProductView above.
-        tagged = [{**rec, 'client_id': rec.get('client_id') or client_id} for rec in data]
+        fill = {'client_id': client_id}
 
-        for i, sample in enumerate(tagged[:2]):
+        for i, sample in enumerate(sample_records(data)):
             logger.info(f'AccDepartment - Sample record {i + 1}: '
-                        f'{json.dumps(sample, indent=2, default=str)}')
+                        f'{json.dumps({**fill, **sample}, default=str)}')
 
-        serializer = AccDepartmentSerializer(data=tagged, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    from django.db import connection as _conn
-                    with _conn.cursor() as _cur:
-                        # Delete existing rows for this client before re-inserting.
-                        # NOTE: department_id values are NOT guaranteed unique across
-                        # clients (e.g. every DSN may have department_id='001'). Scoping
-                        # the delete by client_id is correct for THIS client's rows, but
-                        # if another client's row with the same department_id is still
-                        # present, a plain INSERT/bulk_create collides on the PK and the
-                        # whole batch fails — which is what was happening here. Raw SQL
-                        # below bypasses ModelSerializer's auto UniqueValidator (the same
-                        # issue already fixed on AccMaster/AccProduct/PlanetClient) and
-                        # uses UPSERT semantics so a leftover row from another client
-                        # with the same department_id is updated in place instead of
-                        # blowing up the transaction.
-                        if client_id:
-                            _cur.execute(
-                                'DELETE FROM acc_departments WHERE client_id = %s',
-                                [client_id],
-                            )
-                            deleted = _cur.rowcount
-                        else:
-                            _cur.execute('DELETE FROM acc_departments')
-                            deleted = _cur.rowcount
-                        logger.info(f'AccDepartment - Deleted {deleted} existing rows (client_id={client_id!r})')
-
-                        fields = [
-                            f.column for f in AccDepartment._meta.concrete_fields
-                            if not f.primary_key or not f.auto_created
-                        ]
-                        col_names    = ', '.join(fields)
-                        placeholders = ', '.join(['%s'] * len(fields))
-                        # NOTE: department_id is NOT globally unique — every client's
-                        # source DB legitimately has the same department codes (AC, AS,
-                        # CT, etc). The real uniqueness key for this table is the pair
-                        # (department_id, client_id). The DELETE above already clears any
-                        # rows for THIS client_id, so a plain INSERT is correct here and
-                        # does not need ON CONFLICT. An ON CONFLICT (department_id) clause
-                        # was tried previously but that's wrong: it overwrote OTHER
-                        # clients' rows that happened to share the same department_id,
-                        # which is why only the most-recently-synced client's rows
-                        # survived. Make sure acc_departments has a composite UNIQUE
-                        # constraint on (department_id, client_id) in Postgres, not a
-                        # single-column one on department_id alone.
-                        sql = (
-                            f'INSERT INTO acc_departments ({col_names}) '
-                            f'VALUES ({placeholders})'
-                        )
-                        rows = [
-                            tuple(item.get(f.attname, None) for f in AccDepartment._meta.concrete_fields
-                                  if not f.primary_key or not f.auto_created)
-                            for item in serializer.validated_data
-                        ]
-                        _cur.executemany(sql, rows)
-
-                logger.info(f'AccDepartment - Saved {len(rows)} records for client_id={client_id!r}')
-                return Response(
-                    {'message': 'AccDepartment records saved', 'count': len(rows), 'client_id': client_id},
-                    status=status.HTTP_201_CREATED,
-                )
-            except Exception as e:
-                logger.error(f'AccDepartment - DB error: {e}')
-                logger.error(traceback.format_exc())
-                return Response({'error': 'Database error', 'detail': str(e)}, status=500)
+        # Outside the transaction: creating a client's partition locks the table
+        if client_id:
+            ensure_partition(AccDepartment, client_id)
+
+        try:
+            with transaction.atomic():
+                # department_id is NOT globally unique: every client's source DB
+                # has the same department codes (AC, AS, CT, ...), so the key is
+                # (department_id, client_id) (see sql/client_scoped_indexes.sql).
+                # Deleting this client's rows first makes a plain INSERT correct;
+                # an ON CONFLICT (department_id) would overwrite other clients' rows.
+                with self.metrics.stage("delete"):
+                    deleted = self.delete_client_rows(AccDepartment, client_id)
+                logger.info(f'AccDepartment - Deleted {deleted} existing rows (client_id={client_id!r})')
+                saved, errors = self.validate_and_load(
+                    data, self.coercer, BulkLoader(AccDepartment), fill=fill)
+                if errors:
+                    transaction.set_rollback(True)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f'AccDepartment - DB error: {e}')
+            logger.error(traceback.format_exc())
+            return Response({'error': 'Database error', 'detail': str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f'AccDepartment - Saved {saved} records for client_id={client_id!r}')
+            return Response(
+                {'message': 'AccDepartment records saved', 'count': saved, 'client_id': client_id},
+                status=status.HTTP_201_CREATED,
+            )
 
-        errors_sample = list(serializer.errors)[:5]
-        logger.error(f'AccDepartment - Validation errors (first 5): '
-                     f'{json.dumps(errors_sample, indent=2, default=str)}')
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        logger.error(f"AccDepartment - Validation errors: {summarize_errors(errors)}")
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
         client_id = self._get_client_id(request)
-        deleted, _ = AccDepartment.objects.filter(client_id=client_id).delete() if client_id else AccDepartment.objects.all().delete()
+        with self.metrics.stage("delete"):
+            deleted = self.delete_client_rows(AccDepartment, client_id)
         return Response({'deleted': deleted}, status=200)
 
     def get(self, request):
         client_id = self._get_client_id(request)
         qs = AccDepartment.objects.filter(client_id=client_id) if client_id else AccDepartment.objects.all()
-        return Response(AccDepartmentSerializer(qs, many=True).data)
+        return self.list_response(request, qs, AccDepartmentSerializer)
     
 
 
-class AccLedgerView(APIView):
+class AccLedgerView(SyncAPIView):
     """
     POST  – deletes acc_ledgers rows for the given client_id, then bulk-inserts
             fresh records tagged with that client_id.
     GET   – returns records, optionally filtered by ?client_id= (and ?code=).
     DELETE– removes all rows for a client_id (called by sync tool before re-push).
+
+    Every write keeps acc_ledger_balances in step (see balances.py).
     """
 
-    def _get_client_id(self, request):
-        return (
-            request.headers.get("X-Client-ID", "").strip()
-            or request.query_params.get("client_id", "").strip()
-        )
+    record_type = "AccLedger"
+    coercer = RowCoercer(AccLedger)
 
     def post(self, request):
         data = request.data
         client_id = self._get_client_id(request)
 
-        if not isinstance(data, list):
+        if not is_record_list(data):
             logger.error("AccLedger - Expected a list of records")
             return Response({"error": "Expected a list of records"}, status=400)
 
@@ -1051,50 +1163,50 @@ class AccLedgerView(APIView):
             logger.warning("AccLedger - Received empty payload")
             return Response({"message": "No records to process"}, status=200)
 
-        logger.info(f"AccLedger - Received {len(data)} records (client_id={client_id!r})")
-
-        tagged = []
-        for rec in data:
-            r = dict(rec)
-            r.setdefault("client_id", client_id)
-            tagged.append(r)
+        fill = {"client_id": client_id}
 
-        for i, sample in enumerate(tagged[:2]):
+        for i, sample in enumerate(sample_records(data)):
             logger.info(f"AccLedger - Sample record {i + 1}: "
-                        f"{json.dumps(sample, indent=2, default=str)}")
+                        f"{json.dumps({**fill, **sample}, default=str)}")
 
-        serializer = AccLedgerSerializer(data=tagged, many=True)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    # NOTE: Do NOT delete here — the sync tool sends a separate
-                    # DELETE request before the first chunk. Deleting on every
-                    # POST would wipe previously inserted chunks, leaving only
-                    # the last chunk's rows in the table.
-                    records = [AccLedger(**item) for item in serializer.validated_data]
-                    AccLedger.objects.bulk_create(records, batch_size=1000)
-                logger.info(f"AccLedger - Saved {len(records)} records for client_id={client_id!r}")
-                return Response(
-                    {"message": "AccLedger records saved", "count": len(records),
-                     "client_id": client_id},
-                    status=status.HTTP_201_CREATED,
-                )
-            except Exception as e:
-                logger.error(f"AccLedger - DB error: {e}")
-                logger.error(traceback.format_exc())
-                return Response({"error": "Database error", "detail": str(e)}, status=500)
+        # Outside the transaction: creating a client's partition locks acc_ledgers
+        if client_id:
+            ensure_partition(AccLedger, client_id)
 
-        errors_sample = list(serializer.errors)[:5]
-        logger.error(f"AccLedger - Validation errors (first 5): "
-                     f"{json.dumps(errors_sample, indent=2, default=str)}")
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                # NOTE: Do NOT delete here — the sync tool sends a separate
+                # DELETE request before the first chunk. Deleting on every
+                # POST would wipe previously inserted chunks, leaving only
+                # the last chunk's rows in the table.
+                saved, errors = self.validate_and_load(
+                    data, self.coercer, LedgerBalanceLoader(BulkLoader(AccLedger)), fill=fill)
+                if errors:
+                    transaction.set_rollback(True)
+        except ParseError:
+            raise
+        except Exception as e:
+            logger.error(f"AccLedger - DB error: {e}")
+            logger.error(traceback.format_exc())
+            return Response({"error": "Database error", "detail": str(e)}, status=500)
+
+        if errors is None:
+            logger.info(f"AccLedger - Saved {saved} records for client_id={client_id!r}")
+            return Response(
+                {"message": "AccLedger records saved", "count": saved,
+                 "client_id": client_id},
+                status=status.HTTP_201_CREATED,
+            )
+
+        logger.error(f"AccLedger - Validation errors: {summarize_errors(errors)}")
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
         client_id = self._get_client_id(request)
-        if client_id:
-            deleted, _ = AccLedger.objects.filter(client_id=client_id).delete()
-        else:
-            deleted, _ = AccLedger.objects.all().delete()
+        with self.metrics.stage("delete"):
+            # Batches commit one by one; the sync tool repeats a failed DELETE
+            deleted = self.delete_client_rows(AccLedger, client_id)
+            clear_balances(client_id)
         logger.info(f"AccLedger - Deleted {deleted} rows (client_id={client_id!r})")
         return Response({"deleted": deleted, "client_id": client_id}, status=200)
 
@@ -1106,5 +1218,85 @@ class AccLedgerView(APIView):
             qs = qs.filter(client_id=client_id)
         if code:
             qs = qs.filter(code=code)
-        serializer = AccLedgerSerializer(qs, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.list_response(request, qs, AccLedgerSerializer)
+
+    def replace_client_rows(self, client_id, data):
+        saved, errors = super().replace_client_rows(client_id, data)
+        if not errors:
+            rebuild_balances(client_id)
+        return saved, errors
+
+
+class AccLedgerBalanceView(SyncAPIView):
+    """
+    GET – per-code debit and credit totals, balance and entry count of
+          acc_ledgers, optionally filtered by ?client_id= (and ?code=).
+          Read from acc_ledger_balances, so the cost does not grow with the
+          ledger.
+    """
+
+    ordering = ("client_id", "code")
+
+    def get(self, request):
+        client_id = self._get_client_id(request)
+        code = request.query_params.get('code', '').strip()
+        qs = AccLedgerBalance.objects.all()
+        if client_id:
+            qs = qs.filter(client_id=client_id)
+        if code:
+            qs = qs.filter(code=code)
+        return self.list_response(request, qs, AccLedgerBalanceSerializer)
+
+
+class TrialBalanceView(SyncAPIView):
+    """
+    GET – per-account debit, credit and closing balance of a client's
+          acc_ledgers, summed in SQL with names, super_code and opening
+          balance from acc_master (see reports.py).
+
+          client_id (X-Client-ID or ?client_id=) is required; ?from= and
+          ?to= (YYYY-MM-DD, inclusive) limit the period.  Cached per data
+          version of both tables, with an ETag.
+    """
+
+    def get(self, request):
+        client_id = self._get_client_id(request)
+        if not client_id:
+            return Response({"error": "client_id is required"}, status=400)
+        period = {}
+        for param in ("from", "to"):
+            value = request.query_params.get(param, "").strip()
+            if value:
+                try:
+                    period[param] = datetime.date.fromisoformat(value)
+                except ValueError:
+                    return Response({"error": f"Invalid {param} date {value!r}; expected YYYY-MM-DD"},
+                                    status=400)
+        date_from, date_to = period.get("from"), period.get("to")
+
+        def build():
+            accounts = trial_balance(client_id, date_from, date_to)
+            return dumps({
+                "client_id": client_id,
+                "from": date_from,
+                "to": date_to,
+                "accounts": [_amounts_as_text(account) for account in accounts],
+                "groups": [_amounts_as_text(group) for group in group_totals(accounts)],
+            }).encode()
+
+        versions = [data_version(model._meta.db_table, client_id) for model in (AccLedger, AccMaster)]
+        if None in versions:
+            return HttpResponse(build(), content_type="application/json")
+        return self.cached_response(request, request_key(request, client_id), ".".join(versions), build)
+
+
+def _amounts_as_text(row):
+    # Decimal strings, as the serializers render acc_ledgers amounts
+    return {name: f"{value:f}" if name in AMOUNT_COLUMNS else value for name, value in row.items()}
+
+
+class SyncMetricsView(APIView):
+    """GET – ingest metrics of every worker in Prometheus text format."""
+
+    def get(self, request):
+        return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")